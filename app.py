@@ -1,111 +1,199 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify
+from markupsafe import Markup
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from flask_caching import Cache
-from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime, timedelta
+from datetime import datetime
+import atexit
 import bcrypt
 import uuid
 import os
-from sqlalchemy import desc, func, case
+import time
+from sqlalchemy import desc, func, case, tuple_
 
+from board import get_board
+from caching import cache, init_cache, cache_stats, warm_up, memoize, tag, invalidate, user_tag, games_tag, LEADERBOARD, GAMES
 from config import Config
-from models import db, User, Game, Odds, Bet
-from odds_api import fetch_odds_from_api, parse_and_save_odds, update_scores_and_grade_bets
-
-# Initialize Flask app
-app = Flask(__name__)
-app.config.from_object(Config)
-
-# Initialize database
-db.init_app(app)
-
-# Initialize cache
-cache = Cache(app, config={
-    'CACHE_TYPE': 'simple',
-    'CACHE_DEFAULT_TIMEOUT': 300  # 5 minutes default
-})
+from leader import LeaderElection, LEADER_KEY, node_name
+from models import db, User, Game, Odds, Bet, UserStats, UserBetTypeStats, is_uuid
+from pagination import encode_cursor, decode_cursor
+from placement import parse_leg, parse_slip, place_bets, rehash, PlacementError
+from polling import AdaptivePoller, published_status
+from records import BoardEntry, UserStatsSummary, BetTypeStat, TeamStat, Analytics, LeaderboardPage, as_json, codec
+from leaderboard import get_leaderboard_page, get_user_rank, SORTS, DEFAULT_SORT, WINDOWS, DEFAULT_WINDOW
+from user_stats import apply_bet_changes, bet_state, game_day
+
+# Routes live on a blueprint and the app is built by create_app(), so importing this
+# module has no side effects: no app, no scheduler, and APScheduler and the Odds API
+# client are only imported by the process that stands for scheduler leadership
+main = Blueprint('main', __name__)
 
 # Initialize Flask-Login
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
 
 @login_manager.user_loader
 def load_user(user_id):
     return db.session.get(User, user_id)
 
 
-# Initialize APScheduler for automatic updates
-scheduler = BackgroundScheduler(timezone=Config.SCHEDULER_TIMEZONE)
+def create_app(config=Config):
+    """Build the app: settings, database, shared cache, login manager and routes
+    
+    config is a class or object holding the settings (Config, or a subclass
+    for a script or benchmark). Connections are only opened on first use and
+    the scheduler is not started; see start_scheduler().
+    """
+    app = Flask(__name__)
+    app.config.from_object(config)
+    
+    # Initialize database
+    db.init_app(app)
+    
+    # Initialize cache (shared between workers, see caching.py)
+    init_cache(app)
+    
+    login_manager.init_app(app)
+    app.register_blueprint(main)
+    return app
+
+
+_app = None
+
+def __getattr__(name):
+    """The default app (`app:app`, `from app import app`) is built on first access"""
+    global _app
+    if name != 'app':
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    if _app is None:
+        _app = create_app()
+    return _app
+
+
+# APScheduler for automatic updates. Every candidate process starts it paused; only
+# the elected leader (see leader.py) resumes it, so each job runs once per deployment
+# however many gunicorn workers there are
+scheduler = None
+election = None
 
 def scheduled_fetch_odds():
-    """Scheduled job to fetch odds multiple times daily"""
-    with app.app_context():
-        print('🕐 Scheduled odds fetch starting...')
-        odds_data = fetch_odds_from_api()
+    """Scheduled job to fetch odds for every configured sport"""
+    from odds_api import fetch_odds_from_api, fetch_all_sports, parse_and_save_odds
+    
+    print('🕐 Scheduled odds fetch starting...')
+    start = time.perf_counter()
+    added, changed, previous_days = [], [], set()
+    # Sports are fetched concurrently; each payload is saved as soon as it arrives
+    for sport, odds_data in fetch_all_sports(fetch_odds_from_api):
         if odds_data:
-            parse_and_save_odds(odds_data, db)
-            # Clear cache after updating odds
-            cache.delete('homepage')
-            cache.delete_memoized(get_todays_or_next_games)
-        print('🕐 Scheduled odds fetch complete!')
+            report = parse_and_save_odds(odds_data, db)
+            added += report['added']
+            changed += report['changed']
+            previous_days |= report['previous_days']
+    # Only expire the boards whose games actually changed, on the day they are
+    # on now and the day they were on before (a rescheduled game leaves a board);
+    # new games can change which day the homepage shows, so they expire every board
+    tags = [games_tag(day) for day in game_days(changed) | previous_days]
+    if added:
+        tags.append(GAMES)
+    if tags:
+        invalidate(*tags)
+        warm_caches()
+    print(f'🕐 Scheduled odds fetch complete! ({time.perf_counter() - start:.1f}s)')
 
 def scheduled_update_scores():
     """Scheduled job to update scores and grade bets"""
+    from odds_api import update_scores_and_grade_bets
+    
+    print('🕐 Scheduled score update starting...')
+    report = update_scores_and_grade_bets(db)
+    # Expire only the boards with new scores and the users whose bets were graded
+    tags = [games_tag(day) for day in game_days(report['games'])]
+    tags += [user_tag(user_id) for user_id in report['users']]
+    if report['users']:
+        tags.append(LEADERBOARD)
+    if tags:
+        invalidate(*tags)
+        warm_caches(report['users'])
+    print('🕐 Scheduled score update complete!')
+
+# Adaptive polling: one tick a minute decides whether odds/scores are due,
+# based on upcoming games and the remaining Odds API quota. The jobs run
+# inside the tick's app context
+poller = AdaptivePoller(fetch_odds=scheduled_fetch_odds, update_scores=scheduled_update_scores)
+
+def scheduler_jobs():
+    """This process's scheduled jobs and their next run"""
+    return [
+        {'id': job.id, 'nextRun': job.next_run_time.isoformat() if job.next_run_time else None}
+        for job in scheduler.get_jobs()
+    ] if scheduler is not None else []
+
+def scheduled_poll(app):
+    """Scheduled tick for the adaptive poller; publishes its status for the other workers"""
     with app.app_context():
-        print('🕐 Scheduled score update starting...')
-        update_scores_and_grade_bets(db)
-        # Clear all caches after grading bets (affects leaderboard and user stats)
-        cache.clear()
-        print('🕐 Scheduled score update complete!')
-
-# Add scheduled jobs - Odds fetch 4x daily
-scheduler.add_job(scheduled_fetch_odds, 'cron', hour=6, minute=0)   # 6 AM EST
-scheduler.add_job(scheduled_fetch_odds, 'cron', hour=12, minute=0)  # 12 PM EST
-scheduler.add_job(scheduled_fetch_odds, 'cron', hour=18, minute=0)  # 6 PM EST
-scheduler.add_job(scheduled_fetch_odds, 'cron', hour=23, minute=0)  # 11 PM EST
-
-# Score updates every 3 hours during game times
-scheduler.add_job(scheduled_update_scores, 'cron', hour=7, minute=0)   # 7 AM EST
-scheduler.add_job(scheduled_update_scores, 'cron', hour=10, minute=0)  # 10 AM EST
-scheduler.add_job(scheduled_update_scores, 'cron', hour=13, minute=0)  # 1 PM EST
-scheduler.add_job(scheduled_update_scores, 'cron', hour=16, minute=0)  # 4 PM EST
-scheduler.add_job(scheduled_update_scores, 'cron', hour=19, minute=0)  # 7 PM EST
-scheduler.add_job(scheduled_update_scores, 'cron', hour=22, minute=0)  # 10 PM EST
-scheduler.add_job(scheduled_update_scores, 'cron', hour=1, minute=0)   # 1 AM EST
-
-scheduler.start()
-
-print('✅ Scheduler started:')
-print('   - Odds fetch: 6 AM, 12 PM, 6 PM, 11 PM EST')
-print('   - Score updates: Every 3 hours (7 AM - 1 AM EST)')
+        poller.tick()
+        poller.publish(node=election.node if election else node_name(), jobs=scheduler_jobs())
+
+def start_scheduler(app):
+    """Stand for scheduler leadership (the winner runs the jobs)
+    
+    Called in each gunicorn worker (gunicorn.conf.py), by `python app.py` and
+    by run_scheduler.py; never on import, so init_db.py and other scripts
+    don't start a scheduler.
+    """
+    global scheduler, election
+    if election is not None or not app.config['SCHEDULER_ENABLED']:
+        return election
+    
+    from apscheduler.schedulers.background import BackgroundScheduler
+    
+    scheduler = BackgroundScheduler(timezone=app.config['SCHEDULER_TIMEZONE'])
+    scheduler.add_job(scheduled_poll, 'interval', args=[app], minutes=1, max_instances=1, coalesce=True)
+    scheduler.start(paused=True)
+    election = LeaderElection(
+        app,
+        on_elected=scheduler.resume,
+        on_deposed=scheduler.pause,
+        interval=app.config['SCHEDULER_LEADER_INTERVAL'],
+        lock_dir=app.config['SCHEDULER_LOCK_DIR']
+    ).start()
+    atexit.register(stop_scheduler)
+    
+    print(f'✅ Scheduler standing for leadership as {election.node}:')
+    print('   - Odds: every 15 min near tip-off, up to every 12 hours on quiet days')
+    print(f'   - Scores: every {app.config["SCORES_LIVE_INTERVAL"]} min while games are live')
+    print(f'   - Budget: {app.config["ODDS_API_MONTHLY_BUDGET"]} Odds API credits per month')
+    return election
+
+def stop_scheduler():
+    """Give up leadership (another candidate takes over) and stop the scheduler"""
+    global scheduler, election
+    if election is None:
+        return
+    election.stop()
+    scheduler.shutdown(wait=False)
+    scheduler = election = None
 
 
 # ==================== ROUTES ====================
 
-@app.route('/')
-@cache.cached(timeout=60, key_prefix='homepage')
+@main.route('/')
 def index():
     """Home page with games and odds"""
-    # Get games for today or next available day
-    games = get_todays_or_next_games()
-    
-    # Determine which date we're showing
-    game_date = None
-    if games:
-        game_date = games[0].game_time
+    # The game board and leaderboard panel are cached fragments shared by every
+    # visitor; only the page around them (nav, login state, scripts) is per request
+    board = render_game_board()
     
-    # Get leaderboard (top 10)
-    leaderboard = get_leaderboard_data()[:10]
-    
-    return render_template('index.html', games=games, leaderboard=leaderboard, game_date=game_date)
+    return render_template('index.html', 
+                         game_board=Markup(board['html']), 
+                         game_date=board['game_date'],
+                         leaderboard_panel=Markup(render_leaderboard_panel()))
 
 
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     """User registration"""
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     if request.method == 'POST':
         email = request.form.get('email')
@@ -140,16 +228,16 @@ def register():
         db.session.commit()
         
         flash('Registration successful! Please log in.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     return render_template('register.html')
 
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     """User login"""
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     
     if request.method == 'POST':
         username = request.form.get('username')
@@ -160,41 +248,36 @@ def login():
         if user and bcrypt.checkpw(password.encode('utf-8'), user.password.encode('utf-8')):
             login_user(user)
             flash('Logged in successfully!', 'success')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         else:
             flash('Invalid username or password', 'error')
     
     return render_template('login.html')
 
 
-@app.route('/logout')
+@main.route('/logout')
 @login_required
 def logout():
     """User logout"""
     logout_user()
     flash('Logged out successfully', 'success')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
 
-@app.route('/dashboard')
+@main.route('/dashboard')
 @login_required
 def dashboard():
     """User dashboard with bets and statistics"""
-    # Pagination for better performance
-    page = request.args.get('page', 1, type=int)
-    per_page = 50
-    
-    # Get user's bets with pagination and eager load game data
-    bets_pagination = Bet.query.filter_by(user_id=current_user.id)\
-        .options(db.joinedload(Bet.game))\
-        .order_by(desc(Bet.created_at))\
-        .paginate(page=page, per_page=per_page, error_out=False)
-    
-    bets = bets_pagination.items
-    
     # Calculate statistics (cached)
     stats = calculate_user_stats(current_user.id)
     
+    # Cursor pagination: every page is one indexed query, no OFFSET or COUNT
+    bets_pagination = get_bet_page(current_user.id, 
+                                   request.args.get('cursor'), 
+                                   request.args.get('page', 1, type=int),
+                                   total=stats.totalBets)
+    bets = bets_pagination['bets']
+    
     # Get analytics (cached)
     analytics = calculate_analytics(current_user.id)
     
@@ -205,37 +288,53 @@ def dashboard():
                          pagination=bets_pagination)
 
 
-@app.route('/leaderboard')
+@main.route('/leaderboard')
 def leaderboard():
     """Full leaderboard page"""
-    leaderboard_data = get_leaderboard_data()
-    return render_template('leaderboard.html', leaderboard=leaderboard_data)
+    sort = request.args.get('sort', DEFAULT_SORT)
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    window = request.args.get('window', DEFAULT_WINDOW)
+    if window not in WINDOWS:
+        window = DEFAULT_WINDOW
+    min_bets = max(request.args.get('min_bets', 1, type=int), 1)
+    cursor = request.args.get('cursor')
+    
+    page = get_leaderboard_data(sort, min_bets, cursor, window=window)
+    
+    my_rank = None
+    if current_user.is_authenticated:
+        my_rank = get_user_rank(current_user.id, sort, min_bets, window)
+    
+    return render_template('leaderboard.html', 
+                         leaderboard=page.entries, 
+                         next_cursor=page.nextCursor,
+                         sort=sort,
+                         window=window,
+                         windows=WINDOWS,
+                         min_bets=min_bets,
+                         my_rank=my_rank)
 
 
-@app.route('/user/<username>')
+@main.route('/user/<username>')
 def user_profile(username):
     """Public user profile - view anyone's bets and stats"""
     # Find user by username
     user = User.query.filter_by(username=username).first()
     if not user:
         flash('User not found', 'error')
-        return redirect(url_for('leaderboard'))
-    
-    # Pagination for bets
-    page = request.args.get('page', 1, type=int)
-    per_page = 50
-    
-    # Get user's bets with pagination and eager load game data
-    bets_pagination = Bet.query.filter_by(user_id=user.id)\
-        .options(db.joinedload(Bet.game))\
-        .order_by(desc(Bet.created_at))\
-        .paginate(page=page, per_page=per_page, error_out=False)
-    
-    bets = bets_pagination.items
+        return redirect(url_for('main.leaderboard'))
     
     # Calculate statistics
     stats = calculate_user_stats(user.id)
     
+    # Cursor pagination: every page is one indexed query, no OFFSET or COUNT
+    bets_pagination = get_bet_page(user.id, 
+                                   request.args.get('cursor'), 
+                                   request.args.get('page', 1, type=int),
+                                   total=stats.totalBets)
+    bets = bets_pagination['bets']
+    
     # Get analytics
     analytics = calculate_analytics(user.id)
     
@@ -253,63 +352,71 @@ def user_profile(username):
 
 # ==================== API ROUTES ====================
 
-@app.route('/api/place-bet', methods=['POST'])
+@main.route('/api/place-bet', methods=['POST'])
 @login_required
 def api_place_bet():
-    """Place a bet"""
+    """Place a bet (retries are safe with an idempotencyKey field or Idempotency-Key header)"""
     try:
-        data = request.get_json()
-        
-        game_id = data.get('gameId')
-        bet_type = data.get('betType')
-        team = data.get('team')
-        line = data.get('line')
-        odds = data.get('odds')
-        stake = data.get('stake')
-        
-        # Validate
-        if not all([game_id, bet_type, odds, stake]):
-            return jsonify({'error': 'Missing required fields'}), 400
+        leg = parse_leg(request.get_json(), request.headers.get('Idempotency-Key'))
+        placed, = place_bets(current_user.id, [leg])
         
-        # Check if game exists
-        game = Game.query.get(game_id)
-        if not game:
-            return jsonify({'error': 'Game not found'}), 404
+        # Expire this user's cached stats and the leaderboard
+        if placed.created:
+            invalidate(user_tag(current_user.id), LEADERBOARD)
         
-        # Allow betting on any game (past, present, or future)
-        # This enables retroactive bet logging
-        
-        # Create bet
-        bet = Bet(
-            id=str(uuid.uuid4()),
-            user_id=current_user.id,
-            game_id=game_id,
-            bet_type=bet_type,
-            team=team,
-            line=float(line) if line else None,
-            odds=int(odds),
-            stake=float(stake)
-        )
+        return jsonify({
+            'success': True,
+            'betId': placed.bet_id
+        })
+    
+    except PlacementError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@main.route('/api/place-bets', methods=['POST'])
+@login_required
+def api_place_bets():
+    """Place a slip of bets in one transaction: {"bets": [{gameId, betType, team, line, odds, stake}, ...]}
+    
+    All or nothing. Each bet may carry an idempotencyKey, or an
+    Idempotency-Key header covers the whole slip; bets already booked
+    under their key come back with created false.
+    """
+    try:
+        data = request.get_json(silent=True)
+        legs = parse_slip(data.get('bets') if isinstance(data, dict) else None, request.headers.get('Idempotency-Key'))
+        placed = place_bets(current_user.id, legs)
+        created = sum(bet.created for bet in placed)
         
-        db.session.add(bet)
-        db.session.commit()
+        # Expire this user's cached stats and the leaderboard
+        if created:
+            invalidate(user_tag(current_user.id), LEADERBOARD)
         
         return jsonify({
             'success': True,
-            'betId': bet.id
+            'created': created,
+            'bets': [{'betId': bet.bet_id, 'created': bet.created} for bet in placed]
         })
     
+    except PlacementError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/edit-bet/<bet_id>', methods=['PUT'])
+@main.route('/api/edit-bet/<bet_id>', methods=['PUT'])
 @login_required
 def api_edit_bet(bet_id):
     """Edit an existing bet"""
     try:
         # Find the bet
-        bet = Bet.query.get(bet_id)
+        bet = Bet.query.get(bet_id) if is_uuid(bet_id) else None
         if not bet:
             return jsonify({'error': 'Bet not found'}), 404
         
@@ -322,6 +429,7 @@ def api_edit_bet(bet_id):
             return jsonify({'error': 'Cannot edit a graded bet. Delete and create a new one instead.'}), 400
         
         data = request.get_json()
+        before = bet_state(bet)
         
         # Update fields if provided
         if 'odds' in data:
@@ -332,12 +440,14 @@ def api_edit_bet(bet_id):
             bet.stake = float(data['stake'])
         if 'team' in data:
             bet.team = data['team']
+        # The idempotency key now stands for the edited bet
+        rehash(bet)
         
+        apply_bet_changes([(before, bet_state(bet))])
         db.session.commit()
         
-        # Clear user stats cache
-        cache.delete_memoized(calculate_user_stats, current_user.id)
-        cache.delete_memoized(calculate_analytics, current_user.id)
+        # Expire this user's cached stats and the leaderboard (a stake change moves total_staked)
+        invalidate(user_tag(current_user.id), LEADERBOARD)
         
         return jsonify({
             'success': True,
@@ -349,13 +459,13 @@ def api_edit_bet(bet_id):
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/delete-bet/<bet_id>', methods=['DELETE'])
+@main.route('/api/delete-bet/<bet_id>', methods=['DELETE'])
 @login_required
 def api_delete_bet(bet_id):
     """Delete a bet"""
     try:
         # Find the bet
-        bet = Bet.query.get(bet_id)
+        bet = Bet.query.get(bet_id) if is_uuid(bet_id) else None
         if not bet:
             return jsonify({'error': 'Bet not found'}), 404
         
@@ -364,13 +474,12 @@ def api_delete_bet(bet_id):
             return jsonify({'error': 'Not authorized to delete this bet'}), 403
         
         # Delete the bet
+        apply_bet_changes([(bet_state(bet), None)])
         db.session.delete(bet)
         db.session.commit()
         
-        # Clear caches
-        cache.delete_memoized(calculate_user_stats, current_user.id)
-        cache.delete_memoized(calculate_analytics, current_user.id)
-        cache.delete_memoized(get_leaderboard_data)
+        # Expire this user's cached stats and the leaderboard
+        invalidate(user_tag(current_user.id), LEADERBOARD)
         
         return jsonify({
             'success': True,
@@ -382,152 +491,239 @@ def api_delete_bet(bet_id):
         return jsonify({'error': str(e)}), 500
 
 
+@main.route('/api/games/<game_id>/line-movement')
+def api_line_movement(game_id):
+    """Line history plus opening and closing numbers for a game"""
+    from odds_history import get_line_movement, get_opening_and_closing
+    
+    bookmaker = request.args.get('bookmaker')
+    if not is_uuid(game_id) or not db.session.get(Game, game_id):
+        return jsonify({'error': 'Game not found'}), 404
+    
+    return jsonify({
+        'movement': get_line_movement(game_id, bookmaker),
+        'lines': get_opening_and_closing([game_id], bookmaker).get(game_id, {})
+    })
+
+
+@main.route('/api/leaderboard')
+def api_leaderboard():
+    """Leaderboard page as JSON, plus the current user's rank when logged in"""
+    sort = request.args.get('sort', DEFAULT_SORT)
+    if sort not in SORTS:
+        return jsonify({'error': f'sort must be one of {", ".join(SORTS)}'}), 400
+    window = request.args.get('window', DEFAULT_WINDOW)
+    if window not in WINDOWS:
+        return jsonify({'error': f'window must be one of {", ".join(WINDOWS)}'}), 400
+    min_bets = max(request.args.get('min_bets', 1, type=int), 1)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    
+    page = as_json(get_leaderboard_data(sort, min_bets, request.args.get('cursor'), limit, window))
+    if current_user.is_authenticated:
+        page['me'] = as_json(get_user_rank(current_user.id, sort, min_bets, window))
+    return jsonify(page)
+
+
+@main.route('/api/cache-stats')
+@login_required
+def api_cache_stats():
+    """Hit/miss/recompute counters for memoized helpers in this worker"""
+    return jsonify(cache_stats())
+
+
+@main.route('/api/scheduler-status')
+@login_required
+def api_scheduler_status():
+    """Which node holds scheduler leadership, and this worker's own role"""
+    if election is None:
+        status = {'node': node_name(), 'isLeader': False, 'leader': cache.get(LEADER_KEY)}
+    else:
+        status = election.status()
+    status['candidate'] = election is not None
+    if status['isLeader']:
+        status['jobs'] = scheduler_jobs()
+    else:
+        # Only the leader (possibly run_scheduler.py) has jobs; report what it last published
+        status['jobs'] = (published_status() or {}).get('jobs', [])
+    return jsonify(status)
+
+
+@main.route('/api/quota')
+@login_required
+def api_quota():
+    """Odds API credit usage and the poller's current cadence, as the scheduler leader last published them"""
+    if election is not None and election.is_leader:
+        return jsonify(poller.status())
+    status = published_status()
+    if status is None:
+        return jsonify(poller.status())
+    status.pop('jobs', None)
+    return jsonify(status)
+
+
 # ==================== HELPER FUNCTIONS ====================
 
-@cache.memoize(timeout=300)
+@memoize(timeout=300, codec=codec(BoardEntry, many=True))
 def get_todays_or_next_games():
-    """Get games for today - OPTIMIZED to limit queries"""
-    from pytz import timezone as pytz_timezone
-    from collections import defaultdict
+    """Upcoming games for today (US Eastern), or for the next date that has any
     
-    # Define EST timezone
-    est = pytz_timezone('America/New_York')
-    utc = pytz_timezone('UTC')
+    One query against the board snapshot (board.py), which ingest and
+    grading rebuild: BoardEntry records with the best lines, no Game objects.
+    """
+    # Any new game may change which day is shown
+    tag(GAMES)
     
-    # Get current time
-    now_utc = datetime.utcnow()
-    now_utc_aware = now_utc.replace(tzinfo=utc)
-    now_est = now_utc_aware.astimezone(est)
+    now = datetime.utcnow()
+    games = get_board(now)
     
-    # Only get games for next 7 days (not ALL upcoming games)
-    week_from_now = now_utc + timedelta(days=7)
-    
-    # Limit query to recent games only with eager loading for caching
-    upcoming_games = Game.query.filter(
-        Game.game_time >= now_utc,
-        Game.game_time <= week_from_now
-    ).options(db.joinedload(Game.odds))\
-     .order_by(Game.game_time).limit(200).all()
-    
-    if not upcoming_games:
+    if not games:
         print('📅 No upcoming games found in database')
         return []
     
-    print(f'📊 Found {len(upcoming_games)} games in next 7 days')
-    
-    # Group games by EST date
-    games_by_date = defaultdict(list)
-    
-    for game in upcoming_games:
-        # Convert UTC game time to EST
-        game_time_utc = game.game_time.replace(tzinfo=utc)
-        game_time_est = game_time_utc.astimezone(est)
-        
-        # Extract just the EST date (ignore time)
-        game_date_est = game_time_est.date()
-        games_by_date[game_date_est].append(game)
-    
-    # Get today's date in EST
-    today_date_est = now_est.date()
-    
-    # Debug: Print dates with game counts (in EST)
-    print('📊 Games by date (EST):')
-    for date in sorted(games_by_date.keys())[:3]:  # Only show first 3 dates
-        print(f'   {date}: {len(games_by_date[date])} games')
+    next_date = games[0].game_date
+    when = 'today' if next_date == game_day(now) else next_date.strftime('%B %d, %Y')
+    print(f'📅 Showing {len(games)} games for {when} (EST)')
+    tag(games_tag(next_date))
+    return games
+
+
+@memoize(timeout=300)
+def render_game_board():
+    """Homepage game board HTML - odds are rendered once per ingest, not per visitor"""
+    # Get games for today or next available day
+    games = get_todays_or_next_games()
     
-    # Check if we have games today (EST)
-    if today_date_est in games_by_date:
-        print(f'📅 Showing {len(games_by_date[today_date_est])} games for today (EST)')
-        return games_by_date[today_date_est]
+    return {
+        'html': render_template('partials/game_board.html', games=games),
+        'game_date': games[0].game_time if games else None
+    }
+
+
+@memoize(timeout=120)
+def render_leaderboard_panel():
+    """Homepage leaderboard sidebar HTML (top 10)"""
+    leaderboard = get_leaderboard_data(limit=10).entries
+    return render_template('partials/leaderboard_panel.html', leaderboard=leaderboard)
+
+
+def get_bet_page(user_id, cursor=None, page=1, per_page=50, total=None):
+    """One page of a user's bets, newest first, with the game eager loaded
     
-    # Get the next available date (EST)
-    print('📅 No games today, showing next available day...')
-    next_date = min(games_by_date.keys())
-    next_games = games_by_date[next_date]
+    Keyset pagination on (created_at, id): the cursor is the first or last
+    bet of the neighbouring page, so page 200 costs the same as page 1.
+    `page` is only used for display, and `total` (the user_stats count) makes
+    the page count approximate instead of running a COUNT.
+    """
+    query = Bet.query.filter_by(user_id=user_id).options(db.joinedload(Bet.game))
+    key = tuple_(Bet.created_at, Bet.id)
     
-    print(f'📅 Showing {len(next_games)} games for {next_date.strftime("%B %d, %Y")} (EST)')
-    return next_games
+    position = decode_cursor(cursor, 3)
+    try:
+        direction, boundary = position[0], tuple_(datetime.fromisoformat(position[1]), str(uuid.UUID(position[2])))
+    except (TypeError, ValueError, AttributeError):
+        direction, boundary, page = None, None, 1
+    
+    if direction == 'prev':
+        # Walk forward in time from the boundary, then flip back to newest first
+        bets = query.filter(key > boundary).order_by(Bet.created_at, Bet.id).limit(per_page + 1).all()
+        has_newer, has_older = len(bets) > per_page, True
+        bets = bets[:per_page][::-1]
+    else:
+        if direction == 'next':
+            query = query.filter(key < boundary)
+        bets = query.order_by(desc(Bet.created_at), desc(Bet.id)).limit(per_page + 1).all()
+        has_newer, has_older = direction == 'next', len(bets) > per_page
+        bets = bets[:per_page]
+    
+    page = max(page, 1)
+    pages = max(-(-(total or 0) // per_page), page + has_older, 1)
+    return {
+        'bets': bets,
+        'page': page,
+        'pages': pages,
+        'total': total,
+        'prev_cursor': encode_cursor('prev', bets[0].created_at.isoformat(), bets[0].id) if bets and has_newer else None,
+        'next_cursor': encode_cursor('next', bets[-1].created_at.isoformat(), bets[-1].id) if bets and has_older else None
+    }
 
 
-@cache.memoize(timeout=60)
+def warm_caches(user_ids=()):
+    """Rebuild the homepage fragments, the leaderboard and the given users' stats after a job"""
+    calls = [
+        (render_game_board, ()),
+        (render_leaderboard_panel, ()),
+        (get_leaderboard_data, ()),
+    ]
+    for user_id in user_ids:
+        calls.append((calculate_user_stats, (user_id,)))
+        calls.append((calculate_analytics, (user_id,)))
+    return warm_up(calls, seconds=current_app.config['CACHE_WARMUP_SECONDS'],
+                   workers=current_app.config['CACHE_WARMUP_WORKERS'])
+
+
+def game_days(game_ids):
+    """Distinct US Eastern dates of the given games"""
+    days = set()
+    for i in range(0, len(game_ids), 1000):
+        rows = db.session.query(Game.game_time).filter(Game.id.in_(game_ids[i:i + 1000])).all()
+        days.update(game_day(row.game_time) for row in rows)
+    return days
+
+
+@memoize(timeout=60, codec=codec(UserStatsSummary))
 def calculate_user_stats(user_id):
-    """Calculate user statistics - OPTIMIZED with aggregation"""
-    # Use database aggregation instead of loading all bets
-    stats_query = db.session.query(
-        func.count(Bet.id).label('totalBets'),
-        func.coalesce(func.sum(Bet.stake), 0).label('totalStaked'),
-        func.coalesce(func.sum(Bet.profit), 0).label('totalProfit'),
-        func.sum(case((Bet.result == 'PENDING', 1), else_=0)).label('pendingBets'),
-        func.sum(case((Bet.result == 'WON', 1), else_=0)).label('wonBets'),
-        func.sum(case((Bet.result == 'LOST', 1), else_=0)).label('lostBets')
-    ).filter(Bet.user_id == user_id).first()
-    
-    if not stats_query or stats_query.totalBets == 0:
-        return {
-            'totalBets': 0,
-            'pendingBets': 0,
-            'wonBets': 0,
-            'lostBets': 0,
-            'totalStaked': 0,
-            'totalProfit': 0,
-            'winRate': 0,
-            'roi': 0
-        }
-    
-    total_bets = stats_query.totalBets
-    pending_bets = stats_query.pendingBets
-    won_bets = stats_query.wonBets
-    lost_bets = stats_query.lostBets
-    total_staked = float(stats_query.totalStaked)
-    total_profit = float(stats_query.totalProfit)
-    
-    settled_bets = won_bets + lost_bets
-    win_rate = (won_bets / settled_bets * 100) if settled_bets > 0 else 0
+    """Calculate user statistics - reads the materialized user_stats row"""
+    tag(user_tag(user_id))
+    row = db.session.get(UserStats, user_id)
+    
+    if not row or row.total_bets == 0:
+        return UserStatsSummary()
+    
+    total_staked = float(row.total_staked)
+    total_profit = float(row.total_profit)
+    
+    settled_bets = row.won_bets + row.lost_bets
+    win_rate = (row.won_bets / settled_bets * 100) if settled_bets > 0 else 0
     roi = (total_profit / total_staked * 100) if total_staked > 0 else 0
     
-    return {
-        'totalBets': total_bets,
-        'pendingBets': pending_bets,
-        'wonBets': won_bets,
-        'lostBets': lost_bets,
-        'totalStaked': total_staked,
-        'totalProfit': total_profit,
-        'winRate': win_rate,
-        'roi': roi
-    }
+    return UserStatsSummary(
+        totalBets=row.total_bets,
+        pendingBets=row.pending_bets,
+        wonBets=row.won_bets,
+        lostBets=row.lost_bets,
+        totalStaked=total_staked,
+        totalProfit=total_profit,
+        winRate=win_rate,
+        roi=roi
+    )
 
 
-@cache.memoize(timeout=60)
+@memoize(timeout=60, codec=codec(Analytics))
 def calculate_analytics(user_id):
     """Calculate detailed analytics - OPTIMIZED"""
-    # Bet type stats using aggregation
-    bet_type_query = db.session.query(
-        Bet.bet_type,
-        func.count(Bet.id).label('totalBets'),
-        func.coalesce(func.sum(Bet.stake), 0).label('totalStaked'),
-        func.coalesce(func.sum(Bet.profit), 0).label('totalProfit'),
-        func.sum(case((Bet.result == 'WON', 1), else_=0)).label('wonBets'),
-        func.sum(case((Bet.result == 'LOST', 1), else_=0)).label('lostBets')
-    ).filter(Bet.user_id == user_id)\
-     .group_by(Bet.bet_type)\
-     .all()
+    tag(user_tag(user_id))
+    # Bet type stats from the materialized per-type rows
+    bet_type_query = UserBetTypeStats.query.filter(
+        UserBetTypeStats.user_id == user_id,
+        UserBetTypeStats.total_bets > 0
+    ).all()
     
     bet_type_stats = []
     for row in bet_type_query:
-        total_decided = row.wonBets + row.lostBets
-        win_rate = (row.wonBets / total_decided * 100) if total_decided > 0 else 0
-        roi = (row.totalProfit / row.totalStaked * 100) if row.totalStaked > 0 else 0
+        total_decided = row.won_bets + row.lost_bets
+        win_rate = (row.won_bets / total_decided * 100) if total_decided > 0 else 0
+        roi = (row.total_profit / row.total_staked * 100) if row.total_staked > 0 else 0
         
-        bet_type_stats.append({
-            'betType': row.bet_type,
-            'totalBets': row.totalBets,
-            'wonBets': row.wonBets,
-            'lostBets': row.lostBets,
-            'totalStaked': float(row.totalStaked),
-            'totalProfit': float(row.totalProfit),
-            'winRate': win_rate,
-            'roi': roi
-        })
+        bet_type_stats.append(BetTypeStat(
+            betType=row.bet_type,
+            totalBets=row.total_bets,
+            wonBets=row.won_bets,
+            lostBets=row.lost_bets,
+            totalStaked=float(row.total_staked),
+            totalProfit=float(row.total_profit),
+            winRate=win_rate,
+            roi=roi
+        ))
     
     # Team stats using aggregation (only for decided bets)
     team_query = db.session.query(
@@ -550,62 +746,28 @@ def calculate_analytics(user_id):
         total = row.wins + row.losses
         win_rate = (row.wins / total * 100) if total > 0 else 0
         
-        team_stats.append({
-            'team': row.team,
-            'bets': row.bets,
-            'wins': row.wins,
-            'losses': row.losses,
-            'profit': float(row.profit),
-            'winRate': win_rate
-        })
+        team_stats.append(TeamStat(
+            team=row.team,
+            bets=row.bets,
+            wins=row.wins,
+            losses=row.losses,
+            profit=float(row.profit),
+            winRate=win_rate
+        ))
     
-    return {
-        'betTypeStats': bet_type_stats,
-        'teamStats': team_stats
-    }
+    return Analytics(betTypeStats=tuple(bet_type_stats), teamStats=tuple(team_stats))
 
 
-@cache.memoize(timeout=120)
-def get_leaderboard_data():
-    """Get leaderboard rankings - OPTIMIZED with single query"""
-    # Single aggregated query instead of N+1 queries
-    leaderboard_query = db.session.query(
-        User.username,
-        func.count(Bet.id).label('totalBets'),
-        func.coalesce(func.sum(Bet.stake), 0).label('totalStaked'),
-        func.coalesce(func.sum(Bet.profit), 0).label('totalProfit'),
-        func.sum(case((Bet.result == 'WON', 1), else_=0)).label('wonBets'),
-        func.sum(case((Bet.result == 'LOST', 1), else_=0)).label('lostBets')
-    ).outerjoin(Bet, User.id == Bet.user_id)\
-     .group_by(User.id, User.username)\
-     .having(func.count(Bet.id) > 0)\
-     .all()
-    
-    leaderboard = []
-    for row in leaderboard_query:
-        settled_bets = row.wonBets + row.lostBets
-        win_rate = (row.wonBets / settled_bets * 100) if settled_bets > 0 else 0
-        roi = (row.totalProfit / row.totalStaked * 100) if row.totalStaked > 0 else 0
-        
-        leaderboard.append({
-            'username': row.username,
-            'totalProfit': float(row.totalProfit),
-            'totalStaked': float(row.totalStaked),
-            'totalBets': row.totalBets,
-            'wonBets': row.wonBets,
-            'lostBets': row.lostBets,
-            'winRate': win_rate,
-            'roi': roi
-        })
-    
-    # Sort by profit
-    leaderboard.sort(key=lambda x: x['totalProfit'], reverse=True)
-    return leaderboard
+@memoize(timeout=120, codec=codec(LeaderboardPage))
+def get_leaderboard_data(sort=DEFAULT_SORT, min_bets=1, cursor=None, limit=50, window=DEFAULT_WINDOW):
+    """Get a leaderboard page - ranked and paginated in the database"""
+    tag(LEADERBOARD)
+    return get_leaderboard_page(sort, min_bets, cursor, limit, window)
 
 
 # ==================== TEMPLATE FILTERS ====================
 
-@app.template_filter('format_odds')
+@main.app_template_filter('format_odds')
 def format_odds(odds):
     """Format American odds with + sign"""
     if odds > 0:
@@ -613,7 +775,7 @@ def format_odds(odds):
     return str(odds)
 
 
-@app.template_filter('format_currency')
+@main.app_template_filter('format_currency')
 def format_currency(amount):
     """Format currency"""
     if amount >= 0:
@@ -621,7 +783,7 @@ def format_currency(amount):
     return f'-${abs(amount):.2f}'
 
 
-@app.template_filter('format_datetime')
+@main.app_template_filter('format_datetime')
 def format_datetime(dt):
     """Format datetime in EST"""
     from pytz import timezone as pytz_timezone
@@ -638,7 +800,11 @@ def format_datetime(dt):
 
 
 if __name__ == '__main__':
+    from migrations import migrate
+    
+    app = create_app()
     with app.app_context():
-        db.create_all()
-    app.run(debug=Config.DEBUG, port=int(os.environ.get('PORT', 3005)))
+        migrate()
+    start_scheduler(app)
+    app.run(debug=app.config['DEBUG'], port=int(os.environ.get('PORT', 3005)))
 
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark the homepage board lookups against the size of the coming week.
+
+Usage:
+    python -m benchmarks.board [--sizes 200,2000,20000] [--runs 20] [--database-url URL]
+
+For each size, fills the next seven days with that many games (each with
+best lines) and times three ways of finding the games to show:
+
+- python grouping: load up to 200 games of the week with their lines and
+  group them by Eastern date in Python (before games.game_date)
+- game_date: the next tip-off's date, then that date's games with their
+  lines, from games and best_odds (before board_games)
+- snapshot: board.get_board, one query on the board_games snapshot,
+  which is what the homepage does now
+
+plus the cost of rebuild_board, which ingest and grading now pay. All
+three must pick the same games.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from benchmarks.common import make_app, quiet
+from board import get_board, rebuild_board
+from migrations import migrate
+from models import db, Game, BestOdds
+from user_stats import game_day
+
+
+def group_in_python():
+    """get_todays_or_next_games before games.game_date (without the cache); returns (shown, rows loaded)"""
+    from pytz import timezone as pytz_timezone
+    
+    est = pytz_timezone('America/New_York')
+    utc = pytz_timezone('UTC')
+    now_utc = datetime.utcnow()
+    upcoming_games = Game.query.filter(
+        Game.game_time >= now_utc,
+        Game.game_time <= now_utc + timedelta(days=7)
+    ).options(db.joinedload(Game.best_odds)).order_by(Game.game_time).limit(200).all()
+    if not upcoming_games:
+        return [], 0
+    
+    games_by_date = defaultdict(list)
+    for game in upcoming_games:
+        games_by_date[game.game_time.replace(tzinfo=utc).astimezone(est).date()].append(game)
+    today_date_est = now_utc.replace(tzinfo=utc).astimezone(est).date()
+    if today_date_est in games_by_date:
+        return games_by_date[today_date_est], len(upcoming_games)
+    return games_by_date[min(games_by_date)], len(upcoming_games)
+
+
+def by_game_date():
+    """Two indexed queries on games.game_date, loading Game objects with their best lines"""
+    now = datetime.utcnow()
+    next_date = db.session.query(Game.game_date).filter(
+        Game.game_time >= now,
+        Game.game_time <= now + timedelta(days=7)
+    ).order_by(Game.game_time).limit(1).scalar()
+    return Game.query.filter(Game.game_date == next_date, Game.game_time >= now)\
+        .options(db.joinedload(Game.best_odds)).order_by(Game.game_time).limit(200).all()
+
+
+def seed(count, seed=5):
+    """count games spread over the next seven days, replacing any from a previous size"""
+    rng = random.Random(seed)
+    db.session.execute(db.delete(BestOdds))
+    db.session.execute(db.delete(Game))
+    now = datetime.utcnow()
+    games = []
+    for i in range(count):
+        game_time = now + timedelta(minutes=rng.randint(1, 7 * 24 * 60))
+        games.append({'id': str(uuid.uuid4()), 'external_id': f'board-{i}', 'game_time': game_time,
+                      'game_date': game_day(game_time), 'away_team': f'Away {i}', 'home_team': f'Home {i}'})
+    db.session.execute(db.insert(Game), games)
+    db.session.execute(db.insert(BestOdds), [{'game_id': game['id'], 'away_ml': 110, 'home_ml': -130} for game in games])
+    rebuild_board()
+    db.session.commit()
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.exec_driver_sql('VACUUM ANALYZE games')
+            connection.exec_driver_sql('VACUUM ANALYZE best_odds')
+            connection.exec_driver_sql('VACUUM ANALYZE board_games')
+    else:
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+
+
+def median_ms(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        with quiet():
+            fn()
+        times.append(time.perf_counter() - start)
+        db.session.rollback()
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,20000')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+    
+    app = make_app(args.database_url)
+    failures = 0
+    with app.app_context():
+        db.session.close()
+        db.drop_all()
+        with quiet():
+            migrate()
+        
+        print(f'{"games this week":>16}{"shown":>7}{"python grouping":>28}{"game_date":>12}{"snapshot":>12}{"rebuild":>12}')
+        for size in [int(size) for size in args.sizes.split(',')]:
+            seed(size)
+            (expected, loaded), shown = group_in_python(), {game.id for game in by_game_date()}
+            # All show at most 200 games, and tip-off ties come back in any order
+            if len(expected) < 200 and not {game.id for game in expected} == shown == {row.game_id for row in get_board()}:
+                print(f'❌ {size} games: the three lookups picked different games')
+                failures += 1
+            times = [median_ms(fn, args.runs) for fn in (group_in_python, by_game_date, get_board)]
+            rebuild = median_ms(rebuild_board, max(args.runs // 4, 1))
+            print(f'{size:>16}{len(shown):>7}{times[0]:>10.2f} ms ({loaded:>4} rows loaded)'
+                  f'{times[1]:>9.2f} ms{times[2]:>9.2f} ms{rebuild:>9.2f} ms')
+        
+        db.session.close()
+        db.drop_all()
+    
+    if failures:
+        print('❌ Board lookups disagree')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark the size and (un)pickling cost of the memoized helpers' cache entries.
+
+Usage:
+    python -m benchmarks.cache_records [--games 1400] [--users 500] [--runs 200] [--database-url URL]
+
+Seeds a week of games (with best lines), users with stats and settled
+bets, then builds each cached value the way the helper does now
+(records.py) and the way it used to be cached:
+
+- board: Game instances with best_odds loaded (before board_games), and
+  the board as dicts
+- user stats, analytics, leaderboard page: the dicts and lists the
+  helpers returned before
+
+and pickles the whole entry memoize stores, (value, versions,
+fresh_until), with the protocol the cache uses. "records" pickles the
+records themselves; "tuples" is what memoize stores now, the records
+packed by the helper's codec, with packing counted in dumps and
+rebuilding the records in loads. Reports bytes per entry, entries per
+MB, and median dumps/loads times. Every form must carry the same data.
+"""
+
+import argparse
+import pickle
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.board import seed as seed_games, by_game_date
+from benchmarks.common import make_app, quiet, seed_users, seed_bets
+from benchmarks.leaderboard import seed_stats
+from board import get_board
+from migrations import migrate
+from models import db, Bet
+from records import BoardEntry, UserStatsSummary, Analytics, LeaderboardPage, as_json, codec
+
+import app as web
+
+
+def entry(value):
+    """What memoize puts in the cache for a value"""
+    return value, {'tag:games': 3, 'tag:leaderboard': 7}, time.time() + 300
+
+
+def median_us(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e6
+
+
+def measure(value, runs, pack=None, unpack=None):
+    """(pickled bytes, dumps µs, loads µs) of a cache entry holding value, stored through pack/unpack"""
+    pack = pack or (lambda value: value)
+    unpack = unpack or (lambda value: value)
+    data = pickle.dumps(entry(pack(value)), pickle.HIGHEST_PROTOCOL)
+    dumps = median_us(lambda: pickle.dumps(entry(pack(value)), pickle.HIGHEST_PROTOCOL), runs)
+    loads = median_us(lambda: unpack(pickle.loads(data)[0]), runs)
+    return len(data), dumps, loads
+
+
+def settle_bets():
+    """Grade the seeded bets at random (by odds sign), so analytics has team rows"""
+    db.session.execute(db.update(Bet).values(
+        result=db.case((Bet.odds > 0, 'WON'), else_='LOST'),
+        profit=db.case((Bet.odds > 0, Bet.stake * Bet.odds / 100), else_=-Bet.stake)
+    ))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=1400)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+    
+    app = make_app(args.database_url)
+    failures = 0
+    with app.app_context():
+        db.session.close()
+        db.drop_all()
+        with quiet():
+            migrate()
+            seed_games(args.games)
+            user_ids = seed_users(args.users)
+            seed_stats(user_ids[1:])
+            games = by_game_date()
+            seed_bets(games, user_ids[:1], 4)
+            settle_bets()
+        
+        now = datetime.utcnow()
+        # The helpers' bodies, without the cache in front of them; the board also as it used to be
+        orm_board = by_game_date()
+        cases = [
+            ('board', get_board(now), codec(BoardEntry, many=True)),
+            ('user stats', web.calculate_user_stats.__wrapped__(user_ids[0]), codec(UserStatsSummary)),
+            ('analytics', web.calculate_analytics.__wrapped__(user_ids[0]), codec(Analytics)),
+            ('leaderboard page', web.get_leaderboard_data.__wrapped__(limit=50), codec(LeaderboardPage)),
+        ]
+        if {game.id for game in orm_board} != {row.game_id for row in cases[0][1]}:
+            print('❌ board: Game objects and the snapshot hold different games')
+            failures += 1
+        
+        print(f'{"entry":18}{"form":13}{"bytes":>9}{"entries/MB":>12}{"dumps":>12}{"loads":>12}')
+        for label, value, (pack, unpack) in cases:
+            forms = [('ORM objects', orm_board, None, None)] if label == 'board' else []
+            forms += [('dicts', as_json(value), None, None), ('records', value, None, None), ('tuples', value, pack, unpack)]
+            restored = unpack(pickle.loads(pickle.dumps(pack(value), pickle.HIGHEST_PROTOCOL)))
+            if restored != value or as_json(restored) != as_json(value) or type(restored) is not type(value):
+                print(f'❌ {label}: records lose data through the cache')
+                failures += 1
+            results = {}
+            for form, data, form_pack, form_unpack in forms:
+                size, dumps, loads = results[form] = measure(data, args.runs, form_pack, form_unpack)
+                print(f'{label:18}{form:13}{size:>9}{2 ** 20 / size:>12.0f}{dumps:>9.1f} µs{loads:>9.1f} µs')
+            if any(stored >= before for stored, before in zip(results['tuples'], results['dicts'])):
+                print(f'⚠️  {label}: the cached tuples no longer beat the dicts on every column')
+        
+        db.session.close()
+        db.drop_all()
+    
+    if failures:
+        print('❌ Records differ from the values they replace')
+        sys.exit(1)
+    print('✅ Records carry the same data as before')
+
+
+if __name__ == '__main__':
+    main()
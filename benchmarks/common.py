@@ -0,0 +1,108 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager, redirect_stdout
+
+from flask import Flask
+from sqlalchemy import event
+
+from models import db, User, Bet
+from user_stats import apply_bet_changes, BetState, game_day
+
+
+def make_app(database_url=None):
+    """Build a bare Flask app bound to a scratch database (no scheduler, no routes)"""
+    if not database_url:
+        database_url = os.environ.get('BENCH_DATABASE_URL')
+    if not database_url:
+        fd, path = tempfile.mkstemp(suffix='.db', prefix='spreadsheet-bench-')
+        os.close(fd)
+        database_url = f'sqlite:///{path}'
+    
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+@contextmanager
+def timed(label, results):
+    """Time a block and record the number of SQL statements it issued"""
+    counter = {'statements': 0}
+    
+    def count(*args, **kwargs):
+        counter['statements'] += 1
+    
+    event.listen(db.engine, 'before_cursor_execute', count)
+    start = time.perf_counter()
+    try:
+        yield counter
+    finally:
+        elapsed = time.perf_counter() - start
+        event.remove(db.engine, 'before_cursor_execute', count)
+        results[label] = {'seconds': elapsed, 'statements': counter['statements']}
+        print(f'⏱️  {label}: {elapsed:.3f}s, {counter["statements"]} statements')
+
+
+@contextmanager
+def quiet():
+    """Silence the per-row progress prints while timing"""
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        yield
+    sys.stdout.flush()
+
+
+def seed_users(count):
+    """Insert `count` users and return their ids"""
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    db.session.execute(db.insert(User), [
+        {'id': user_id, 'email': f'bench{i}@example.com', 'username': f'bench{i}', 'password': 'x'}
+        for i, user_id in enumerate(ids)
+    ])
+    db.session.commit()
+    return ids
+
+
+def random_bet(rng, user_id, game):
+    """A pending bet of a random type on `game` (a Game or a row with id/away_team/home_team)"""
+    bet_type = rng.choice(['ML', 'SPREAD', 'TOTAL_OVER', 'TOTAL_UNDER'])
+    team = rng.choice([game.away_team, game.home_team]) if bet_type in ('ML', 'SPREAD') else None
+    if bet_type == 'SPREAD':
+        line = rng.randint(-30, 30) / 2
+    elif bet_type in ('TOTAL_OVER', 'TOTAL_UNDER'):
+        line = rng.randint(100, 200) + rng.choice([0, 0.5])
+    else:
+        line = None
+    
+    return {
+        'id': str(uuid.uuid4()),
+        'user_id': user_id,
+        'game_id': game.id,
+        'bet_type': bet_type,
+        'team': team,
+        'line': line,
+        'odds': rng.choice([-1, 1]) * rng.randint(100, 400),
+        'stake': rng.choice([0.5, 1.0, 2.0, 5.0]),
+        'result': 'PENDING'
+    }
+
+
+def seed_bets(games, user_ids, bets_per_game, seed=7):
+    """Insert bets_per_game random pending bets on each game"""
+    rng = random.Random(seed)
+    rows = [random_bet(rng, rng.choice(user_ids), game) for game in games for _ in range(bets_per_game)]
+    for i in range(0, len(rows), 10000):
+        db.session.execute(db.insert(Bet), rows[i:i + 10000])
+    days = {game.id: game_day(game.game_time) for game in games}
+    apply_bet_changes((None, BetState(row['user_id'], row['bet_type'], 'PENDING', row['stake'], None, days[row['game_id']]))
+                      for row in rows)
+    db.session.commit()
+    return len(rows)
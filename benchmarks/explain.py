@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Check that the hot queries use indexes.
+
+Usage:
+    python -m benchmarks.explain [--users 20000] [--games 20000] [--bets 300000] [--min-rows 10000]
+                                 [--database-url URL]
+
+Builds the schema with migrations.migrate() on a scratch database, fills
+it with a synthetic dataset (a few seasons of games with odds history,
+mostly settled bets), vacuums and analyzes it, then runs each hot query
+the way the app does, captures the SQL it sends and EXPLAINs it. Exits
+non-zero if any of them reads a table of at least --min-rows rows with a
+sequential scan (Postgres "Seq Scan", SQLite "SCAN <table>") because no
+index can serve it. On Postgres a seq scan is re-planned with
+enable_seqscan off: if the plan then uses an index, the scan was a cost
+choice (typically the build side of a hash join) and is only reported.
+Scans of small tables are not reported at all.
+
+Run it against Postgres (--database-url or BENCH_DATABASE_URL); the
+SQLite planner is much less picky about using an index.
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import event, desc, tuple_
+
+from benchmarks.common import make_app, quiet, seed_users, random_bet
+from board import get_board, rebuild_board
+from grading import grade_pending_bets
+from leaderboard import get_leaderboard_page, get_user_rank
+from migrations import migrate
+from models import db, Game, Odds, BestOdds, Bet
+from odds_api import _prefetch_odds
+from odds_history import get_opening_and_closing_for_range, backfill_snapshots
+from user_stats import reconcile
+
+
+def seed(user_count, game_count, bet_count, seed=11):
+    """Games over the past few seasons and the next week, three books each, bets mostly settled"""
+    rng = random.Random(seed)
+    user_ids = seed_users(user_count)
+    now = datetime.utcnow()
+    
+    games = []
+    for i in range(game_count):
+        game_time = now - timedelta(days=3 * 365) + timedelta(minutes=rng.randint(0, (3 * 365 + 7) * 24 * 60))
+        games.append(SimpleNamespace(
+            id=str(uuid.uuid4()), external_id=f'explain-{i}', game_time=game_time,
+            away_team=f'Away {i}', home_team=f'Home {i}', is_completed=game_time < now,
+            away_score=70 if game_time < now else None, home_score=65 if game_time < now else None
+        ))
+    db.session.execute(db.insert(Game), [vars(game) for game in games])
+    db.session.execute(db.insert(Odds), [
+        {'id': str(uuid.uuid4()), 'game_id': game.id, 'bookmaker': book, 'away_ml': 120, 'home_ml': -140}
+        for game in games for book in ('draftkings', 'fanduel', 'betmgm')
+    ])
+    db.session.execute(db.insert(BestOdds), [{'game_id': game.id, 'away_ml': 120, 'home_ml': -140} for game in games])
+    rebuild_board()
+    db.session.commit()
+    backfill_snapshots()
+    
+    rows = []
+    for _ in range(bet_count):
+        game = rng.choice(games)
+        row = random_bet(rng, rng.choice(user_ids), game)
+        if game.is_completed:
+            row['result'] = rng.choice(['WON', 'LOST', 'LOST', 'PUSH'])
+            row['profit'] = {'WON': row['stake'], 'LOST': -row['stake'], 'PUSH': 0.0}[row['result']]
+        row['created_at'] = game.game_time - timedelta(hours=rng.randint(1, 72))
+        rows.append(row)
+    for i in range(0, len(rows), 10000):
+        db.session.execute(db.insert(Bet), rows[i:i + 10000])
+    db.session.commit()
+    
+    with quiet():
+        reconcile()
+    db.session.commit()
+    # Planner statistics and visibility map, as autovacuum would have left a live table
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.exec_driver_sql('VACUUM ANALYZE')
+    else:
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+    return user_ids, games
+
+
+def table_sizes():
+    sizes = {table: db.session.execute(db.text(f'SELECT COUNT(*) FROM {table}')).scalar() for table in db.metadata.tables}
+    db.session.commit()
+    return sizes
+
+
+def hot_queries(user_ids, games):
+    """(label, callable) for each hot path, issuing the same SQL the app does"""
+    now = datetime.utcnow()
+    user_id = user_ids[len(user_ids) // 2]
+    recent = [game for game in games if game.is_completed][-20:]
+    
+    def bet_history():
+        # app.get_bet_page: first page, then the page after a cursor
+        query = Bet.query.filter_by(user_id=user_id).options(db.joinedload(Bet.game))
+        first = query.order_by(desc(Bet.created_at), desc(Bet.id)).limit(51).all()
+        boundary = tuple_(first[-1].created_at, first[-1].id) if first else tuple_(now, str(uuid.UUID(int=0)))
+        query.filter(tuple_(Bet.created_at, Bet.id) < boundary)\
+            .order_by(desc(Bet.created_at), desc(Bet.id)).limit(51).all()
+    
+    return [
+        ('bets by user, newest first', bet_history),
+        ('pending bets by game (grading)', lambda: grade_pending_bets(db, recent)),
+        ('homepage board (snapshot)', lambda: get_board(now)),
+        ('games by game_time range (odds history)',
+         lambda: get_opening_and_closing_for_range(now - timedelta(days=7), now)),
+        ('odds by game (ingest prefetch)', lambda: _prefetch_odds(db, [game.id for game in recent])),
+        ('leaderboard top page', lambda: get_leaderboard_page('totalProfit', 1, None, 50)),
+        ('leaderboard page after cursor', lambda: get_leaderboard_page(
+            'roi', 1, get_leaderboard_page('roi', 1, None, 50).nextCursor, 50)),
+        ('leaderboard rank lookup', lambda: get_user_rank(user_id, 'winRate', 1)),
+        ('leaderboard 7-day window', lambda: get_leaderboard_page('totalProfit', 1, None, 50, '7d')),
+    ]
+
+
+def capture(fn):
+    """Run fn (rolled back afterwards) and return the (statement, parameters) it executed"""
+    statements = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+    
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        with quiet():
+            fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+        db.session.rollback()
+    return statements
+
+
+def _pg_seq_scans(plan):
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        found.extend(_pg_seq_scans(child))
+    return found
+
+
+def seq_scans(statement, parameters, avoid=False):
+    """Tables the plan for a statement reads with a sequential scan
+    
+    avoid=True plans it with sequential scans disabled (Postgres only), so
+    whatever is still scanned has no usable index. Roll back afterwards.
+    """
+    connection = db.session.connection()
+    if db.engine.dialect.name == 'postgresql':
+        if avoid:
+            connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return _pg_seq_scans(plan[0]['Plan'])
+    
+    # "SCAN <name>" without an index; subqueries and CTEs show up the same way, so keep real tables only
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    return [
+        match.group(1) for row in rows for match in [re.match(r'SCAN (\w+)$', row[-1])]
+        if match and match.group(1) in db.metadata.tables
+    ]
+
+
+def check(queries, sizes, min_rows):
+    failures = 0
+    for label, fn in queries:
+        statements = capture(fn)
+        missing, preferred = set(), set()
+        for statement, parameters in statements:
+            scans = {table for table in seq_scans(statement, parameters) if sizes.get(table, 0) >= min_rows}
+            if scans and db.engine.dialect.name == 'postgresql':
+                unavoidable = scans & set(seq_scans(statement, parameters, avoid=True))
+                db.session.rollback()
+                preferred |= scans - unavoidable
+                scans = unavoidable
+            missing |= scans
+        db.session.rollback()
+        
+        if not statements:
+            failures += 1
+            print(f'❌ {label}: issued no queries')
+        elif missing:
+            failures += 1
+            print(f'❌ {label}: sequential scan on {", ".join(sorted(missing))} (no usable index)')
+        elif preferred:
+            print(f'✅ {label}: indexed (planner prefers scanning {", ".join(sorted(preferred))} at this size)')
+        else:
+            print(f'✅ {label}: {len(statements)} quer{"y" if len(statements) == 1 else "ies"}, all indexed')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--games', type=int, default=20000)
+    parser.add_argument('--bets', type=int, default=300000)
+    parser.add_argument('--min-rows', type=int, default=10000)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+    
+    app = make_app(args.database_url)
+    with app.app_context():
+        db.session.close()
+        db.drop_all()
+        with quiet():
+            migrate()
+        print(f'🌱 Seeding {args.users} users, {args.games} games, {args.bets} bets on {db.engine.dialect.name}...')
+        user_ids, games = seed(args.users, args.games, args.bets)
+        
+        sizes = table_sizes()
+        print('📊 ' + ', '.join(f'{table} {count}' for table, count in sorted(sizes.items()) if count))
+        failures = check(hot_queries(user_ids, games), sizes, args.min_rows)
+        db.session.close()
+        db.drop_all()
+    
+    if failures:
+        print(f'❌ {failures} hot quer{"y" if failures == 1 else "ies"} not using an index')
+        sys.exit(1)
+    print('✅ Every hot query uses an index')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vectorized grading engine.
+
+Usage:
+    python -m benchmarks.grading [--bets 1000000] [--db-bets 10000] [--database-url URL]
+
+1. Compute: grade_bet loop vs grade_arrays at --bets bets.
+2. Database: per-bet ORM grading vs grade_pending_bets at --db-bets bets.
+   Both do the same work: each graded bet also updates the stats tables
+   (one apply_bet_changes per bet in the loop, as the app graded before
+   grading.py), and both must leave them matching the bets table.
+
+Timing only: that the engines agree with grade_bet is checked by
+`python grading.py check`, which is fast enough to run before every deploy.
+"""
+
+import argparse
+import sys
+import time
+import uuid
+
+from benchmarks.common import make_app, timed, quiet, seed_users, seed_bets
+from grading import grade_bet, grade_arrays, grade_pending_bets, parity_bets, bet_arrays, grade_one_by_one, AWAY, HOME
+from models import db, Game, Bet
+from user_stats import apply_bet_changes, bet_state, reconcile
+
+
+def benchmark_compute(count):
+    bets = parity_bets(count)
+    start = time.perf_counter()
+    grade_one_by_one(bets)
+    loop_seconds = time.perf_counter() - start
+    
+    arrays = bet_arrays(bets)
+    start = time.perf_counter()
+    grade_arrays(*arrays)
+    vector_seconds = time.perf_counter() - start
+    
+    print(f'⏱️  grade_bet loop: {loop_seconds:.2f}s, grade_arrays: {vector_seconds:.3f}s '
+          f'({loop_seconds / vector_seconds:.0f}x) for {count} bets')
+
+
+def grade_per_bet(games):
+    """grade_bet one ORM bet at a time, with that bet's stats delta"""
+    for game in games:
+        for bet in Bet.query.filter_by(game_id=game.id, result='PENDING').all():
+            before = bet_state(bet, game)
+            grade_bet(bet, game)
+            apply_bet_changes([(before, bet_state(bet, game))])
+    db.session.commit()
+
+
+def grade_bulk(games):
+    grade_pending_bets(db, games)
+    db.session.commit()
+
+
+def benchmark_database(count, database_url):
+    app = make_app(database_url)
+    results = {}
+    failures = 0
+    
+    with app.app_context():
+        db.session.close()
+        db.drop_all()
+        db.create_all()
+        games = []
+        for i in range(max(1, count // 50)):
+            games.append(Game(id=str(uuid.uuid4()), external_id=f'game-{i}', game_time=db.func.now(),
+                              away_team=AWAY, home_team=HOME, away_score=70 + i % 7, home_score=72, is_completed=True))
+        db.session.add_all(games)
+        db.session.commit()
+        users = seed_users(100)
+        
+        for label, grade in (('per-bet ORM grading', grade_per_bet), ('grade_pending_bets', grade_bulk)):
+            db.session.query(Bet).delete()
+            seed_bets(games, users, 50)
+            with quiet():
+                reconcile()
+            games = Game.query.all()
+            with timed(label, results), quiet():
+                grade(games)
+            with quiet():
+                drift = reconcile(fix=False)
+            if drift:
+                print(f'❌ {label}: {len(drift)} drifted stats counters')
+                failures += 1
+        
+        print(f'📊 {count} bets: grade_pending_bets is '
+              f'{results["per-bet ORM grading"]["seconds"] / results["grade_pending_bets"]["seconds"]:.1f}x the per-bet loop')
+        db.session.close()
+        db.drop_all()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bets', type=int, default=1000000)
+    parser.add_argument('--db-bets', type=int, default=10000)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+    
+    benchmark_compute(args.bets)
+    if args.db_bets and benchmark_database(args.db_bets, args.database_url):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
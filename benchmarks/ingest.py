@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark odds ingestion: row-by-row ORM path vs set-based upserts.
+
+Usage:
+    python -m benchmarks.ingest [--games 5000] [--database-url URL]
+
+Runs against a scratch SQLite file unless BENCH_DATABASE_URL/--database-url
+points somewhere else (use a throwaway Postgres database to exercise
+INSERT ... ON CONFLICT).
+"""
+
+import argparse
+import uuid
+from datetime import datetime
+
+from benchmarks.common import make_app, timed
+from models import db, Game, Odds, BestOdds, OddsSnapshot
+from odds_api import parse_and_save_odds
+from odds_replay import generate_odds_slate
+
+
+def legacy_parse_and_save_odds(odds_data, db):
+    """The original per-game ORM ingestion loop, kept here as the baseline"""
+    games_processed = 0
+    
+    for game_data in odds_data:
+        game_time = datetime.fromisoformat(game_data['commence_time'].replace('Z', '+00:00'))
+        game = Game.query.filter_by(external_id=game_data['id']).first()
+        
+        if not game:
+            game = Game(
+                id=str(uuid.uuid4()),
+                external_id=game_data['id'],
+                sport=game_data['sport_key'],
+                game_time=game_time,
+                away_team=game_data['away_team'],
+                home_team=game_data['home_team']
+            )
+            db.session.add(game)
+        else:
+            game.game_time = game_time
+        
+        bookmakers = game_data.get('bookmakers', [])
+        if not bookmakers:
+            continue
+        
+        bookmaker_data = next((b for b in bookmakers if b['key'] == 'draftkings'), bookmakers[0])
+        Odds.query.filter_by(game_id=game.id).delete()
+        markets = {m['key']: m for m in bookmaker_data.get('markets', [])}
+        odds = Odds(id=str(uuid.uuid4()), game_id=game.id, bookmaker=bookmaker_data['key'])
+        
+        if 'h2h' in markets:
+            for outcome in markets['h2h']['outcomes']:
+                if outcome['name'] == game.away_team:
+                    odds.away_ml = int(outcome['price'])
+                elif outcome['name'] == game.home_team:
+                    odds.home_ml = int(outcome['price'])
+        if 'spreads' in markets:
+            for outcome in markets['spreads']['outcomes']:
+                if outcome['name'] == game.away_team:
+                    odds.away_spread = float(outcome['point'])
+                    odds.spread_odds = int(outcome['price'])
+                elif outcome['name'] == game.home_team:
+                    odds.home_spread = float(outcome['point'])
+        if 'totals' in markets:
+            for outcome in markets['totals']['outcomes']:
+                if outcome['name'] == 'Over':
+                    odds.total_line = float(outcome['point'])
+                    odds.over_odds = int(outcome['price'])
+                elif outcome['name'] == 'Under':
+                    odds.under_odds = int(outcome['price'])
+        
+        db.session.add(odds)
+        games_processed += 1
+    
+    db.session.commit()
+    return games_processed
+
+
+def reset_tables():
+    """Start each run from empty games/odds tables"""
+    db.session.query(OddsSnapshot).delete()
+    db.session.query(BestOdds).delete()
+    db.session.query(Odds).delete()
+    db.session.query(Game).delete()
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=5000)
+    parser.add_argument('--bookmakers', type=int, default=5)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+    
+    app = make_app(args.database_url)
+    payload = generate_odds_slate('basketball_ncaab', args.games, bookmakers=args.bookmakers)
+    results = {}
+    
+    with app.app_context():
+        db.create_all()
+        print(f'🧪 Ingesting {len(payload)} synthetic games on {db.engine.dialect.name}')
+        
+        # Cold = every game is new, warm = every game already exists (the scheduled refresh case)
+        for label, ingest in (('legacy', legacy_parse_and_save_odds), ('bulk', parse_and_save_odds)):
+            reset_tables()
+            with timed(f'{label} cold', results):
+                ingest(payload, db)
+            db.session.expire_all()
+            with timed(f'{label} warm', results):
+                ingest(payload, db)
+            db.session.expire_all()
+        
+        reset_tables()
+    
+    for phase in ('cold', 'warm'):
+        legacy, bulk = results[f'legacy {phase}'], results[f'bulk {phase}']
+        print(f'📊 {phase}: {legacy["seconds"] / bulk["seconds"]:.1f}x faster, '
+              f'{legacy["statements"]} -> {bulk["statements"]} statements')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Benchmark varchar(36) keys against native uuid keys on Postgres.
+
+Usage:
+    python -m benchmarks.keys --database-url postgresql://... [--users 50000] [--games 10000] [--bets 500000]
+
+Starts from the schema production databases had before migrations.py
+(users, games, odds and bets, every key a varchar(36)), fills it,
+migrates it up to 0005 and measures table and index sizes plus
+leaderboard and analytics query times. Then runs the rest of
+migrations.migrate() to convert the keys online and measures again, and once more after VACUUM FULL: an online migration
+leaves the dropped columns' space (and the backfill's old row versions)
+in the tables until they are rewritten, while the indexes are rebuilt
+compact straight away.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import MetaData, Table, Column, ForeignKey, String
+
+from benchmarks.common import make_app, quiet, seed_users, random_bet
+from leaderboard import get_leaderboard_page
+from migrations import migrate, UUID_COLUMNS
+from models import db
+from user_stats import reconcile
+
+
+# The tables before migrations.py, and the columns migrations have added to them since
+BASELINE_TABLES = ['users', 'games', 'odds', 'bets']
+ADDED_COLUMNS = {'games': {'odds_fingerprint', 'game_date'}, 'bets': {'idempotency_key', 'idempotency_hash'}}
+
+
+def baseline_metadata():
+    """The baseline tables as they were: varchar(36) keys, no added columns, no secondary indexes"""
+    metadata = MetaData()
+    for name in BASELINE_TABLES:
+        Table(name, metadata, *(
+            Column(column.name, String(36) if column.name in UUID_COLUMNS[name] else column.type,
+                   *(ForeignKey(key.target_fullname, ondelete=key.ondelete) for key in column.foreign_keys),
+                   primary_key=column.primary_key, nullable=column.nullable, unique=column.unique)
+            for column in db.metadata.tables[name].columns if column.name not in ADDED_COLUMNS.get(name, ())
+        ))
+    return metadata
+
+
+def seed(metadata, user_count, game_count, bet_count, seed=3):
+    """Users, a season of games and settled bets, written through the baseline tables"""
+    rng = random.Random(seed)
+    user_ids = seed_users(user_count)
+    now = datetime.utcnow()
+    games = [
+        SimpleNamespace(id=str(uuid.uuid4()), external_id=f'keys-{i}', away_team=f'Away {i}', home_team=f'Home {i}',
+                        game_time=now - timedelta(minutes=rng.randint(0, 150 * 24 * 60)), is_completed=True)
+        for i in range(game_count)
+    ]
+    db.session.execute(metadata.tables['games'].insert(), [vars(game) for game in games])
+    
+    for start in range(0, bet_count, 50000):
+        rows = []
+        for _ in range(min(50000, bet_count - start)):
+            game = rng.choice(games)
+            row = random_bet(rng, rng.choice(user_ids), game)
+            row['result'] = rng.choice(['WON', 'LOST', 'LOST', 'PUSH'])
+            row['profit'] = {'WON': row['stake'], 'LOST': -row['stake'], 'PUSH': 0.0}[row['result']]
+            row['created_at'] = game.game_time - timedelta(hours=rng.randint(1, 72))
+            rows.append(row)
+        db.session.execute(metadata.tables['bets'].insert(), rows)
+        db.session.commit()
+    return user_ids
+
+
+def vacuum(full=False):
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.exec_driver_sql('VACUUM FULL ANALYZE' if full else 'VACUUM ANALYZE')
+
+
+def sizes():
+    """{table: (table bytes, index bytes)} for the tables with key columns"""
+    result = {}
+    for table in UUID_COLUMNS:
+        result[table] = db.session.execute(db.text(
+            'SELECT pg_table_size(CAST(:table AS regclass)), pg_indexes_size(CAST(:table AS regclass))'
+        ), {'table': table}).one()
+    db.session.commit()
+    return result
+
+
+def median_ms(fn, runs):
+    fn()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    db.session.commit()
+    return statistics.median(times) * 1000
+
+
+def query_times(user_ids, runs):
+    """Median milliseconds of queries that join on the key columns"""
+    user_id = user_ids[len(user_ids) // 2]
+    # Untyped binds, so the same SQL runs against varchar and uuid keys
+    board_from_bets = db.text(
+        'SELECT u.username, b.user_id, COUNT(*), SUM(b.profit) FROM bets b '
+        'JOIN users u ON u.id = b.user_id JOIN games g ON g.id = b.game_id '
+        "WHERE g.game_time >= :start AND b.result <> 'PENDING' "
+        'GROUP BY u.username, b.user_id ORDER BY SUM(b.profit) DESC LIMIT 50'
+    )
+    history = db.text(
+        'SELECT b.*, g.away_team, g.home_team FROM bets b JOIN games g ON g.id = b.game_id '
+        'WHERE b.user_id = :user_id ORDER BY b.created_at DESC, b.id DESC LIMIT 50'
+    )
+    by_type = db.text(
+        'SELECT b.bet_type, COUNT(*), SUM(b.profit) FROM bets b JOIN games g ON g.id = b.game_id '
+        'WHERE b.user_id = :user_id GROUP BY b.bet_type'
+    )
+    start = datetime.utcnow() - timedelta(days=30)
+    return {
+        'leaderboard top 50 (all time)': median_ms(lambda: get_leaderboard_page('totalProfit', 1, None, 50), runs),
+        'leaderboard top 50 (30 days)': median_ms(lambda: get_leaderboard_page('totalProfit', 1, None, 50, '30d'), runs),
+        '30-day board from bets (3-way join)': median_ms(
+            lambda: db.session.execute(board_from_bets, {'start': start}).all(), max(runs // 4, 1)),
+        'bet history page (join games)': median_ms(
+            lambda: db.session.execute(history, {'user_id': user_id}).all(), runs),
+        'analytics by bet type (join games)': median_ms(
+            lambda: db.session.execute(by_type, {'user_id': user_id}).all(), runs),
+    }
+
+
+def mb(n):
+    return f'{n / 1024 / 1024:8.1f} MB'
+
+
+def report(columns):
+    labels = list(columns)
+    print(f'\n{"":24}' + ''.join(f'{label:>26}' for label in labels))
+    for table in UUID_COLUMNS:
+        cells = [f'{mb(columns[label]["sizes"][table][0])} + {mb(columns[label]["sizes"][table][1]).strip():>8} ix'
+                 for label in labels]
+        print(f'{table:24}' + ''.join(f'{cell:>26}' for cell in cells))
+    totals = [sum(data + index for data, index in columns[label]['sizes'].values()) for label in labels]
+    print(f'{"total":24}' + ''.join(f'{mb(total):>26}' for total in totals))
+    
+    print(f'\n{"":40}' + ''.join(f'{label:>22}' for label in labels))
+    for query in columns[labels[0]]['times']:
+        print(f'{query:40}' + ''.join(f'{columns[label]["times"][query]:>19.2f} ms' for label in labels))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--bets', type=int, default=500000)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+    
+    app = make_app(args.database_url)
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            print('❌ Key types only differ on Postgres; pass --database-url or set BENCH_DATABASE_URL')
+            sys.exit(2)
+        
+        db.session.close()
+        db.drop_all()
+        baseline = baseline_metadata()
+        baseline.create_all(db.engine)
+        print(f'🌱 Seeding {args.users} users, {args.games} games, {args.bets} bets with varchar(36) keys...')
+        user_ids = seed(baseline, args.users, args.games, args.bets)
+        with quiet():
+            migrate(stop_before='0005_uuid_keys')
+            reconcile()
+        vacuum()
+        
+        columns = {'varchar(36)': {'sizes': sizes(), 'times': query_times(user_ids, args.runs)}}
+        
+        start = time.perf_counter()
+        with quiet():
+            migrate(stop_before='0006_games_game_date')
+        print(f'🔧 Online migration to uuid keys: {time.perf_counter() - start:.1f}s')
+        with quiet():
+            migrate()
+        vacuum()
+        columns['uuid (migrated)'] = {'sizes': sizes(), 'times': query_times(user_ids, args.runs)}
+        
+        vacuum(full=True)
+        columns['uuid (VACUUM FULL)'] = {'sizes': sizes(), 'times': query_times(user_ids, args.runs)}
+        report(columns)
+        
+        db.session.close()
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Check the database-ranked leaderboard and benchmark it.
+
+Usage:
+    python -m benchmarks.leaderboard [--users 100000] [--window-bets 200000] [--database-url URL]
+
+1. Correctness: walks every page for each sort and a couple of min_bets
+   thresholds and compares order and competition ranks against a Python
+   sort of the whole table (the old get_leaderboard_data approach); also
+   checks get_user_rank for a sample of users. Stats are rounded so there
+   are plenty of ties, including across page boundaries.
+2. Speed: full Python sort vs top 10, a deep page and a rank lookup.
+3. Windows: places and grades bets on games spread over the last 60 days
+   (stats maintained by deltas), checks the daily buckets against
+   reconcile and every window's board against one computed from raw
+   bets, then times a 30-day board from buckets vs from bets.
+"""
+
+import argparse
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from benchmarks.common import make_app, timed, quiet, seed_users, seed_bets
+from grading import grade_pending_bets
+from leaderboard import get_leaderboard_page, get_user_rank, window_start, SORTS, WINDOWS, _entry, _metric
+from models import db, User, Game, Bet, UserStats
+from user_stats import refresh_rates, reconcile, game_day
+
+
+def seed_stats(user_ids, seed=5):
+    """A user_stats row per user with coarse values, so ties are common"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    rows = []
+    for user_id in user_ids:
+        won, lost, push = rng.randint(0, 20), rng.randint(0, 20), rng.randint(0, 3)
+        pending = rng.randint(0, 5)
+        rows.append({
+            'user_id': user_id,
+            'total_bets': won + lost + push + pending,
+            'pending_bets': pending,
+            'won_bets': won,
+            'lost_bets': lost,
+            'push_bets': push,
+            'total_staked': float(won + lost + push + pending),
+            'total_profit': float(rng.randint(-20, 20)),
+            'updated_at': now
+        })
+    for i in range(0, len(rows), 10000):
+        db.session.execute(db.insert(UserStats), rows[i:i + 10000])
+    refresh_rates()
+    db.session.commit()
+    # Planner statistics, as autovacuum would have gathered on a live table
+    db.session.execute(db.text('ANALYZE'))
+    db.session.commit()
+
+
+def python_leaderboard(sort, min_bets):
+    """Every qualifying user sorted in Python, with competition ranks"""
+    rows = db.session.query(
+        User.username, UserStats.user_id, UserStats.total_bets, UserStats.won_bets, UserStats.lost_bets,
+        UserStats.total_staked, UserStats.total_profit, _metric(sort).label('metric')
+    ).join(User, User.id == UserStats.user_id)\
+     .filter(UserStats.total_bets >= max(min_bets, 1))\
+     .all()
+    rows.sort(key=lambda row: (row.metric, row.user_id), reverse=True)
+    
+    entries = []
+    for i, row in enumerate(rows):
+        rank = entries[-1].rank if entries and row.metric == rows[i - 1].metric else i + 1
+        entries.append(_entry(row, rank))
+    return entries
+
+
+def check_correctness(page_size):
+    failures = 0
+    for sort in SORTS:
+        for min_bets in (1, 25):
+            expected = python_leaderboard(sort, min_bets)
+            actual, cursor = [], None
+            while True:
+                page = get_leaderboard_page(sort, min_bets, cursor, page_size)
+                actual.extend(page.entries)
+                cursor = page.nextCursor
+                if not cursor:
+                    break
+            
+            if actual != expected:
+                failures += 1
+                diff = next((i for i, (a, b) in enumerate(zip(actual, expected)) if a != b), min(len(actual), len(expected)))
+                print(f'❌ {sort} min_bets={min_bets}: first difference at position {diff} '
+                      f'({len(actual)} vs {len(expected)} entries)')
+                continue
+            
+            for entry in expected[::max(1, len(expected) // 50)]:
+                user_id = User.query.filter_by(username=entry.username).first().id
+                if get_user_rank(user_id, sort, min_bets) != entry:
+                    failures += 1
+                    print(f'❌ {sort} min_bets={min_bets}: get_user_rank wrong for {entry.username}')
+                    break
+    
+    if failures:
+        print(f'❌ Leaderboard check failed ({failures} problems)')
+        sys.exit(1)
+    print(f'✅ Pages and ranks match a full Python sort for {", ".join(SORTS)}')
+
+
+def benchmark(user_ids):
+    results = {}
+    with timed('full table sorted in Python', results):
+        python_leaderboard('totalProfit', 1)
+    with timed('top 10', results):
+        get_leaderboard_page('totalProfit', 1, None, 10)
+    
+    # Jump deep into the list, then time fetching the page after it
+    deep = get_leaderboard_page('roi', 1, None, len(user_ids) * 3 // 4).nextCursor
+    with timed('page 50 rows deep in the list (roi)', results):
+        get_leaderboard_page('roi', 1, deep, 50)
+    with timed('get_user_rank', results):
+        get_user_rank(user_ids[len(user_ids) // 2], 'winRate', 1)
+
+
+def python_window_board(window, sort):
+    """A window's board computed the slow way, from every bet"""
+    start = window_start(window)
+    rows = db.session.query(
+        User.username, Bet.user_id, Bet.result, Bet.stake, Bet.profit, Game.game_time
+    ).join(User, User.id == Bet.user_id).join(Game, Game.id == Bet.game_id).all()
+    
+    totals = {}
+    for row in rows:
+        if start and game_day(row.game_time) < start:
+            continue
+        user = totals.setdefault(row.user_id, SimpleNamespace(
+            username=row.username, user_id=row.user_id, total_bets=0, won_bets=0, lost_bets=0,
+            total_staked=0.0, total_profit=0.0))
+        user.total_bets += 1
+        user.won_bets += row.result == 'WON'
+        user.lost_bets += row.result == 'LOST'
+        user.total_staked += row.stake
+        user.total_profit += row.profit or 0
+    
+    ranked = sorted(((_entry(user, None), user.user_id) for user in totals.values()),
+                    key=lambda pair: (round(getattr(pair[0], sort), 6), pair[1]), reverse=True)
+    return [entry for entry, user_id in ranked]
+
+
+def check_windows(bets, users):
+    today = datetime.utcnow().replace(hour=23, minute=0, second=0, microsecond=0)
+    games = [
+        Game(id=str(uuid.uuid4()), external_id=f'game-{i}', game_time=today - timedelta(days=i % 60, hours=i % 7),
+             away_team='Away U', home_team='Home St', away_score=60 + i % 13, home_score=66, is_completed=True)
+        for i in range(max(1, bets // 50))
+    ]
+    db.session.add_all(games)
+    db.session.commit()
+    user_ids = seed_users(users)
+    games = Game.query.all()
+    seed_bets(games, user_ids, 50)
+    with quiet():
+        grade_pending_bets(db, games)
+    db.session.commit()
+    
+    with quiet():
+        drift = reconcile(fix=False)
+    if drift:
+        print(f'❌ Stats maintained by deltas drifted from the bets table ({len(drift)} counters)')
+        sys.exit(1)
+    
+    for window in WINDOWS:
+        for sort in SORTS:
+            expected = python_window_board(window, sort)
+            actual, cursor = [], None
+            while True:
+                page = get_leaderboard_page(sort, 1, cursor, 200, window)
+                actual.extend(page.entries)
+                cursor = page.nextCursor
+                if not cursor:
+                    break
+            
+            same_order = [e.username for e in actual] == [e.username for e in expected]
+            same_values = all(abs(getattr(a, sort) - getattr(e, sort)) < 1e-6 and a.totalBets == e.totalBets
+                              for a, e in zip(actual, expected))
+            if not (same_order and same_values):
+                print(f'❌ {window} by {sort}: board differs from one built from raw bets')
+                sys.exit(1)
+    print(f'✅ Daily buckets match the bets table; {", ".join(WINDOWS)} boards match raw bets')
+    
+    results = {}
+    with timed('30-day board from raw bets', results):
+        python_window_board('30d', 'totalProfit')
+    with timed('30-day board from daily buckets (top 50)', results):
+        get_leaderboard_page('totalProfit', 1, None, 50, '30d')
+    with timed('30-day rank lookup', results):
+        get_user_rank(user_ids[0], 'roi', 1, '30d')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--check-users', type=int, default=3000)
+    parser.add_argument('--window-bets', type=int, default=200000)
+    parser.add_argument('--window-users', type=int, default=2000)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+    
+    app = make_app(args.database_url)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed_stats(seed_users(args.check_users))
+        check_correctness(page_size=37)
+        
+        db.session.query(UserStats).delete()
+        db.session.query(User).delete()
+        db.session.commit()
+        user_ids = seed_users(args.users)
+        seed_stats(user_ids)
+        benchmark(user_ids)
+        db.session.close()
+        db.drop_all()
+        
+        if args.window_bets:
+            db.create_all()
+            check_windows(args.window_bets, args.window_users)
+            db.session.close()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark placing a slip of bets one request per bet vs one bulk request.
+
+Usage:
+    python -m benchmarks.placement [--legs 50] [--slips 20] [--database-url URL]
+
+Each slip is booked three ways for its own user:
+
+- per bet: what api_place_bet did for every bet before placement.py
+  (Game.query.get, add, stats deltas, commit), one round of it per leg
+- bulk: placement.place_bets on the whole slip, one game query and one
+  transaction
+- retry: the same bulk request again with the same Idempotency-Key,
+  which must book nothing and return the original bet ids
+
+then sends each slip's key once more with one leg's stake changed, which
+must be refused (422) without booking anything.
+
+Reports time and SQL statements per slip, then checks the stats tables
+against the bets table (reconcile --check).
+"""
+
+import argparse
+import random
+import sys
+import uuid
+
+from benchmarks.board import seed as seed_games, by_game_date
+from benchmarks.common import make_app, timed, quiet, seed_users, random_bet
+from migrations import migrate
+from models import db, Bet, Game
+from placement import parse_slip, place_bets, PlacementError
+from user_stats import apply_bet_changes, bet_state, reconcile
+
+
+def request_leg(row):
+    """A random_bet row as the JSON the client sends"""
+    return {'gameId': row['game_id'], 'betType': row['bet_type'], 'team': row['team'],
+            'line': row['line'], 'odds': row['odds'], 'stake': row['stake']}
+
+
+def place_one_by_one(user_id, items):
+    """api_place_bet before placement.py, once per leg"""
+    for item in items:
+        game = Game.query.get(item['gameId'])
+        bet = Bet(id=str(uuid.uuid4()), user_id=user_id, game_id=item['gameId'],
+                  bet_type=item['betType'], team=item['team'], line=item['line'],
+                  odds=int(item['odds']), stake=float(item['stake']))
+        db.session.add(bet)
+        apply_bet_changes([(None, bet_state(bet, game))])
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--legs', type=int, default=50)
+    parser.add_argument('--slips', type=int, default=20)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+    
+    app = make_app(args.database_url)
+    rng = random.Random(17)
+    failures = 0
+    with app.app_context():
+        db.session.close()
+        db.drop_all()
+        with quiet():
+            migrate()
+            seed_games(1400)
+        games = by_game_date()
+        user_ids = seed_users(2 * args.slips)
+        slips = [[request_leg(random_bet(rng, None, rng.choice(games))) for _ in range(args.legs)]
+                 for _ in range(args.slips)]
+        
+        results = {}
+        with timed('per bet', results) as per_bet:
+            for user_id, items in zip(user_ids[:args.slips], slips):
+                place_one_by_one(user_id, items)
+        with timed('bulk', results) as bulk:
+            placed = [place_bets(user_id, parse_slip(items, f'slip-{i}'))
+                      for i, (user_id, items) in enumerate(zip(user_ids[args.slips:], slips))]
+        with timed('retry', results) as retry:
+            replayed = [place_bets(user_id, parse_slip(items, f'slip-{i}'))
+                        for i, (user_id, items) in enumerate(zip(user_ids[args.slips:], slips))]
+        
+        refused = 0
+        for i, (user_id, items) in enumerate(zip(user_ids[args.slips:], slips)):
+            changed = items[:-1] + [dict(items[-1], stake=items[-1]['stake'] + 1)]
+            try:
+                place_bets(user_id, parse_slip(changed, f'slip-{i}'))
+            except PlacementError as e:
+                db.session.rollback()
+                refused += e.status == 422
+        
+        print(f'📊 {args.slips} slips of {args.legs} bets:')
+        for label, counter in (('per bet', per_bet), ('bulk', bulk), ('retry', retry)):
+            print(f'   {label:8} {results[label]["seconds"] / args.slips * 1000:8.1f} ms'
+                  f'{counter["statements"] / args.slips:8.1f} statements per slip')
+        
+        if any(bet.created for slip in replayed for bet in slip) or \
+                [[bet.bet_id for bet in slip] for slip in replayed] != [[bet.bet_id for bet in slip] for slip in placed]:
+            print('❌ Retried slips booked new bets')
+            failures += 1
+        if refused != args.slips:
+            print(f'❌ {args.slips - refused} slips reusing a key for a different bet were not refused')
+            failures += 1
+        if db.session.query(Bet).count() != 2 * args.slips * args.legs:
+            print('❌ Wrong number of bets booked')
+            failures += 1
+        with quiet():
+            drift = reconcile(fix=False)
+        if drift:
+            print(f'❌ {len(drift)} drifted stats counters')
+            failures += 1
+        
+        db.session.close()
+        db.drop_all()
+    
+    if failures:
+        sys.exit(1)
+    print('✅ Retries book nothing twice, reused keys are refused and stats match the bets table')
+
+
+if __name__ == '__main__':
+    main()
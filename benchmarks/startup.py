@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark worker cold start: importing the app, building it and serving the first request.
+
+Usage:
+    python -m benchmarks.startup [--runs 10] [--path /] [--database-url URL]
+
+Migrates a scratch database once, then starts a fresh interpreter per
+run (as a newly autoscaled worker would) that times `import app`,
+create_app() and the first and second GET of --path through the test
+client, and reports the median of each. It also lists modules the web
+path should never load (APScheduler, the Odds API client), so a stray
+top-level import shows up here before it shows up as slower deploys.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import make_app, quiet
+from migrations import migrate
+from models import db
+
+# Only the scheduler leader needs these
+LAZY_MODULES = ['apscheduler', 'odds_api', 'requests', 'numpy', 'grading']
+
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+application = module.create_app()
+created = time.perf_counter()
+client = application.test_client()
+status = client.get(sys.argv[1]).status_code
+first = time.perf_counter()
+client.get(sys.argv[1])
+second = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "create_app": created - imported,
+    "first_request": first - created,
+    "second_request": second - first,
+    "status": status,
+    "loaded": [name for name in sys.argv[2:] if name in sys.modules]
+}))
+'''
+
+
+def run_once(path, env):
+    """One cold start in a fresh interpreter; returns its timings"""
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD, path, *LAZY_MODULES],
+        env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+    
+    app = make_app(args.database_url)
+    with app.app_context():
+        with quiet():
+            migrate()
+        database_url = db.engine.url.render_as_string(hide_password=False)
+        db.session.close()
+    
+    env = dict(os.environ, DATABASE_URL=database_url, SCHEDULER_ENABLED='false',
+               CACHE_DIR=tempfile.mkdtemp(prefix='spreadsheet-startup-cache-'),
+               PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get('PYTHONPATH')])))
+    # Warm the OS file cache and .pyc files, so every run measures the same thing
+    run_once(args.path, env)
+    
+    runs = [run_once(args.path, env) for _ in range(args.runs)]
+    statuses = sorted({run['status'] for run in runs})
+    print(f'🚀 Cold start, GET {args.path} (HTTP {", ".join(map(str, statuses))}), median of {args.runs} runs:')
+    for step in ('import', 'create_app', 'first_request', 'second_request'):
+        print(f'   {step:16} {statistics.median(run[step] for run in runs) * 1000:8.1f} ms')
+    ready = statistics.median(run['import'] + run['create_app'] + run['first_request'] for run in runs)
+    print(f'   {"ready to serve":16} {ready * 1000:8.1f} ms')
+    
+    loaded = sorted({name for run in runs for name in run['loaded']})
+    with app.app_context():
+        db.session.close()
+        db.drop_all()
+    if loaded:
+        print(f'❌ Loaded on the web path: {", ".join(loaded)}')
+        sys.exit(1)
+    print('✅ Scheduler and Odds API modules stay unloaded')
+
+
+if __name__ == '__main__':
+    main()
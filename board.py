@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Homepage board snapshot.
+
+board_games holds one flat row per game that hasn't tipped off yet:
+teams, time, Eastern date, scores and the best line for every market,
+copied from games and best_odds. parse_and_save_odds and grading rebuild
+it inside their own transaction, so readers see the old snapshot or the
+new one, never a mix. The homepage reads the board with a single query
+against it and never touches Game or its relationships.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert, delete
+
+from models import db, Game, BestOdds, BoardGame
+from records import BoardEntry
+
+GAME_FIELDS = ('game_time', 'game_date', 'away_team', 'home_team', 'away_score', 'home_score', 'is_completed')
+
+# Every best_odds price and book column
+LINE_FIELDS = tuple(column.name for column in BestOdds.__table__.columns if column.name not in ('game_id', 'updated_at'))
+
+# Games shown at most, and how far ahead the board looks for the next date with games
+BOARD_LIMIT = 200
+BOARD_DAYS = 7
+
+
+def rebuild_board(now=None):
+    """Replace the snapshot with every game still to tip off (in the caller's transaction)
+    
+    One DELETE and one INSERT ... SELECT; returns the number of rows written.
+    """
+    now = now or datetime.utcnow()
+    rows = select(
+        Game.id,
+        *[getattr(Game, field) for field in GAME_FIELDS],
+        BestOdds.game_id.isnot(None),
+        *[getattr(BestOdds, field) for field in LINE_FIELDS]
+    ).outerjoin(BestOdds, BestOdds.game_id == Game.id).where(Game.game_time >= now)
+    
+    db.session.execute(delete(BoardGame))
+    result = db.session.execute(
+        insert(BoardGame).from_select(['game_id', *GAME_FIELDS, 'has_odds', *LINE_FIELDS], rows)
+    )
+    return result.rowcount
+
+
+def get_board(now=None, days=BOARD_DAYS, limit=BOARD_LIMIT):
+    """Games still to come on the next Eastern date that has any within `days`, in tip-off order
+    
+    One query: the date comes from a subquery on the next tip-off, both
+    served by the snapshot's indexes.
+    """
+    now = now or datetime.utcnow()
+    next_date = select(BoardGame.game_date).where(
+        BoardGame.game_time >= now,
+        BoardGame.game_time <= now + timedelta(days=days)
+    ).order_by(BoardGame.game_time).limit(1).scalar_subquery()
+    
+    # Compact records, not BoardGame instances: nothing to attach to a session or pickle
+    columns = [BoardGame.__table__.c[field] for field in BoardEntry._fields]
+    rows = db.session.execute(
+        select(*columns).where(BoardGame.game_date == next_date, BoardGame.game_time >= now)
+        .order_by(BoardGame.game_time).limit(limit)
+    )
+    return [BoardEntry._make(row) for row in rows]
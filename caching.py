@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Shared cache and tag-based invalidation.
+
+The cache lives outside the worker processes (Redis, or a directory on
+disk), so every gunicorn worker sees the same entries and an invalidation
+in one worker reaches all of them.
+
+Cached values carry tags: user:<id>, leaderboard, games:<date>, games.
+Each tag has a version token stored in the cache; an entry remembers the
+versions of its tags when it was computed and is treated as a miss once
+any of them has moved on. invalidate('user:123') therefore drops every
+entry built from that user's data, and nothing else, without having to
+know the keys.
+
+A memoized helper tags its entry by calling tag(...) before it reads
+anything, so an invalidation that lands mid-computation still expires the
+result. Tags of tagged helpers it calls are inherited, so the cached
+homepage is invalidated by whatever invalidates the games and leaderboard
+it shows.
+
+Expiry by time is soft (stale-while-revalidate): the old value keeps
+being served while a single worker recomputes it in the background.
+Concurrent misses on one key share a single computation. Per-key hit,
+miss and recompute-time counters are kept for each worker (cache_stats).
+
+The cross-worker locks behind that (and behind creating a tag's first
+token) must be atomic: on Redis they are SET NX (cache.add). On the file
+cache add() checks and then writes, so two workers could both win; there
+they are O_CREAT|O_EXCL files in a directory next to CACHE_DIR instead.
+
+warm_up() recomputes a list of helpers right after a scheduled job has
+invalidated them, so no visitor pays for the rebuild.
+"""
+
+import functools
+import hashlib
+import inspect
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from flask import current_app, has_request_context, copy_current_request_context
+from flask_caching import Cache
+
+cache = Cache()
+
+DEFAULT_TIMEOUT = 300
+# Seconds a recompute may hold a key's cross-worker lock, and how long other workers wait on it
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5
+
+# Directory of lock files when the cache is on disk (set by init_cache); None uses cache.add
+_lock_dir = None
+
+# {tag: version} of the entries currently being computed on this thread (innermost last)
+_collecting = threading.local()
+
+# In-flight computations in this process, by key
+_flights = {}
+_flights_lock = threading.Lock()
+
+# Background stale-while-revalidate refreshes
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-refresh')
+
+# Per-key counters for this process (see cache_stats)
+_stats = {}
+_stats_lock = threading.Lock()
+_last_warm_up = {}
+
+# Tag names
+LEADERBOARD = 'leaderboard'
+GAMES = 'games'
+
+
+def user_tag(user_id):
+    return f'user:{user_id}'
+
+
+def games_tag(day):
+    """Games on one US Eastern calendar date"""
+    return f'games:{day.isoformat()}'
+
+
+def init_cache(app):
+    """Bind the shared cache to the app using the REDIS_URL / CACHE_* settings"""
+    config = {
+        'CACHE_DEFAULT_TIMEOUT': app.config.get('CACHE_DEFAULT_TIMEOUT', 300),
+        'CACHE_KEY_PREFIX': 'spreadsheet:'
+    }
+    if app.config.get('REDIS_URL'):
+        config.update(CACHE_TYPE='RedisCache', CACHE_REDIS_URL=app.config['REDIS_URL'])
+    else:
+        config.update(
+            CACHE_TYPE=app.config.get('CACHE_TYPE', 'FileSystemCache'),
+            CACHE_DIR=app.config.get('CACHE_DIR'),
+            CACHE_THRESHOLD=app.config.get('CACHE_THRESHOLD', 10000)
+        )
+    cache.init_app(app, config=config)
+    
+    global _lock_dir
+    _lock_dir = None
+    if config['CACHE_TYPE'] == 'FileSystemCache':
+        # Beside the cache directory, not in it: FileSystemCache reads every file there as an entry
+        _lock_dir = os.path.abspath(config['CACHE_DIR']).rstrip(os.sep) + '.locks'
+        os.makedirs(_lock_dir, exist_ok=True)
+
+
+def _lock_path(name):
+    return os.path.join(_lock_dir, hashlib.sha1(name.encode('utf-8')).hexdigest())
+
+
+def _acquire(name, timeout=LOCK_TIMEOUT):
+    """Take the cross-worker lock `name` if nobody holds it; False otherwise
+    
+    A lock file older than timeout was left by a holder that died and is
+    taken over.
+    """
+    if _lock_dir is None:
+        return cache.add(f'lock:{name}', 1, timeout=timeout)
+    
+    path = _lock_path(name)
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < timeout:
+                    return False
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def _release(name):
+    if _lock_dir is None:
+        cache.delete(f'lock:{name}')
+        return
+    try:
+        os.unlink(_lock_path(name))
+    except FileNotFoundError:
+        pass
+
+
+def _held(name, timeout=LOCK_TIMEOUT):
+    """Whether another holder has the lock `name` right now"""
+    if _lock_dir is None:
+        return cache.get(f'lock:{name}') is not None
+    try:
+        return time.time() - os.path.getmtime(_lock_path(name)) < timeout
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def _exclusive(name):
+    """Hold the lock `name` for a few cache operations, waiting up to LOCK_WAIT for it"""
+    deadline = time.monotonic() + LOCK_WAIT
+    locked = _acquire(name, timeout=LOCK_WAIT)
+    while not locked and time.monotonic() < deadline:
+        time.sleep(0.01)
+        locked = _acquire(name, timeout=LOCK_WAIT)
+    try:
+        yield
+    finally:
+        if locked:
+            _release(name)
+
+
+def _tag_versions(tags):
+    """Current version token of each tag, giving never-seen (or evicted) tags a fresh one"""
+    tags = sorted(tags)
+    if not tags:
+        return {}
+    
+    versions = dict(zip(tags, cache.get_many(*[f'tag:{t}' for t in tags])))
+    for t, version in versions.items():
+        if version is None:
+            # Under the tag's lock, so concurrent workers agree on one token
+            with _exclusive(f'tag:{t}'):
+                cache.add(f'tag:{t}', uuid.uuid4().hex, timeout=0)
+                versions[t] = cache.get(f'tag:{t}')
+    return versions
+
+
+def invalidate(*tags):
+    """Expire every cached entry carrying any of these tags"""
+    if tags:
+        cache.set_many({f'tag:{t}': uuid.uuid4().hex for t in tags}, timeout=0)
+
+
+def tag(*tags):
+    """Tag the entry being computed by the enclosing memoized helper (and its callers)"""
+    stack = getattr(_collecting, 'stack', None)
+    if stack:
+        _inherit(_tag_versions([t for t in tags if t not in stack[-1]]))
+
+
+def _inherit(versions):
+    """Pass tag versions (as read before computing) on to the enclosing entry"""
+    stack = getattr(_collecting, 'stack', None)
+    if stack:
+        for t, version in versions.items():
+            stack[-1].setdefault(t, version)
+
+
+def _make_key(f, signature, args, kwargs):
+    """Cache key and a readable label for one call"""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = ', '.join(f'{name}={value!r}' for name, value in bound.arguments.items())
+    digest = hashlib.md5(arguments.encode()).hexdigest()
+    return f'memo:{f.__module__}.{f.__qualname__}:{digest}', f'{f.__qualname__}({arguments})'[:200]
+
+
+def _record(label, event, seconds=None):
+    """Bump this process's counters for a key"""
+    with _stats_lock:
+        counters = _stats.get(label)
+        if counters is None:
+            counters = _stats[label] = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0,
+                                        'recomputes': 0, 'recompute_seconds': 0.0, 'max_recompute_seconds': 0.0}
+        counters[event] += 1
+        if seconds is not None:
+            counters['recompute_seconds'] += seconds
+            counters['max_recompute_seconds'] = max(counters['max_recompute_seconds'], seconds)
+
+
+def cache_stats():
+    """Per-key counters for this worker process, busiest keys first"""
+    with _stats_lock:
+        keys = {label: dict(counters) for label, counters in _stats.items()}
+    return {
+        'pid': os.getpid(),
+        'last_warm_up': dict(_last_warm_up),
+        'keys': dict(sorted(keys.items(), key=lambda item: -(item[1]['misses'] + item[1]['stale_hits'])))
+    }
+
+
+def _in_context(fn):
+    """Wrap fn to run on another thread inside a copy of the current request or app context"""
+    if has_request_context():
+        return copy_current_request_context(fn)
+    app = current_app._get_current_object()
+    
+    def run():
+        with app.app_context():
+            return fn()
+    return run
+
+
+def _single_flight(key, compute):
+    """Run compute once per key at a time in this process; concurrent callers share the result"""
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Future()
+    if not leader:
+        return flight.result(), True
+    
+    try:
+        result = compute()
+    except BaseException as e:
+        flight.set_exception(e)
+        raise
+    else:
+        flight.set_result(result)
+        return result, False
+    finally:
+        with _flights_lock:
+            del _flights[key]
+
+
+def _wait_for_other_worker(key):
+    """Another worker holds the recompute lock: wait briefly for its fresh entry"""
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline and _held(key):
+        time.sleep(0.05)
+    entry = cache.get(key)
+    if entry is not None and len(entry) == 3 and _tag_versions(entry[1]) == entry[1]:
+        return entry[0], entry[1]
+    return None
+
+
+def memoize(timeout=None, stale_for=None, codec=None):
+    """Cache a function's result per arguments in the shared cache, invalidated by tags
+    
+    An entry is fresh for `timeout` seconds. For `stale_for` seconds after
+    that (default: timeout again) it is still served while one worker
+    recomputes it in the background, so expiry never makes a request wait.
+    An invalidated tag is always a hard miss. Misses are coalesced: one
+    computation per key per process, and across workers a lock in the
+    cache makes the others wait up to LOCK_WAIT seconds for its result.
+    codec (a records.Codec) packs the value for the cache and unpacks it
+    on a hit.
+    """
+    pack, unpack = codec or (None, None)
+    
+    def decorator(f):
+        signature = inspect.signature(f)
+        fresh_for = timeout or DEFAULT_TIMEOUT
+        keep_for = fresh_for + (fresh_for if stale_for is None else stale_for)
+        
+        def compute(key, label, args, kwargs):
+            if not hasattr(_collecting, 'stack'):
+                _collecting.stack = []
+            _collecting.stack.append({})
+            start = time.perf_counter()
+            try:
+                value = f(*args, **kwargs)
+            finally:
+                versions = _collecting.stack.pop()
+            _record(label, 'recomputes', time.perf_counter() - start)
+            
+            cache.set(key, (pack(value) if pack else value, versions, time.time() + fresh_for), timeout=keep_for)
+            return value, versions
+        
+        def locked_compute(key, label, args, kwargs):
+            locked = _acquire(key)
+            if not locked:
+                result = _wait_for_other_worker(key)
+                if result is not None:
+                    return (unpack(result[0]) if unpack else result[0]), result[1]
+            try:
+                return compute(key, label, args, kwargs)
+            finally:
+                if locked:
+                    _release(key)
+        
+        def refresh_in_background(key, label, args, kwargs):
+            with _flights_lock:
+                if key in _flights:
+                    return
+            # Only the worker that wins the lock refreshes; everyone else keeps serving stale
+            if not _acquire(key):
+                return
+            
+            def refresh():
+                try:
+                    _single_flight(key, lambda: compute(key, label, args, kwargs))
+                except Exception as e:
+                    print(f'❌ Background refresh of {label} failed: {e}')
+                finally:
+                    _release(key)
+            _refresh_pool.submit(_in_context(refresh))
+        
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            key, label = _make_key(f, signature, args, kwargs)
+            
+            entry = cache.get(key)
+            if entry is not None and len(entry) == 3:
+                value, versions, fresh_until = entry
+                if _tag_versions(versions) == versions:
+                    _inherit(versions)
+                    if time.time() < fresh_until:
+                        _record(label, 'hits')
+                    else:
+                        _record(label, 'stale_hits')
+                        refresh_in_background(key, label, args, kwargs)
+                    return unpack(value) if unpack else value
+            
+            _record(label, 'misses')
+            (value, versions), coalesced = _single_flight(key, lambda: locked_compute(key, label, args, kwargs))
+            if coalesced:
+                _record(label, 'coalesced')
+            _inherit(versions)
+            return value
+        
+        return wrapper
+    return decorator
+
+
+def warm_up(calls, seconds=20, workers=4):
+    """Call memoized helpers so their entries are rebuilt before anyone asks
+    
+    calls is a list of (function, args) pairs. At most `workers` run at
+    once; anything not finished within `seconds` is abandoned (it will be
+    computed on demand instead). Returns a summary and keeps it for
+    cache_stats.
+    """
+    start = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cache-warm-up')
+    futures = [pool.submit(_in_context(functools.partial(f, *args))) for f, args in calls]
+    done, not_done = wait(futures, timeout=seconds)
+    for future in not_done:
+        future.cancel()
+    pool.shutdown(wait=False)
+    
+    failed = [future for future in done if future.exception() is not None]
+    for future in failed[:3]:
+        print(f'❌ Cache warm-up call failed: {future.exception()}')
+    
+    summary = {
+        'at': time.time(),
+        'calls': len(calls),
+        'warmed': len(done) - len(failed),
+        'failed': len(failed),
+        'skipped': len(not_done),
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+    _last_warm_up.clear()
+    _last_warm_up.update(summary)
+    print(f'🔥 Cache warm-up: {summary["warmed"]}/{len(calls)} entries in {summary["seconds"]:.2f}s'
+          + (f' ({summary["skipped"]} skipped, time limit hit)' if not_done else ''))
+    return summary
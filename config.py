@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,14 +20,47 @@ class Config:
     
     # Odds API
     ODDS_API_KEY = os.environ.get('ODDS_API_KEY')
-    ODDS_API_BASE_URL = 'https://api.the-odds-api.com/v4'
+    ODDS_API_BASE_URL = os.environ.get('ODDS_API_BASE_URL', 'https://api.the-odds-api.com/v4')
+    # Offline stand-in for load testing (see odds_replay.py), e.g. synthetic:games=10000,bookmakers=20
+    ODDS_API_TRANSPORT = os.environ.get('ODDS_API_TRANSPORT')
+    
+    ODDS_API_TIMEOUT = float(os.environ.get('ODDS_API_TIMEOUT', 10))  # seconds per request
+    ODDS_API_MAX_RETRIES = int(os.environ.get('ODDS_API_MAX_RETRIES', 3))
+    ODDS_API_BACKOFF = float(os.environ.get('ODDS_API_BACKOFF', 0.5))  # base seconds, doubled per retry
+    ODDS_API_MAX_WORKERS = int(os.environ.get('ODDS_API_MAX_WORKERS', 4))
     
     # Sports
     DEFAULT_SPORT = 'basketball_ncaab'
+    # Comma-separated sport keys fetched on each run, e.g.
+    # basketball_ncaab,americanfootball_ncaaf,basketball_nba,americanfootball_nfl
+    ODDS_SPORTS = [s.strip() for s in os.environ.get('ODDS_SPORTS', DEFAULT_SPORT).split(',') if s.strip()]
+    
+    # Cache shared by every gunicorn worker: Redis when REDIS_URL is set, otherwise a
+    # directory on local disk (fine for a single host; SimpleCache is per-process)
+    REDIS_URL = os.environ.get('REDIS_URL')
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'FileSystemCache')
+    CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'spreadsheet-cache'))
+    CACHE_THRESHOLD = int(os.environ.get('CACHE_THRESHOLD', 10000))  # max entries before FileSystemCache prunes
+    CACHE_DEFAULT_TIMEOUT = 300  # 5 minutes default
+    # Rebuilding caches at the end of scheduled jobs: wall-clock limit and parallel helpers
+    CACHE_WARMUP_SECONDS = float(os.environ.get('CACHE_WARMUP_SECONDS', 20))
+    CACHE_WARMUP_WORKERS = int(os.environ.get('CACHE_WARMUP_WORKERS', 4))
     
     # Scheduler
     SCHEDULER_API_ENABLED = True
     SCHEDULER_TIMEZONE = 'America/New_York'
+    # Whether web workers stand for scheduler leadership (one of them runs the jobs).
+    # Set to false when the jobs run in their own process (python run_scheduler.py)
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    SCHEDULER_LEADER_INTERVAL = int(os.environ.get('SCHEDULER_LEADER_INTERVAL', 15))  # seconds between lock checks
+    SCHEDULER_LOCK_DIR = os.environ.get('SCHEDULER_LOCK_DIR', tempfile.gettempdir())  # file lock when not on Postgres
+    
+    # Adaptive polling: credits we allow ourselves per calendar month, and a reserve we never touch
+    ODDS_API_MONTHLY_BUDGET = int(os.environ.get('ODDS_API_MONTHLY_BUDGET', 500))
+    ODDS_API_RESERVE = int(os.environ.get('ODDS_API_RESERVE', 10))
+    SCORES_LIVE_INTERVAL = int(os.environ.get('SCORES_LIVE_INTERVAL', 5))  # minutes between score polls during games
+    GAME_DURATION_HOURS = float(os.environ.get('GAME_DURATION_HOURS', 3))  # how long after tip-off a game counts as live
+    GRADING_BATCH_SIZE = int(os.environ.get('GRADING_BATCH_SIZE', 500))  # games reconciled per transaction
     
     # Production settings
     if FLASK_ENV == 'production':
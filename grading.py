@@ -1,3 +1,8 @@
+import numpy as np
+from datetime import datetime
+from sqlalchemy import select, text
+
+
 def calculate_profit(stake, odds, won=True):
     """Calculate profit from American odds"""
     if not won:
@@ -103,3 +108,347 @@ def grade_bet(bet, game):
     
     print(f'✅ Graded bet {bet.id}: {bet.result} (profit: ${bet.profit})')
 
+
+# ==================== BATCH GRADING ====================
+
+# Integer codes used by the vectorized engine
+BET_TYPES = {'ML': 0, 'SPREAD': 1, 'TOTAL_OVER': 2, 'TOTAL_UNDER': 3}
+PENDING, WON, LOST, PUSH = 0, 1, 2, 3
+RESULT_NAMES = {WON: 'WON', LOST: 'LOST', PUSH: 'PUSH'}
+SIDE_AWAY, SIDE_HOME, SIDE_NONE = 0, 1, -1
+
+# Bets per bulk UPDATE statement
+UPDATE_BATCH_SIZE = 5000
+
+
+def grade_arrays(bet_type, side, line, odds, stake, away_score, home_score):
+    """Vectorized grade_bet over parallel arrays, one element per bet
+    
+    bet_type holds BET_TYPES codes, side SIDE_* codes, and line is NaN where
+    the bet has no line. Returns (result codes, profit); bets grade_bet
+    would leave untouched come back as PENDING with NaN profit.
+    """
+    n = len(bet_type)
+    result = np.full(n, PENDING, dtype=np.int8)
+    
+    on_team = (side == SIDE_AWAY) | (side == SIDE_HOME)
+    has_line = ~np.isnan(line)
+    own_score = np.where(side == SIDE_AWAY, away_score, home_score)
+    other_score = np.where(side == SIDE_AWAY, home_score, away_score)
+    total_score = away_score + home_score
+    
+    # Moneyline: a tie loses both sides, exactly like grade_bet
+    ml = (bet_type == BET_TYPES['ML']) & on_team
+    result[ml] = np.where(own_score[ml] > other_score[ml], WON, LOST)
+    
+    # Spread
+    spread = (bet_type == BET_TYPES['SPREAD']) & on_team & has_line
+    covered = own_score[spread] + line[spread]
+    result[spread] = np.select(
+        [covered > other_score[spread], covered == other_score[spread]], [WON, PUSH], LOST
+    )
+    
+    # Totals
+    over = (bet_type == BET_TYPES['TOTAL_OVER']) & has_line
+    result[over] = np.select(
+        [total_score[over] > line[over], total_score[over] == line[over]], [WON, PUSH], LOST
+    )
+    under = (bet_type == BET_TYPES['TOTAL_UNDER']) & has_line
+    result[under] = np.select(
+        [total_score[under] < line[under], total_score[under] == line[under]], [WON, PUSH], LOST
+    )
+    
+    # grade_bet raises ZeroDivisionError on a winning bet at odds 0, so it never gets graded
+    result[(result == WON) & (odds == 0)] = PENDING
+    
+    # Same arithmetic (and operation order) as calculate_profit, so floats match bit for bit
+    profit = np.full(n, np.nan)
+    won_plus = (result == WON) & (odds > 0)
+    won_minus = (result == WON) & (odds < 0)
+    profit[won_plus] = stake[won_plus] * (odds[won_plus] / 100)
+    profit[won_minus] = stake[won_minus] * (100 / np.abs(odds[won_minus]))
+    lost = result == LOST
+    profit[lost] = -stake[lost]
+    profit[result == PUSH] = 0
+    
+    return result, profit
+
+
+def grade_pending_bets(db, games):
+    """Grade every pending bet on the given completed games in one pass
+    
+    Loads the bets as columns with one query per chunk of games, grades
+    them with grade_arrays and writes results back with bulk UPDATEs.
+    Returns {'graded': number of bets graded, 'users': ids of their owners}.
+    """
+    from models import Bet
+    from user_stats import apply_bet_changes, BetState, game_day
+    
+    games = {
+        game.id: game for game in games
+        if game.is_completed and game.away_score is not None and game.home_score is not None
+    }
+    if not games:
+        return {'graded': 0, 'users': set()}
+    
+    game_ids = list(games)
+    rows = []
+    for i in range(0, len(game_ids), 1000):
+        rows.extend(db.session.execute(
+            select(Bet.id, Bet.game_id, Bet.user_id, Bet.bet_type, Bet.team, Bet.line, Bet.odds, Bet.stake)
+            .where(Bet.game_id.in_(game_ids[i:i + 1000]), Bet.result == 'PENDING')
+        ).tuples())
+    if not rows:
+        return {'graded': 0, 'users': set()}
+    
+    bet_ids, bet_game_ids, user_ids, bet_types, teams, lines, odds, stakes = zip(*rows)
+    bet_games = [games[game_id] for game_id in bet_game_ids]
+    teams = np.array(teams, dtype=object)
+    
+    away_teams = np.array([game.away_team for game in bet_games], dtype=object)
+    home_teams = np.array([game.home_team for game in bet_games], dtype=object)
+    side = np.where(teams == away_teams, SIDE_AWAY, np.where(teams == home_teams, SIDE_HOME, SIDE_NONE))
+    
+    result, profit = grade_arrays(
+        np.array([BET_TYPES.get(bet_type, -1) for bet_type in bet_types]),
+        side,
+        np.array([np.nan if line is None else line for line in lines], dtype=float),
+        np.array(odds, dtype=np.int64),
+        np.array(stakes, dtype=float),
+        np.array([game.away_score for game in bet_games], dtype=np.int64),
+        np.array([game.home_score for game in bet_games], dtype=np.int64)
+    )
+    
+    graded = np.flatnonzero(result != PENDING)
+    updates = [
+        {'b_id': bet_ids[i], 'b_result': RESULT_NAMES[result[i]], 'b_profit': float(profit[i])}
+        for i in graded
+    ]
+    
+    # The PENDING guard keeps a concurrent run from grading the same bet twice; only
+    # the bets this run's UPDATEs actually changed count towards the stats
+    now = datetime.utcnow()
+    changed = set()
+    for i in range(0, len(updates), UPDATE_BATCH_SIZE):
+        changed.update(_write_results(db, updates[i:i + UPDATE_BATCH_SIZE], now))
+    graded = [i for i in graded if bet_ids[i] in changed]
+    
+    # Keep the materialized user stats in step, in the same transaction
+    days = {game_id: game_day(game.game_time) for game_id, game in games.items()}
+    apply_bet_changes(
+        (BetState(user_ids[i], bet_types[i], 'PENDING', stakes[i], None, days[bet_game_ids[i]]),
+         BetState(user_ids[i], bet_types[i], RESULT_NAMES[result[i]], stakes[i], float(profit[i]), days[bet_game_ids[i]]))
+        for i in graded
+    )
+    
+    counts = np.bincount(result[graded], minlength=4)
+    print(f'✅ Graded {len(graded)} bets: {counts[WON]} won, {counts[LOST]} lost, {counts[PUSH]} push')
+    return {'graded': len(graded), 'users': {user_ids[i] for i in graded}}
+
+
+def _write_results(db, chunk, now):
+    """Write one chunk of grades to bets still PENDING; returns the ids actually updated"""
+    if db.engine.dialect.name == 'postgresql':
+        # One UPDATE joined against unnest()ed arrays: three bind parameters per chunk
+        # instead of a round trip (or a giant VALUES list to compile) per bet
+        rows = db.session.execute(text(
+            'UPDATE bets SET result = graded.result, profit = graded.profit, updated_at = :now '
+            'FROM unnest(CAST(:ids AS uuid[]), CAST(:results AS varchar[]), CAST(:profits AS float8[])) '
+            'AS graded(id, result, profit) '
+            "WHERE bets.id = graded.id AND bets.result = 'PENDING' "
+            'RETURNING bets.id'
+        ), {
+            'now': now,
+            'ids': [row['b_id'] for row in chunk],
+            'results': [row['b_result'] for row in chunk],
+            'profits': [row['b_profit'] for row in chunk]
+        })
+        return {str(row.id) for row in rows}
+    
+    # SQLite (3.35+): the same join against a VALUES list (columns column1..3). Sent
+    # straight to the driver: compiling 15000 named binds costs more than the UPDATE
+    params = [now.strftime('%Y-%m-%d %H:%M:%S.%f')]
+    for row in chunk:
+        params += [row['b_id'], row['b_result'], row['b_profit']]
+    rows = db.session.connection().exec_driver_sql(
+        'UPDATE bets SET result = graded.column2, profit = graded.column3, updated_at = ? '
+        f'FROM (VALUES {", ".join(["(?, ?, ?)"] * len(chunk))}) AS graded '
+        "WHERE bets.id = graded.column1 AND bets.result = 'PENDING' "
+        'RETURNING bets.id',
+        tuple(params)
+    )
+    return {row.id for row in rows}
+
+
+# ==================== PARITY CHECK ====================
+
+# grade_arrays and grade_pending_bets must grade exactly like grade_bet:
+#
+#     python grading.py check [--bets 5000]
+#
+# runs all three over EDGE_CASES plus random bets (grade_pending_bets on an
+# in-memory SQLite database) and exits 1 on any difference. It takes a
+# couple of seconds, and runs before every deploy (the Procfile release phase).
+
+AWAY, HOME = 'Away U', 'Home St'
+
+# (bet_type, team, line, odds, away_score, home_score)
+EDGE_CASES = [
+    ('ML', AWAY, None, 150, 70, 70),              # a tie loses both sides
+    ('ML', HOME, None, -110, 70, 70),
+    ('ML', AWAY, None, 100, 80, 70),              # even money
+    ('ML', HOME, None, -100, 70, 80),
+    ('ML', 'Someone Else', None, 120, 80, 70),    # unknown team: left pending
+    ('ML', None, None, 120, 80, 70),
+    ('ML', AWAY, None, 0, 80, 70),                # odds 0: grade_bet can't price a win, left pending
+    ('ML', AWAY, None, 0, 60, 70),                # ... but a loss is graded
+    ('SPREAD', AWAY, 3.0, -110, 70, 73),          # whole-number push
+    ('SPREAD', HOME, -3.0, -110, 70, 73),
+    ('SPREAD', HOME, -2.5, -110, 70, 73),
+    ('SPREAD', AWAY, 0.0, 120, 70, 70),
+    ('SPREAD', AWAY, None, -110, 70, 73),         # missing line: left pending
+    ('TOTAL_OVER', None, 143.0, -110, 70, 73),    # push on the total
+    ('TOTAL_UNDER', None, 143.0, -110, 70, 73),
+    ('TOTAL_OVER', None, 142.5, 105, 70, 73),
+    ('TOTAL_UNDER', None, 142.5, 105, 70, 73),
+    ('TOTAL_OVER', None, None, -110, 70, 73),
+    ('TOTAL_UNDER', None, None, -110, 70, 73),
+    ('PARLAY', AWAY, 1.5, 200, 80, 70),           # unknown bet type: left pending
+]
+
+
+def parity_bets(count, seed=11):
+    """EDGE_CASES followed by `count` random bets biased toward them, with their final scores"""
+    import random
+    from types import SimpleNamespace
+    
+    rng = random.Random(seed)
+    cases = list(EDGE_CASES)
+    for _ in range(count):
+        away_score, home_score = rng.randint(50, 90), rng.randint(50, 90)
+        if rng.random() < 0.05:
+            home_score = away_score
+        cases.append((
+            rng.choice(['ML', 'SPREAD', 'TOTAL_OVER', 'TOTAL_UNDER', 'PARLAY']),
+            rng.choice([AWAY, HOME, None, 'Someone Else']),
+            rng.choice([None, rng.randint(-15, 15), rng.randint(-30, 30) / 2, float(away_score + home_score)]),
+            rng.choice([0, -100, 100]) if rng.random() < 0.01 else rng.choice([-1, 1]) * rng.randint(100, 500),
+            away_score,
+            home_score
+        ))
+    
+    return [
+        SimpleNamespace(
+            id=i, bet_type=bet_type, team=team, line=line, odds=odds,
+            stake=rng.choice([0.1, 0.5, 1.0, 2.5, 3.3]), result='PENDING', profit=None,
+            game=SimpleNamespace(is_completed=True, away_team=AWAY, home_team=HOME,
+                                 away_score=away_score, home_score=home_score)
+        )
+        for i, (bet_type, team, line, odds, away_score, home_score) in enumerate(cases)
+    ]
+
+
+def bet_arrays(bets):
+    """grade_arrays' arguments for parity_bets, built the way grade_pending_bets builds them"""
+    return (
+        np.array([BET_TYPES.get(b.bet_type, -1) for b in bets]),
+        np.array([SIDE_AWAY if b.team == AWAY else SIDE_HOME if b.team == HOME else SIDE_NONE for b in bets]),
+        np.array([np.nan if b.line is None else b.line for b in bets], dtype=float),
+        np.array([b.odds for b in bets], dtype=np.int64),
+        np.array([b.stake for b in bets], dtype=float),
+        np.array([b.game.away_score for b in bets], dtype=np.int64),
+        np.array([b.game.home_score for b in bets], dtype=np.int64)
+    )
+
+
+def grade_one_by_one(bets):
+    """(result, profit) per bet from grade_bet; a bet whose grading raises stays pending, as in the scheduled job"""
+    import contextlib
+    import io
+    
+    expected = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for bet in bets:
+            try:
+                grade_bet(bet, bet.game)
+            except ZeroDivisionError:
+                bet.result, bet.profit = 'PENDING', None
+            expected.append((bet.result, bet.profit))
+    return expected
+
+
+def _grade_in_database(bets):
+    """(result, profit) per bet from grade_pending_bets, on a scratch in-memory SQLite database"""
+    import contextlib
+    import io
+    import uuid
+    from flask import Flask
+    from models import db, User, Game, Bet
+    
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context(), contextlib.redirect_stdout(io.StringIO()):
+        db.create_all()
+        user_id = str(uuid.uuid4())
+        db.session.add(User(id=user_id, email='parity@example.com', username='parity', password='x'))
+        games = {}
+        for bet in bets:
+            scores = (bet.game.away_score, bet.game.home_score)
+            if scores not in games:
+                games[scores] = Game(id=str(uuid.uuid4()), external_id=f'parity-{len(games)}', game_time=datetime(2026, 1, 1),
+                                     away_team=AWAY, home_team=HOME, away_score=scores[0], home_score=scores[1], is_completed=True)
+        db.session.add_all(games.values())
+        bet_ids = [str(uuid.uuid4()) for _ in bets]
+        db.session.execute(db.insert(Bet), [
+            {'id': bet_id, 'user_id': user_id, 'game_id': games[(bet.game.away_score, bet.game.home_score)].id,
+             'bet_type': bet.bet_type, 'team': bet.team, 'line': bet.line, 'odds': bet.odds, 'stake': bet.stake,
+             'result': 'PENDING'}
+            for bet_id, bet in zip(bet_ids, bets)
+        ])
+        grade_pending_bets(db, list(games.values()))
+        db.session.commit()
+        graded = {row.id: (row.result, row.profit) for row in db.session.execute(select(Bet.id, Bet.result, Bet.profit))}
+        db.session.remove()
+        db.drop_all()
+    return [graded[bet_id] for bet_id in bet_ids]
+
+
+def check_parity(count=5000):
+    """Grade parity_bets(count) with all three engines; returns the number of mismatches"""
+    bets = parity_bets(count)
+    expected = grade_one_by_one(bets)
+    result, profit = grade_arrays(*bet_arrays(bets))
+    engines = {
+        'grade_arrays': [
+            ('PENDING', None) if result[i] == PENDING else (RESULT_NAMES[result[i]], float(profit[i]))
+            for i in range(len(bets))
+        ],
+        'grade_pending_bets': _grade_in_database(bets)
+    }
+    
+    mismatches = 0
+    for engine, actual in engines.items():
+        for bet, want, got in zip(bets, expected, actual):
+            if want != got:
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f'❌ {engine}: {bet.bet_type} {bet.team} line={bet.line} odds={bet.odds} '
+                          f'{bet.game.away_score}-{bet.game.home_score}: expected {want}, got {got}')
+    return mismatches
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    
+    parser = argparse.ArgumentParser(description='Check the batch grading engines against grade_bet')
+    parser.add_argument('command', choices=['check'])
+    parser.add_argument('--bets', type=int, default=5000, help='random bets on top of the edge cases')
+    args = parser.parse_args()
+    
+    mismatches = check_parity(args.bets)
+    if mismatches:
+        print(f'❌ Parity failed: {mismatches} differences')
+        sys.exit(1)
+    print(f'✅ grade_arrays and grade_pending_bets match grade_bet on {len(EDGE_CASES)} edge cases and {args.bets} random bets')
@@ -0,0 +1,20 @@
+"""
+Gunicorn settings, picked up automatically by `gunicorn app:app`.
+
+Each worker stands for scheduler leadership once it has booted; only the
+leader runs the jobs (see leader.py). With SCHEDULER_ENABLED=false the
+workers leave that to a separate `python run_scheduler.py` process.
+"""
+
+
+def post_worker_init(worker):
+    from app import start_scheduler
+    
+    # worker.wsgi is the app gunicorn loaded (app:app or app:create_app())
+    start_scheduler(worker.wsgi)
+
+
+def worker_exit(server, worker):
+    from app import stop_scheduler
+    
+    stop_scheduler()
@@ -3,24 +3,44 @@
 Database initialization script for The Spreadsheet Flask app
 """
 
-from app import app, db
-from models import User, Game, Odds, Bet
+from app import create_app
+from migrations import migrate
+from models import db, User, Game, Odds, OddsSnapshot, Bet, UserStats, UserDailyStats
+from odds_history import backfill_snapshots
+from user_stats import reconcile
 
 def init_database():
     """Initialize the database with all tables"""
     print('🔧 Initializing database...')
     
+    app = create_app()
     with app.app_context():
-        # Create all tables
-        db.create_all()
+        # Create missing tables, then apply column and index migrations
+        migrate()
         print('✅ Database tables created successfully!')
         
+        # Build materialized user stats (and backfill daily buckets) for bets placed before the tables existed
+        if Bet.query.first() and not (UserStats.query.first() and UserDailyStats.query.first()):
+            reconcile()
+            print('📊 Built user_stats and user_daily_stats from existing bets')
+        
+        # Give pre-existing odds rows an opening line in the history table
+        seeded = backfill_snapshots()
+        if seeded:
+            print(f'📈 Seeded odds history for {seeded} existing lines')
+        
         # Print table info
         print('\n📊 Created tables:')
         print('  - users')
         print('  - games')
         print('  - odds')
+        print('  - odds_snapshots')
+        print('  - board_games')
         print('  - bets')
+        print('  - user_stats')
+        print('  - user_bet_type_stats')
+        print('  - user_daily_stats')
+        print('  - schema_migrations')
         
         print('\n✨ Database is ready to use!')
         print('💡 You can now run the Flask app with: python app.py')
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Leader election for the background scheduler.
+
+Every process that may run scheduled jobs (gunicorn workers, or a
+dedicated run_scheduler.py process) starts a LeaderElection; exactly one
+of them holds the lock and runs the jobs, the rest only serve requests.
+
+On Postgres the lock is a session-level advisory lock held on a
+connection of its own, so it is released the moment the leader's process
+(or its connection) dies and another candidate takes over on its next
+attempt. Elsewhere (SQLite, one machine) it is an exclusive flock on a
+file in SCHEDULER_LOCK_DIR (the temp directory by default).
+
+The leader writes who it is to the shared cache on every heartbeat, so
+any worker can report which node holds leadership (status()).
+"""
+
+import os
+import socket
+import tempfile
+import threading
+from datetime import datetime
+
+from sqlalchemy import text
+
+from caching import cache
+from models import db
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, assume a single process
+    fcntl = None
+
+LEADER_KEY = 'scheduler:leader'
+
+
+def node_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class LeaderElection:
+    """Hold (or keep trying for) a cluster-wide lock, calling back on gaining and losing it"""
+    
+    def __init__(self, app, on_elected, on_deposed, name='scheduler', interval=15, lock_dir=None):
+        self.app = app
+        self.on_elected = on_elected
+        self.on_deposed = on_deposed
+        self.name = name
+        self.interval = interval
+        self.lock_path = os.path.join(lock_dir or tempfile.gettempdir(), f'spreadsheet-{name}.lock')
+        self.node = node_name()
+        self.is_leader = False
+        self.since = None
+        self._connection = None
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f'{self.name}-election', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop campaigning and hand leadership over, if held"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 5)
+        if self.is_leader:
+            with self.app.app_context():
+                self._deposed('stopping')
+    
+    def _run(self):
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    if self.is_leader:
+                        if self._still_held():
+                            self._heartbeat()
+                        else:
+                            self._deposed('lost the lock')
+                    elif self._acquire():
+                        self.is_leader = True
+                        self.since = datetime.utcnow()
+                        self._heartbeat()
+                        print(f'👑 {self.node} is now the {self.name} leader')
+                        self.on_elected()
+                except Exception as e:
+                    print(f'❌ Leader election error: {e}')
+                self._stop.wait(self.interval)
+    
+    def _deposed(self, reason):
+        print(f'👋 {self.node} is no longer the {self.name} leader ({reason})')
+        self.is_leader = False
+        self.since = None
+        try:
+            self.on_deposed()
+        finally:
+            self._release()
+    
+    def _acquire(self):
+        if db.engine.dialect.name == 'postgresql':
+            connection = db.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+            if connection.execute(text('SELECT pg_try_advisory_lock(hashtext(:name))'), {'name': f'spreadsheet:{self.name}'}).scalar():
+                self._connection = connection
+                return True
+            connection.close()
+            return False
+        
+        if fcntl is None:
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+    
+    def _still_held(self):
+        """A dead lock connection means Postgres has already released the lock to someone else"""
+        if self._connection is None:
+            return True
+        try:
+            self._connection.execute(text('SELECT 1'))
+            return True
+        except Exception:
+            return False
+    
+    def _release(self):
+        if self._connection is not None:
+            try:
+                self._connection.execute(text('SELECT pg_advisory_unlock(hashtext(:name))'), {'name': f'spreadsheet:{self.name}'})
+            except Exception:
+                pass
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+    
+    def _heartbeat(self):
+        cache.set(LEADER_KEY, {
+            'node': self.node,
+            'since': self.since.isoformat(),
+            'heartbeat': datetime.utcnow().isoformat()
+        }, timeout=self.interval * 3)
+    
+    def status(self):
+        """This node's view: its own role and the leader's last heartbeat"""
+        return {
+            'node': self.node,
+            'isLeader': self.is_leader,
+            'leader': cache.get(LEADER_KEY),
+            'checkedAt': datetime.utcnow().isoformat()
+        }
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Leaderboard reads over the materialized user_stats and user_daily_stats tables.
+
+All-time boards are ordered, filtered and ranked in the database on the
+(rounded metric, user_id) indexes, so a page touches only its own rows no
+matter how many users there are:
+
+- pages are keyset-paginated on (metric, user_id), never OFFSET
+- ranks are competition ranks (ties share a rank, the next rank skips),
+  worked out from one COUNT per page rather than ranking every user
+- get_user_rank answers "where am I" with a single COUNT
+- metrics are compared rounded to 6 places (models.rounded_metric), so
+  equal totals reached through different float sums tie
+
+Rolling windows (7d, 30d, season) sum the daily buckets in the window
+instead of scanning bets, then rank the sums with a window function.
+"""
+
+import uuid
+from datetime import datetime, date, timedelta
+
+from sqlalchemy import func, case, cast, tuple_, Float
+
+from models import db, User, UserStats, UserDailyStats, rounded_metric
+from pagination import encode_cursor, decode_cursor
+from records import LeaderboardEntry, LeaderboardPage
+from user_stats import EASTERN
+
+# Sort keys accepted by the leaderboard (names match the LeaderboardEntry fields)
+SORTS = {
+    'totalProfit': UserStats.total_profit,
+    'roi': UserStats.roi,
+    'winRate': UserStats.win_rate
+}
+DEFAULT_SORT = 'totalProfit'
+PAGE_SIZE = 50
+
+# Leaderboard windows, in the order the page shows them
+WINDOWS = {'all': 'All Time', 'season': 'This Season', '30d': 'Last 30 Days', '7d': 'Last 7 Days'}
+DEFAULT_WINDOW = 'all'
+# College basketball seasons open in November
+SEASON_START_MONTH = 11
+
+
+def window_start(window, today=None):
+    """First game day (Eastern) counted by a window, or None for all time"""
+    today = today or datetime.now(EASTERN).date()
+    if window == '7d':
+        return today - timedelta(days=6)
+    if window == '30d':
+        return today - timedelta(days=29)
+    if window == 'season':
+        year = today.year if today.month >= SEASON_START_MONTH else today.year - 1
+        return date(year, SEASON_START_MONTH, 1)
+    return None
+
+
+def _metric(sort):
+    return rounded_metric(SORTS.get(sort, SORTS[DEFAULT_SORT]))
+
+
+def _qualifying(min_bets):
+    """Users who have placed at least min_bets bets (and at least one)"""
+    return UserStats.total_bets >= max(min_bets or 1, 1)
+
+
+def _after(cursor):
+    """(metric, user_id) from a page cursor, or None if it is missing or malformed"""
+    after = decode_cursor(cursor, 2)
+    try:
+        return float(after[0]), str(uuid.UUID(after[1]))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def _entry(row, rank):
+    """Leaderboard entry record, same fields the templates have always used"""
+    settled_bets = row.won_bets + row.lost_bets
+    total_staked = float(row.total_staked)
+    total_profit = float(row.total_profit)
+    
+    return LeaderboardEntry(
+        rank=rank,
+        username=row.username,
+        totalProfit=total_profit,
+        totalStaked=total_staked,
+        totalBets=row.total_bets,
+        wonBets=row.won_bets,
+        lostBets=row.lost_bets,
+        winRate=(row.won_bets / settled_bets * 100) if settled_bets > 0 else 0,
+        roi=(total_profit / total_staked * 100) if total_staked > 0 else 0
+    )
+
+
+def _windowed(window, sort, min_bets):
+    """Subquery of per-user sums over a window's daily buckets, with metric and rank columns"""
+    daily = UserDailyStats
+    sums = db.session.query(
+        daily.user_id.label('user_id'),
+        func.sum(daily.total_bets).label('total_bets'),
+        func.sum(daily.won_bets).label('won_bets'),
+        func.sum(daily.lost_bets).label('lost_bets'),
+        func.sum(daily.total_staked).label('total_staked'),
+        func.sum(daily.total_profit).label('total_profit')
+    ).filter(daily.day >= window_start(window))\
+     .group_by(daily.user_id)\
+     .subquery()
+    
+    settled = sums.c.won_bets + sums.c.lost_bets
+    metric = rounded_metric({
+        'roi': case((sums.c.total_staked > 0, sums.c.total_profit / sums.c.total_staked * 100), else_=0.0),
+        'winRate': case((settled > 0, cast(sums.c.won_bets * 100.0 / settled, Float)), else_=0.0)
+    }.get(sort, sums.c.total_profit))
+    
+    return db.session.query(
+        User.username,
+        sums.c.user_id,
+        sums.c.total_bets,
+        sums.c.won_bets,
+        sums.c.lost_bets,
+        sums.c.total_staked,
+        sums.c.total_profit,
+        metric.label('metric'),
+        func.rank().over(order_by=metric.desc()).label('rank')
+    ).join(User, User.id == sums.c.user_id)\
+     .filter(sums.c.total_bets >= max(min_bets or 1, 1))\
+     .subquery()
+
+
+def _windowed_page(window, sort, min_bets, cursor, limit):
+    ranked = _windowed(window, sort, min_bets)
+    query = db.session.query(ranked)
+    
+    after = _after(cursor)
+    if after:
+        query = query.filter(tuple_(ranked.c.metric, ranked.c.user_id) < tuple_(rounded_metric(after[0]), after[1]))
+    
+    rows = query.order_by(ranked.c.metric.desc(), ranked.c.user_id.desc()).limit(limit + 1).all()
+    last = rows[limit - 1] if len(rows) > limit else None
+    return LeaderboardPage(
+        entries=tuple(_entry(row, row.rank) for row in rows[:limit]),
+        nextCursor=encode_cursor(last.metric, last.user_id) if last else None
+    )
+
+
+def get_leaderboard_page(sort=DEFAULT_SORT, min_bets=1, cursor=None, limit=PAGE_SIZE, window=DEFAULT_WINDOW):
+    """One page of the leaderboard, best first
+    
+    Returns a LeaderboardPage (entries, nextCursor). Pass nextCursor back
+    as cursor to get the following page.
+    """
+    if window_start(window):
+        return _windowed_page(window, sort, min_bets, cursor, limit)
+    
+    metric = _metric(sort)
+    qualifying = _qualifying(min_bets)
+    
+    query = db.session.query(
+        User.username,
+        UserStats.user_id,
+        UserStats.total_bets,
+        UserStats.won_bets,
+        UserStats.lost_bets,
+        UserStats.total_staked,
+        UserStats.total_profit,
+        metric.label('metric')
+    ).join(User, User.id == UserStats.user_id)\
+     .filter(qualifying)
+    
+    after = _after(cursor)
+    if after:
+        query = query.filter(tuple_(metric, UserStats.user_id) < tuple_(rounded_metric(after[0]), after[1]))
+    
+    rows = query.order_by(metric.desc(), UserStats.user_id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return LeaderboardPage(entries=(), nextCursor=None)
+    
+    # Rank of the first row, plus how many users tie with it (some may be on earlier pages)
+    top = rows[0].metric
+    greater, tied = db.session.query(
+        func.coalesce(func.sum(case((metric > top, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((metric == top, 1), else_=0)), 0)
+    ).filter(qualifying, metric >= top).one()
+    
+    entries = []
+    rank = greater + 1
+    below_top = 0
+    for i, row in enumerate(rows):
+        if row.metric != top:
+            if row.metric != rows[i - 1].metric:
+                # Everyone tied with the first row, plus the rows above this one on this page
+                rank = greater + tied + below_top + 1
+            below_top += 1
+        entries.append(_entry(row, rank))
+    
+    last = rows[-1]
+    return LeaderboardPage(
+        entries=tuple(entries),
+        nextCursor=encode_cursor(last.metric, last.user_id) if has_more else None
+    )
+
+
+def get_user_rank(user_id, sort=DEFAULT_SORT, min_bets=1, window=DEFAULT_WINDOW):
+    """A user's leaderboard entry with its rank, or None if they don't qualify"""
+    if window_start(window):
+        ranked = _windowed(window, sort, min_bets)
+        row = db.session.query(ranked).filter(ranked.c.user_id == user_id).first()
+        return _entry(row, row.rank) if row else None
+    
+    metric = _metric(sort)
+    qualifying = _qualifying(min_bets)
+    
+    row = db.session.query(
+        User.username,
+        UserStats.total_bets,
+        UserStats.won_bets,
+        UserStats.lost_bets,
+        UserStats.total_staked,
+        UserStats.total_profit,
+        metric.label('metric')
+    ).join(User, User.id == UserStats.user_id)\
+     .filter(UserStats.user_id == user_id, qualifying)\
+     .first()
+    if row is None:
+        return None
+    
+    above = db.session.query(func.count(UserStats.user_id))\
+        .filter(qualifying, metric > row.metric)\
+        .scalar()
+    return _entry(row, above + 1)
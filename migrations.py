@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations.
+
+db.create_all() only creates missing tables: it never adds a column or an
+index to a table that already exists. Each migration below is applied
+once, in order, and recorded in schema_migrations. Every step is also
+written to be a no-op when its change is already there (a fresh database
+gets everything from the baseline create_all), so re-running one is safe.
+
+The baseline creates missing tables with the key columns as they were
+before 0005 (varchar(36)), so that on a database from before migrations
+existed its new tables' foreign keys match users.id and games.id; 0005
+then converts them all together.
+
+Usage:
+    python migrations.py migrate    # apply pending migrations, then verify indexes
+    python migrations.py status     # list applied and pending versions
+    python migrations.py verify     # check every index declared in models.py exists
+"""
+
+import re
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import inspect, MetaData, String
+from sqlalchemy.schema import CreateIndex
+
+from models import db, Bet, Game, BoardGame, SchemaMigration
+
+
+def _columns(table):
+    return {column['name'] for column in inspect(db.session.connection()).get_columns(table)}
+
+
+def _indexes(table):
+    """Index names on a table, read from the catalog: the inspector skips expression indexes"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        sql = 'SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table'
+    elif dialect == 'sqlite':
+        sql = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"
+    else:
+        return {index['name'] for index in inspect(db.session.connection()).get_indexes(table)}
+    return set(db.session.execute(db.text(sql), {'table': table}).scalars())
+
+
+def add_column(table, name, ddl):
+    """ALTER TABLE ... ADD COLUMN unless the column is already there"""
+    if name in _columns(table):
+        return False
+    db.session.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+    print(f'  ➕ {table}.{name}')
+    return True
+
+
+def create_indexes(table, *names):
+    """Create indexes exactly as models.py declares them, skipping ones that exist"""
+    declared = {index.name: index for index in db.metadata.tables[table].indexes}
+    existing = _indexes(table)
+    for name in names:
+        if name not in existing:
+            db.session.execute(CreateIndex(declared[name], if_not_exists=True))
+            print(f'  ➕ {name}')
+
+
+def _autocommit(sql):
+    """Run DDL that refuses to run inside a transaction (CREATE INDEX CONCURRENTLY)"""
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.exec_driver_sql(sql)
+
+
+def pre_uuid_metadata():
+    """models.py's tables with the key columns 0005 converts as they were before it, varchar(36)"""
+    metadata = MetaData()
+    for table in db.metadata.sorted_tables:
+        copy = table.to_metadata(metadata)
+        for column in UUID_COLUMNS.get(table.name, []):
+            copy.c[column].type = String(36)
+    return metadata
+
+
+def _baseline():
+    pre_uuid_metadata().create_all(db.session.connection())
+
+
+def _odds_fingerprint():
+    add_column('games', 'odds_fingerprint', 'VARCHAR(40)')
+
+
+def _user_stats_rates():
+    from user_stats import refresh_rates
+    
+    added = add_column('user_stats', 'roi', 'FLOAT NOT NULL DEFAULT 0')
+    added = add_column('user_stats', 'win_rate', 'FLOAT NOT NULL DEFAULT 0') or added
+    if added:
+        refresh_rates()
+
+
+def _hot_query_indexes():
+    create_indexes('bets', 'ix_bets_user_created', 'ix_bets_pending_game')
+    create_indexes('games', 'ix_games_game_time')
+    create_indexes('odds', 'ix_odds_game_book')
+    # The user_stats leaderboard indexes this used to create are now built by 0009
+    create_indexes('user_daily_stats', 'ix_user_daily_stats_day')
+
+
+# Key columns 0005 converts from varchar(36) to uuid on Postgres, by table
+UUID_COLUMNS = {
+    'users': ['id'],
+    'games': ['id'],
+    'odds': ['id', 'game_id'],
+    'best_odds': ['game_id'],
+    'odds_snapshots': ['game_id'],
+    'bets': ['id', 'user_id', 'game_id'],
+    'user_stats': ['user_id'],
+    'user_bet_type_stats': ['user_id'],
+    'user_daily_stats': ['user_id'],
+}
+BACKFILL_BATCH_SIZE = 5000
+
+
+def _column_info(table, column):
+    """(data_type, is_nullable) of a column on Postgres, or None if it doesn't exist"""
+    return db.session.execute(db.text(
+        'SELECT data_type, is_nullable FROM information_schema.columns '
+        'WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column'
+    ), {'table': table, 'column': column}).first()
+
+
+def _add_shadow_columns(table, columns):
+    """A uuid twin of each key column, kept in step with writes by a trigger from now on"""
+    for column in columns:
+        db.session.execute(db.text(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column}__uuid uuid'))
+    
+    assignments = ' '.join(f'NEW.{column}__uuid := NEW.{column}::uuid;' for column in columns)
+    db.session.execute(db.text(
+        f'CREATE OR REPLACE FUNCTION {table}__uuid_sync() RETURNS trigger AS $$ '
+        f'BEGIN {assignments} RETURN NEW; END $$ LANGUAGE plpgsql'
+    ))
+    db.session.execute(db.text(f'DROP TRIGGER IF EXISTS {table}__uuid_sync ON {table}'))
+    db.session.execute(db.text(
+        f'CREATE TRIGGER {table}__uuid_sync BEFORE INSERT OR UPDATE ON {table} '
+        f'FOR EACH ROW EXECUTE FUNCTION {table}__uuid_sync()'
+    ))
+    db.session.commit()
+
+
+def _backfill_shadow_columns(table, columns):
+    """Copy existing keys into the twins in short batches, committing each so writers never wait long"""
+    assignments = ', '.join(f'{column}__uuid = {column}::uuid' for column in columns)
+    missing = ' OR '.join(f'({column}__uuid IS NULL AND {column} IS NOT NULL)' for column in columns)
+    copied = 0
+    while True:
+        result = db.session.execute(db.text(
+            f'UPDATE {table} SET {assignments} WHERE ctid = ANY(ARRAY('
+            f'SELECT ctid FROM {table} WHERE {missing} LIMIT {BACKFILL_BATCH_SIZE}))'
+        ))
+        db.session.commit()
+        if not result.rowcount:
+            break
+        copied += result.rowcount
+    print(f'  🔁 {table}: {copied} rows backfilled')
+
+
+def _table_indexes(table):
+    """{name: definition} of a table's indexes"""
+    rows = db.session.execute(db.text(
+        'SELECT i.relname, pg_get_indexdef(x.indexrelid), x.indisvalid FROM pg_index x '
+        'JOIN pg_class i ON i.oid = x.indexrelid WHERE x.indrelid = CAST(:table AS regclass)'
+    ), {'table': table}).all()
+    return rows
+
+
+def _prepare_shadow_columns(table, columns):
+    """Build every index the swap will need on the twins, and prove NOT NULL, without blocking writes"""
+    indexes = _table_indexes(table)
+    # CONCURRENTLY waits for every open transaction, this session's included
+    db.session.commit()
+    for name, definition, valid in indexes:
+        if name.endswith('__uuid') and not valid:
+            # Left behind by an interrupted CONCURRENTLY build
+            _autocommit(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+    
+    key = re.compile(r'\b(' + '|'.join(columns) + r')\b')
+    for name, definition, _ in indexes:
+        if name.endswith('__uuid'):
+            continue
+        head, on, tail = definition.partition(' ON ')
+        if not key.search(tail):
+            continue
+        head = head.replace(f'INDEX {name}', f'INDEX CONCURRENTLY IF NOT EXISTS {name}__uuid', 1)
+        _autocommit(head + on + key.sub(r'\1__uuid', tail))
+    
+    for column in columns:
+        if _column_info(table, column).is_nullable == 'NO':
+            check = f'{table}_{column}__uuid_not_null'
+            db.session.execute(db.text(
+                f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {check}, '
+                f'ADD CONSTRAINT {check} CHECK ({column}__uuid IS NOT NULL) NOT VALID'
+            ))
+            db.session.commit()
+            db.session.execute(db.text(f'ALTER TABLE {table} VALIDATE CONSTRAINT {check}'))
+            db.session.commit()
+
+
+def _swap_shadow_columns(tables):
+    """Replace every old key column with its twin in one short transaction
+    
+    Everything slow (copying, index builds, NOT NULL checks) has already
+    happened, so the exclusive locks are held only for catalog changes.
+    Foreign keys come back NOT VALID and are validated afterwards, online.
+    """
+    names = list(tables)
+    db.session.execute(db.text(f'LOCK TABLE {", ".join(names)} IN ACCESS EXCLUSIVE MODE'))
+    
+    foreign_keys = db.session.execute(db.text(
+        "SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE contype = 'f' AND (conrelid = ANY(CAST(:names AS regclass[])) OR confrelid = ANY(CAST(:names AS regclass[])))"
+    ), {'names': names}).all()
+    for table, name, _ in foreign_keys:
+        db.session.execute(db.text(f'ALTER TABLE {table} DROP CONSTRAINT {name}'))
+    
+    for table, columns in tables.items():
+        constraints = dict(db.session.execute(db.text(
+            "SELECT conname, contype FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype IN ('p', 'u')"
+        ), {'table': table}).all())
+        shadows = [name[:-len('__uuid')] for name, _, _ in _table_indexes(table) if name.endswith('__uuid')]
+        
+        db.session.execute(db.text(f'DROP TRIGGER IF EXISTS {table}__uuid_sync ON {table}'))
+        db.session.execute(db.text(f'DROP FUNCTION IF EXISTS {table}__uuid_sync()'))
+        for column in columns:
+            not_null = _column_info(table, column).is_nullable == 'NO'
+            # Takes the old column's indexes and primary key with it
+            db.session.execute(db.text(f'ALTER TABLE {table} DROP COLUMN {column}'))
+            db.session.execute(db.text(f'ALTER TABLE {table} RENAME COLUMN {column}__uuid TO {column}'))
+            if not_null:
+                # Instant: the validated CHECK already proves it
+                db.session.execute(db.text(f'ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL'))
+                db.session.execute(db.text(f'ALTER TABLE {table} DROP CONSTRAINT {table}_{column}__uuid_not_null'))
+        
+        for name in shadows:
+            if constraints.get(name) == 'p':
+                db.session.execute(db.text(f'ALTER TABLE {table} ADD CONSTRAINT {name} PRIMARY KEY USING INDEX {name}__uuid'))
+            elif constraints.get(name) == 'u':
+                db.session.execute(db.text(f'ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}__uuid'))
+            else:
+                db.session.execute(db.text(f'ALTER INDEX {name}__uuid RENAME TO {name}'))
+    
+    for table, name, definition in foreign_keys:
+        db.session.execute(db.text(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition} NOT VALID'))
+    db.session.commit()
+    
+    for table, name, _ in foreign_keys:
+        db.session.execute(db.text(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}'))
+        db.session.commit()
+    for table in names:
+        db.session.execute(db.text(f'ANALYZE {table}'))
+        db.session.commit()
+
+
+def _uuid_keys():
+    """Online conversion of the varchar(36) key columns to uuid (Postgres; SQLite keeps text keys)
+    
+    Shadow uuid columns are added and kept in sync by triggers, existing
+    rows are backfilled in batches, the replacement indexes are built
+    CONCURRENTLY, and then one short locked transaction swaps the columns
+    in. Reads and writes carry on throughout except for that swap. Safe to
+    re-run after an interruption: each step picks up where it stopped.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return
+    
+    tables = {
+        table: columns for table, columns in UUID_COLUMNS.items()
+        if _column_info(table, columns[0]).data_type != 'uuid'
+    }
+    db.session.commit()
+    if not tables:
+        return
+    
+    for table, columns in tables.items():
+        _add_shadow_columns(table, columns)
+    for table, columns in tables.items():
+        _backfill_shadow_columns(table, columns)
+        _prepare_shadow_columns(table, columns)
+    _swap_shadow_columns(tables)
+
+
+def _games_game_date():
+    """games.game_date (US Eastern date of game_time) for the homepage board, filled in batches"""
+    from user_stats import game_day
+    
+    add_column('games', 'game_date', 'DATE')
+    db.session.commit()
+    filled = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Game.id, Game.game_time).where(Game.game_date.is_(None)).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(db.update(Game), [{'id': row.id, 'game_date': game_day(row.game_time)} for row in rows])
+        db.session.commit()
+        filled += len(rows)
+    if filled:
+        print(f'  🔁 games: {filled} rows backfilled')
+    create_indexes('games', 'ix_games_game_date')
+
+
+def _board_games():
+    from board import rebuild_board
+    
+    BoardGame.__table__.create(db.session.connection(), checkfirst=True)
+    print(f'  🔁 board_games: {rebuild_board()} rows')
+
+
+def _bets_idempotency_key():
+    add_column('bets', 'idempotency_key', 'VARCHAR(128)')
+    create_indexes('bets', 'ux_bets_user_idempotency')
+
+
+def _bets_idempotency_hash():
+    """bets.idempotency_hash, filled in batches for bets already booked under a key
+    
+    Hashed from each bet's current fields, edits included, which is what
+    api_edit_bet keeps it at from now on (placement.rehash).
+    """
+    from placement import leg_hash, HASHED_FIELDS
+    
+    add_column('bets', 'idempotency_hash', 'VARCHAR(64)')
+    db.session.commit()
+    filled = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Bet.id, *(getattr(Bet, field) for field in HASHED_FIELDS))
+            .where(Bet.idempotency_key.isnot(None), Bet.idempotency_hash.is_(None)).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(db.update(Bet), [{'id': row.id, 'idempotency_hash': leg_hash(row._mapping)} for row in rows])
+        db.session.commit()
+        filled += len(rows)
+    if filled:
+        print(f'  🔁 bets: {filled} rows backfilled')
+
+
+def _rounded_leaderboard_indexes():
+    """Leaderboard indexes on the rounded metrics the board now orders by, replacing 0004's"""
+    create_indexes('user_stats', 'ix_user_stats_rounded_profit', 'ix_user_stats_rounded_roi', 'ix_user_stats_rounded_win_rate')
+    for name in ('ix_user_stats_profit', 'ix_user_stats_roi', 'ix_user_stats_win_rate'):
+        db.session.execute(db.text(f'DROP INDEX IF EXISTS {name}'))
+
+
+# (version, description, function) in the order they must run; never reorder or edit an applied one
+MIGRATIONS = [
+    ('0001_baseline', 'Create any missing tables', _baseline),
+    ('0002_games_odds_fingerprint', 'games.odds_fingerprint for skipping unchanged odds', _odds_fingerprint),
+    ('0003_user_stats_rates', 'Stored roi/win_rate on user_stats', _user_stats_rates),
+    ('0004_hot_query_indexes', 'Indexes for bet history, pending bets, game times, odds and leaderboards', _hot_query_indexes),
+    ('0005_uuid_keys', 'Native uuid key columns on Postgres', _uuid_keys),
+    ('0006_games_game_date', 'games.game_date (US Eastern) and its index for the homepage board', _games_game_date),
+    ('0007_board_games', 'Homepage board snapshot table', _board_games),
+    ('0008_bets_idempotency_key', 'bets.idempotency_key, unique per user, for retry-safe placement', _bets_idempotency_key),
+    ('0009_rounded_leaderboard_indexes', 'user_stats leaderboard indexes on rounded metrics', _rounded_leaderboard_indexes),
+    ('0010_bets_idempotency_hash', 'bets.idempotency_hash, so a reused key must ask for the same bet', _bets_idempotency_hash),
+]
+
+
+def applied_versions():
+    if 'schema_migrations' not in inspect(db.session.connection()).get_table_names():
+        return set()
+    return set(db.session.execute(db.select(SchemaMigration.version)).scalars())
+
+
+@contextmanager
+def _lock():
+    """Serialize concurrent migrate runs (e.g. several workers booting at once) on Postgres
+    
+    A session-level advisory lock on its own autocommit connection, so it
+    survives the commits migrations make and never holds a snapshot that a
+    CREATE INDEX CONCURRENTLY would have to wait for.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+    
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.exec_driver_sql("SELECT pg_advisory_lock(hashtext('schema_migrations'))")
+        try:
+            yield
+        finally:
+            connection.exec_driver_sql("SELECT pg_advisory_unlock(hashtext('schema_migrations'))")
+
+
+def migrate(stop_before=None):
+    """Apply pending migrations in order, then verify indexes
+    
+    A migration's version is recorded in the same transaction as its last
+    change; migrations that commit along the way are written to resume.
+    stop_before (a version) leaves it and everything after it pending, and
+    skips the index check.
+    """
+    applied = 0
+    with _lock():
+        SchemaMigration.__table__.create(db.session.connection(), checkfirst=True)
+        done = applied_versions()
+        db.session.commit()
+        for version, description, fn in MIGRATIONS:
+            if version == stop_before:
+                break
+            if version in done:
+                continue
+            
+            print(f'🔧 Migrating {version}: {description}')
+            try:
+                fn()
+                db.session.add(SchemaMigration(version=version, description=description, applied_at=datetime.utcnow()))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            applied += 1
+    
+    count = f'{applied} migration{"s" if applied != 1 else ""} applied'
+    if stop_before is None:
+        verify_indexes()
+        print(f'✅ Schema up to date ({count})')
+    else:
+        print(f'✅ Schema up to {stop_before} ({count})')
+    return applied
+
+
+def missing_indexes():
+    """(table, index) for every index declared in models.py that the database lacks"""
+    missing = []
+    for table in db.metadata.sorted_tables:
+        existing = _indexes(table.name)
+        missing.extend((table.name, index.name) for index in table.indexes if index.name not in existing)
+    db.session.commit()
+    return missing
+
+
+def verify_indexes():
+    missing = missing_indexes()
+    if missing:
+        raise RuntimeError('Missing indexes: ' + ', '.join(f'{table}.{name}' for table, name in missing))
+
+
+def status():
+    applied = applied_versions()
+    db.session.commit()
+    for version, description, _ in MIGRATIONS:
+        print(f'{"✅" if version in applied else "⏳"} {version}: {description}')
+    return [version for version, _, _ in MIGRATIONS if version not in applied]
+
+
+if __name__ == '__main__':
+    from app import create_app
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else 'migrate'
+    with create_app().app_context():
+        if command == 'migrate':
+            migrate()
+        elif command == 'status':
+            sys.exit(1 if status() else 0)
+        elif command == 'verify':
+            verify_indexes()
+            print('✅ All declared indexes exist')
+        else:
+            print(__doc__)
+            sys.exit(2)
@@ -1,13 +1,33 @@
+import re
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
+from sqlalchemy.dialects import postgresql
 
 db = SQLAlchemy()
 
+# Row keys: a native 16-byte uuid on Postgres (half the size of the text form in
+# every row, index and join), the same 36-char text on SQLite. Values are str either way.
+UUID = db.String(36).with_variant(postgresql.UUID(as_uuid=False), 'postgresql')
+
+_UUID_PATTERN = re.compile(r'[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}')
+
+
+def rounded_metric(value):
+    """A leaderboard metric rounded to 6 places: totals built up from deltas in a different
+    order (12.65 vs 12.649999999999999) must tie. Ranking, cursors and indexes all use it."""
+    return db.func.round(db.cast(value, db.Numeric), db.literal_column('6'))
+
+
+def is_uuid(value):
+    """Whether value can be looked up in a UUID column (Postgres rejects anything else outright)"""
+    return isinstance(value, str) and _UUID_PATTERN.fullmatch(value) is not None
+
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     
-    id = db.Column(db.String(36), primary_key=True)
+    id = db.Column(UUID, primary_key=True)
     email = db.Column(db.String(255), unique=True, nullable=False)
     username = db.Column(db.String(100), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=False)
@@ -19,24 +39,42 @@ class User(UserMixin, db.Model):
         return f'<User {self.username}>'
 
 
+def _game_date(context):
+    """Default for games.game_date on inserts that only give game_time"""
+    from user_stats import game_day
+    
+    game_time = context.get_current_parameters().get('game_time')
+    return game_day(game_time) if game_time else None
+
+
 class Game(db.Model):
     __tablename__ = 'games'
     
-    id = db.Column(db.String(36), primary_key=True)
+    id = db.Column(UUID, primary_key=True)
     external_id = db.Column(db.String(255), unique=True)
     sport = db.Column(db.String(50), default='basketball_ncaab')
     game_time = db.Column(db.DateTime, nullable=False)
+    game_date = db.Column(db.Date, nullable=True, default=_game_date)  # US Eastern date of game_time, set at ingest
     away_team = db.Column(db.String(255), nullable=False)
     home_team = db.Column(db.String(255), nullable=False)
     away_score = db.Column(db.Integer, nullable=True)
     home_score = db.Column(db.Integer, nullable=True)
     is_completed = db.Column(db.Boolean, default=False)
+    odds_fingerprint = db.Column(db.String(40), nullable=True)  # hash of the last ingested market payload
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     odds = db.relationship('Odds', backref='game', lazy=True, cascade='all, delete-orphan')
+    best_odds = db.relationship('BestOdds', backref='game', uselist=False, lazy=True, cascade='all, delete-orphan')
     bets = db.relationship('Bet', backref='game', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (
+        # Upcoming-games board and odds history windows
+        db.Index('ix_games_game_time', 'game_time'),
+        # Homepage board: one Eastern date's games in tip-off order
+        db.Index('ix_games_game_date', 'game_date', 'game_time'),
+    )
+    
     def __repr__(self):
         return f'<Game {self.away_team} @ {self.home_team}>'
 
@@ -44,8 +82,8 @@ class Game(db.Model):
 class Odds(db.Model):
     __tablename__ = 'odds'
     
-    id = db.Column(db.String(36), primary_key=True)
-    game_id = db.Column(db.String(36), db.ForeignKey('games.id', ondelete='CASCADE'), nullable=False)
+    id = db.Column(UUID, primary_key=True)
+    game_id = db.Column(UUID, db.ForeignKey('games.id', ondelete='CASCADE'), nullable=False)
     bookmaker = db.Column(db.String(100), default='draftkings')
     away_ml = db.Column(db.Integer, nullable=True)
     home_ml = db.Column(db.Integer, nullable=True)
@@ -58,16 +96,118 @@ class Odds(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # Ingest prefetch and the odds history join, both by game then bookmaker
+        db.Index('ix_odds_game_book', 'game_id', 'bookmaker'),
+    )
+    
     def __repr__(self):
         return f'<Odds for Game {self.game_id}>'
 
 
+class BestOdds(db.Model):
+    """Best available price per market and side across all bookmakers, rebuilt at ingest"""
+    __tablename__ = 'best_odds'
+    
+    game_id = db.Column(UUID, db.ForeignKey('games.id', ondelete='CASCADE'), primary_key=True)
+    away_ml = db.Column(db.Integer, nullable=True)
+    away_ml_book = db.Column(db.String(100), nullable=True)
+    home_ml = db.Column(db.Integer, nullable=True)
+    home_ml_book = db.Column(db.String(100), nullable=True)
+    away_spread = db.Column(db.Float, nullable=True)
+    away_spread_odds = db.Column(db.Integer, nullable=True)
+    away_spread_book = db.Column(db.String(100), nullable=True)
+    home_spread = db.Column(db.Float, nullable=True)
+    home_spread_odds = db.Column(db.Integer, nullable=True)
+    home_spread_book = db.Column(db.String(100), nullable=True)
+    over_line = db.Column(db.Float, nullable=True)
+    over_odds = db.Column(db.Integer, nullable=True)
+    over_book = db.Column(db.String(100), nullable=True)
+    under_line = db.Column(db.Float, nullable=True)
+    under_odds = db.Column(db.Integer, nullable=True)
+    under_book = db.Column(db.String(100), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<BestOdds for Game {self.game_id}>'
+
+
+class BoardGame(db.Model):
+    """Homepage board snapshot: one flat row per game yet to tip off, rebuilt at ingest and grading (board.py)"""
+    __tablename__ = 'board_games'
+    
+    # No foreign key: the table is replaced wholesale on every rebuild
+    game_id = db.Column(UUID, primary_key=True)
+    game_time = db.Column(db.DateTime, nullable=False)
+    game_date = db.Column(db.Date, nullable=True)
+    away_team = db.Column(db.String(255), nullable=False)
+    home_team = db.Column(db.String(255), nullable=False)
+    away_score = db.Column(db.Integer, nullable=True)
+    home_score = db.Column(db.Integer, nullable=True)
+    is_completed = db.Column(db.Boolean, nullable=True)
+    has_odds = db.Column(db.Boolean, nullable=False, default=False)  # whether the game has a best_odds row
+    # Best lines, as in best_odds
+    away_ml = db.Column(db.Integer, nullable=True)
+    away_ml_book = db.Column(db.String(100), nullable=True)
+    home_ml = db.Column(db.Integer, nullable=True)
+    home_ml_book = db.Column(db.String(100), nullable=True)
+    away_spread = db.Column(db.Float, nullable=True)
+    away_spread_odds = db.Column(db.Integer, nullable=True)
+    away_spread_book = db.Column(db.String(100), nullable=True)
+    home_spread = db.Column(db.Float, nullable=True)
+    home_spread_odds = db.Column(db.Integer, nullable=True)
+    home_spread_book = db.Column(db.String(100), nullable=True)
+    over_line = db.Column(db.Float, nullable=True)
+    over_odds = db.Column(db.Integer, nullable=True)
+    over_book = db.Column(db.String(100), nullable=True)
+    under_line = db.Column(db.Float, nullable=True)
+    under_odds = db.Column(db.Integer, nullable=True)
+    under_book = db.Column(db.String(100), nullable=True)
+    
+    __table_args__ = (
+        # One Eastern date's games in tip-off order, and the next tip-off
+        db.Index('ix_board_games_date_time', 'game_date', 'game_time'),
+        db.Index('ix_board_games_game_time', 'game_time'),
+    )
+    
+    def __repr__(self):
+        return f'<BoardGame {self.away_team} @ {self.home_team}>'
+
+
+class OddsSnapshot(db.Model):
+    """Append-only odds history, one row per changed (game, bookmaker) line"""
+    __tablename__ = 'odds_snapshots'
+    
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    game_id = db.Column(UUID, db.ForeignKey('games.id', ondelete='CASCADE'), nullable=False)
+    bookmaker = db.Column(db.String(100), nullable=False)
+    captured_at = db.Column(db.DateTime, nullable=False)
+    # Bit i set means PRICE_FIELDS[i] changed in this snapshot (even if it changed to NULL);
+    # unset bits carry forward the previous snapshot's value
+    changed_mask = db.Column(db.SmallInteger, nullable=False)
+    away_ml = db.Column(db.Integer, nullable=True)
+    home_ml = db.Column(db.Integer, nullable=True)
+    away_spread = db.Column(db.Float, nullable=True)
+    home_spread = db.Column(db.Float, nullable=True)
+    spread_odds = db.Column(db.Integer, nullable=True)
+    total_line = db.Column(db.Float, nullable=True)
+    over_odds = db.Column(db.Integer, nullable=True)
+    under_odds = db.Column(db.Integer, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_odds_snapshots_game_book_time', 'game_id', 'bookmaker', 'captured_at', unique=True),
+    )
+    
+    def __repr__(self):
+        return f'<OddsSnapshot {self.bookmaker} for Game {self.game_id} at {self.captured_at}>'
+
+
 class Bet(db.Model):
     __tablename__ = 'bets'
     
-    id = db.Column(db.String(36), primary_key=True)
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
-    game_id = db.Column(db.String(36), db.ForeignKey('games.id', ondelete='CASCADE'), nullable=False)
+    id = db.Column(UUID, primary_key=True)
+    user_id = db.Column(UUID, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    game_id = db.Column(UUID, db.ForeignKey('games.id', ondelete='CASCADE'), nullable=False)
     bet_type = db.Column(db.String(20), nullable=False)  # ML, SPREAD, TOTAL_OVER, TOTAL_UNDER
     team = db.Column(db.String(255), nullable=True)  # which team (for ML and SPREAD)
     line = db.Column(db.Float, nullable=True)  # spread or total line
@@ -75,9 +215,105 @@ class Bet(db.Model):
     stake = db.Column(db.Float, nullable=False)  # amount wagered
     result = db.Column(db.String(20), default='PENDING')  # PENDING, WON, LOST, PUSH
     profit = db.Column(db.Float, nullable=True)  # profit/loss amount
+    idempotency_key = db.Column(db.String(128), nullable=True)  # client key, so a retried placement isn't booked twice
+    idempotency_hash = db.Column(db.String(64), nullable=True)  # hash of the leg the key booked (placement.leg_hash)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # Keyset pagination of a user's bet history (newest first)
+        db.Index('ix_bets_user_created', 'user_id', 'created_at', 'id'),
+        # Grading only ever looks for pending bets, a small slice of the table
+        db.Index('ix_bets_pending_game', 'game_id',
+                 postgresql_where=db.text("result = 'PENDING'"),
+                 sqlite_where=db.text("result = 'PENDING'")),
+        # A client idempotency key books at most one bet per user
+        db.Index('ux_bets_user_idempotency', 'user_id', 'idempotency_key', unique=True,
+                 postgresql_where=db.text('idempotency_key IS NOT NULL'),
+                 sqlite_where=db.text('idempotency_key IS NOT NULL')),
+    )
+    
     def __repr__(self):
         return f'<Bet {self.bet_type} on {self.team}>'
 
+
+class UserStats(db.Model):
+    """Running per-user bet totals, kept up to date with deltas as bets change"""
+    __tablename__ = 'user_stats'
+    
+    user_id = db.Column(UUID, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    total_bets = db.Column(db.Integer, nullable=False, default=0)
+    pending_bets = db.Column(db.Integer, nullable=False, default=0)
+    won_bets = db.Column(db.Integer, nullable=False, default=0)
+    lost_bets = db.Column(db.Integer, nullable=False, default=0)
+    push_bets = db.Column(db.Integer, nullable=False, default=0)
+    total_staked = db.Column(db.Float, nullable=False, default=0)
+    total_profit = db.Column(db.Float, nullable=False, default=0)
+    # Derived from the counters above, stored so the leaderboard can sort on an index
+    roi = db.Column(db.Float, nullable=False, default=0)
+    win_rate = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # On the rounded metrics the leaderboard orders and ranks by
+    __table_args__ = (
+        db.Index('ix_user_stats_rounded_profit', rounded_metric(total_profit), user_id, total_bets),
+        db.Index('ix_user_stats_rounded_roi', rounded_metric(roi), user_id, total_bets),
+        db.Index('ix_user_stats_rounded_win_rate', rounded_metric(win_rate), user_id, total_bets),
+    )
+    
+    def __repr__(self):
+        return f'<UserStats for User {self.user_id}>'
+
+
+class UserBetTypeStats(db.Model):
+    """Per-user, per-bet-type breakdown of UserStats"""
+    __tablename__ = 'user_bet_type_stats'
+    
+    user_id = db.Column(UUID, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    bet_type = db.Column(db.String(20), primary_key=True)
+    total_bets = db.Column(db.Integer, nullable=False, default=0)
+    pending_bets = db.Column(db.Integer, nullable=False, default=0)
+    won_bets = db.Column(db.Integer, nullable=False, default=0)
+    lost_bets = db.Column(db.Integer, nullable=False, default=0)
+    push_bets = db.Column(db.Integer, nullable=False, default=0)
+    total_staked = db.Column(db.Float, nullable=False, default=0)
+    total_profit = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserBetTypeStats {self.bet_type} for User {self.user_id}>'
+
+
+class UserDailyStats(db.Model):
+    """Per-user totals bucketed by game day (US Eastern), summed for rolling-window leaderboards"""
+    __tablename__ = 'user_daily_stats'
+    
+    user_id = db.Column(UUID, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    total_bets = db.Column(db.Integer, nullable=False, default=0)
+    pending_bets = db.Column(db.Integer, nullable=False, default=0)
+    won_bets = db.Column(db.Integer, nullable=False, default=0)
+    lost_bets = db.Column(db.Integer, nullable=False, default=0)
+    push_bets = db.Column(db.Integer, nullable=False, default=0)
+    total_staked = db.Column(db.Float, nullable=False, default=0)
+    total_profit = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_user_daily_stats_day', 'day', 'user_id'),
+    )
+    
+    def __repr__(self):
+        return f'<UserDailyStats {self.day} for User {self.user_id}>'
+
+
+class SchemaMigration(db.Model):
+    """Versions applied by migrations.py"""
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.String(100), primary_key=True)
+    description = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SchemaMigration {self.version}>'
@@ -1,11 +1,113 @@
 import requests
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from sqlalchemy import select, insert, update, delete
 from config import Config
+import hashlib
+import json
+import random
+import threading
+import time
 import uuid
 
+# Status codes worth retrying: rate limiting and transient upstream failures
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+# Latest quota figures from the x-requests-* response headers
+api_usage = {
+    'remaining': None,
+    'used': None,
+    'last_cost': {},  # endpoint ('odds' / 'scores') -> credits charged for the last call
+    'updated_at': None
+}
+_usage_lock = threading.Lock()
+
+
+def set_transport(transport):
+    """Route all Odds API calls through a stand-in (see odds_replay), or None for the real API"""
+    global _session
+    with _session_lock:
+        _session = transport
+
+
+def _has_stand_in():
+    """True when calls go to an offline transport, which needs no API key"""
+    return bool(Config.ODDS_API_TRANSPORT) or (_session is not None and not isinstance(_session, requests.Session))
+
+
+def get_session():
+    """Shared pooled HTTP session so every fetch reuses connections"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None and Config.ODDS_API_TRANSPORT:
+                from odds_replay import transport_from_spec
+                _session = transport_from_spec(Config.ODDS_API_TRANSPORT)
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.ODDS_API_MAX_WORKERS)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def _record_usage(url, response):
+    """Remember the quota headers The Odds API sends back on every response"""
+    headers = response.headers
+    if 'x-requests-remaining' not in headers:
+        return
+    
+    endpoint = url.rstrip('/').rsplit('/', 1)[-1]
+    with _usage_lock:
+        try:
+            api_usage['remaining'] = int(float(headers['x-requests-remaining']))
+            api_usage['used'] = int(float(headers.get('x-requests-used', 0)))
+            if 'x-requests-last' in headers:
+                api_usage['last_cost'][endpoint] = int(float(headers['x-requests-last']))
+        except ValueError:
+            return
+        api_usage['updated_at'] = datetime.utcnow()
+
+
+def api_get(url, params):
+    """GET with a per-request timeout and jittered exponential backoff on transient errors"""
+    session = get_session()
+    max_retries = Config.ODDS_API_MAX_RETRIES
+    
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.get(url, params=params, timeout=Config.ODDS_API_TIMEOUT)
+            _record_usage(url, response)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+                return response
+            print(f'⚠️ API returned {response.status_code}, retrying ({attempt + 1}/{max_retries})')
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == max_retries:
+                raise
+            print(f'⚠️ API request failed ({e}), retrying ({attempt + 1}/{max_retries})')
+        
+        # Full jitter keeps concurrent sport fetches from retrying in lockstep
+        time.sleep(random.uniform(0, Config.ODDS_API_BACKOFF * (2 ** attempt)))
+
+
+def fetch_all_sports(fetch, sports=None):
+    """Run fetch(sport) concurrently for each sport, yielding (sport, data) as each one finishes"""
+    sports = sports or Config.ODDS_SPORTS
+    workers = max(1, min(len(sports), Config.ODDS_API_MAX_WORKERS))
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='odds-api') as pool:
+        futures = {pool.submit(fetch, sport): sport for sport in sports}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
 def fetch_odds_from_api(sport='basketball_ncaab'):
     """Fetch odds from The Odds API"""
-    if not Config.ODDS_API_KEY:
+    if not Config.ODDS_API_KEY and not _has_stand_in():
         print('❌ ODDS_API_KEY not set in environment variables')
         return []
     
@@ -17,11 +119,11 @@ def fetch_odds_from_api(sport='basketball_ncaab'):
         'oddsFormat': 'american'
     }
     
-    sport_emoji = '🏀' if sport == 'basketball_ncaab' else '🏈'
+    sport_emoji = '🏀' if sport.startswith('basketball') else '🏈'
     print(f'{sport_emoji} Fetching {sport} odds from The Odds API...')
     
     try:
-        response = requests.get(url, params=params)
+        response = api_get(url, params)
         print(f'📡 API Response Status: {response.status_code}')
         
         if response.status_code != 200:
@@ -45,7 +147,7 @@ def fetch_odds_from_api(sport='basketball_ncaab'):
 
 def fetch_scores_from_api(sport='basketball_ncaab'):
     """Fetch scores from The Odds API"""
-    if not Config.ODDS_API_KEY:
+    if not Config.ODDS_API_KEY and not _has_stand_in():
         print('❌ ODDS_API_KEY not set')
         return []
     
@@ -56,7 +158,7 @@ def fetch_scores_from_api(sport='basketball_ncaab'):
     }
     
     try:
-        response = requests.get(url, params=params)
+        response = api_get(url, params)
         if response.status_code != 200:
             print(f'❌ Scores API Error {response.status_code}')
             return []
@@ -69,130 +171,435 @@ def fetch_scores_from_api(sport='basketball_ncaab'):
         return []
 
 
+# Rows per statement for bulk reads/writes (keeps IN lists and VALUES clauses bounded)
+BATCH_SIZE = 1000
+
+
+def _chunks(items, size=BATCH_SIZE):
+    """Yield successive slices of a list"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# How each best-line side ranks (point, price) candidates; higher key wins.
+# More points are better on spreads and unders, fewer on overs, then the better price.
+BEST_LINE_RANKING = {
+    'away_ml': lambda point, price: price,
+    'home_ml': lambda point, price: price,
+    'away_spread': lambda point, price: (point, price),
+    'home_spread': lambda point, price: (point, price),
+    'over': lambda point, price: (-point, price),
+    'under': lambda point, price: (point, price)
+}
+
+# best_odds columns for (point, price, book) of each side
+BEST_LINE_COLUMNS = {
+    'away_ml': (None, 'away_ml', 'away_ml_book'),
+    'home_ml': (None, 'home_ml', 'home_ml_book'),
+    'away_spread': ('away_spread', 'away_spread_odds', 'away_spread_book'),
+    'home_spread': ('home_spread', 'home_spread_odds', 'home_spread_book'),
+    'over': ('over_line', 'over_odds', 'over_book'),
+    'under': ('under_line', 'under_odds', 'under_book')
+}
+
+
+def fingerprint_game(game_data):
+    """Stable hash of the parts of a game payload we store (ignores last_update stamps and ordering)"""
+    bookmakers = []
+    for bookmaker_data in game_data.get('bookmakers', []):
+        markets = []
+        for market in bookmaker_data.get('markets', []):
+            outcomes = sorted(
+                (outcome['name'], outcome.get('price'), outcome.get('point'))
+                for outcome in market.get('outcomes', [])
+            )
+            markets.append((market['key'], outcomes))
+        bookmakers.append((bookmaker_data['key'], sorted(markets)))
+    
+    normalized = [
+        game_data['commence_time'],
+        game_data['away_team'],
+        game_data['home_team'],
+        sorted(bookmakers)
+    ]
+    return hashlib.sha1(json.dumps(normalized, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def _parse_game(game_data):
+    """Normalize one API game into a games row, one odds row per bookmaker and its best lines"""
+    from user_stats import game_day
+    
+    # Store naive UTC like the rest of the app (datetime.utcnow comparisons)
+    game_time = datetime.fromisoformat(game_data['commence_time'].replace('Z', '+00:00'))
+    if game_time.tzinfo is not None:
+        game_time = game_time.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    game_row = {
+        'external_id': game_data['id'],
+        'sport': game_data['sport_key'],
+        'game_time': game_time,
+        'game_date': game_day(game_time),
+        'away_team': game_data['away_team'],
+        'home_team': game_data['home_team'],
+        'odds_fingerprint': fingerprint_game(game_data)
+    }
+    
+    bookmakers = game_data.get('bookmakers', [])
+    if not bookmakers:
+        return game_row, [], None
+    
+    odds_rows = [_parse_bookmaker(game_row, bookmaker_data) for bookmaker_data in bookmakers]
+    return game_row, odds_rows, _best_lines(game_row, bookmakers)
+
+
+def _parse_bookmaker(game_row, bookmaker_data):
+    """Flatten one bookmaker's h2h, spreads and totals into an odds row"""
+    markets = {m['key']: m for m in bookmaker_data.get('markets', [])}
+    
+    odds_row = {
+        'bookmaker': bookmaker_data['key'],
+        'away_ml': None,
+        'home_ml': None,
+        'away_spread': None,
+        'home_spread': None,
+        'spread_odds': None,
+        'total_line': None,
+        'over_odds': None,
+        'under_odds': None
+    }
+    
+    # Moneyline
+    if 'h2h' in markets:
+        for outcome in markets['h2h']['outcomes']:
+            if outcome['name'] == game_row['away_team']:
+                odds_row['away_ml'] = int(outcome['price'])
+            elif outcome['name'] == game_row['home_team']:
+                odds_row['home_ml'] = int(outcome['price'])
+    
+    # Spreads
+    if 'spreads' in markets:
+        for outcome in markets['spreads']['outcomes']:
+            if outcome['name'] == game_row['away_team']:
+                odds_row['away_spread'] = float(outcome['point'])
+                odds_row['spread_odds'] = int(outcome['price'])
+            elif outcome['name'] == game_row['home_team']:
+                odds_row['home_spread'] = float(outcome['point'])
+    
+    # Totals
+    if 'totals' in markets:
+        for outcome in markets['totals']['outcomes']:
+            if outcome['name'] == 'Over':
+                odds_row['total_line'] = float(outcome['point'])
+                odds_row['over_odds'] = int(outcome['price'])
+            elif outcome['name'] == 'Under':
+                odds_row['under_odds'] = int(outcome['price'])
+    
+    return odds_row
+
+
+def _best_lines(game_row, bookmakers):
+    """Pick the best available price for every market and side across bookmakers"""
+    best = {}
+    
+    for bookmaker_data in bookmakers:
+        for market in bookmaker_data.get('markets', []):
+            for outcome in market['outcomes']:
+                name = outcome['name']
+                if market['key'] == 'h2h':
+                    side = 'away_ml' if name == game_row['away_team'] else 'home_ml' if name == game_row['home_team'] else None
+                elif market['key'] == 'spreads':
+                    side = 'away_spread' if name == game_row['away_team'] else 'home_spread' if name == game_row['home_team'] else None
+                elif market['key'] == 'totals':
+                    side = {'Over': 'over', 'Under': 'under'}.get(name)
+                else:
+                    side = None
+                
+                point = outcome.get('point')
+                if side is None or outcome.get('price') is None or (side not in ('away_ml', 'home_ml') and point is None):
+                    continue
+                
+                candidate = (
+                    float(point) if point is not None else None,
+                    int(outcome['price']),
+                    bookmaker_data['key']
+                )
+                rank = BEST_LINE_RANKING[side]
+                if side not in best or rank(*candidate[:2]) > rank(*best[side][:2]):
+                    best[side] = candidate
+    
+    best_row = {'game_id': None}
+    for side, (point_column, price_column, book_column) in BEST_LINE_COLUMNS.items():
+        point, price, book = best.get(side, (None, None, None))
+        if point_column:
+            best_row[point_column] = point
+        best_row[price_column] = price
+        best_row[book_column] = book
+    return best_row
+
+
+def _upsert_rows(db, model, rows, key):
+    """Insert-or-update rows by primary key column (ON CONFLICT on Postgres)"""
+    if not rows:
+        return
+    
+    key_column = getattr(model, key)
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        
+        for chunk in _chunks(rows):
+            stmt = pg_insert(model).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[key_column],
+                set_={column: stmt.excluded[column] for column in chunk[0] if column != key}
+            )
+            db.session.execute(stmt)
+        return
+    
+    existing = set()
+    for chunk in _chunks([row[key] for row in rows]):
+        existing.update(db.session.execute(select(key_column).where(key_column.in_(chunk))).scalars())
+    
+    new_rows = [row for row in rows if row[key] not in existing]
+    known_rows = [row for row in rows if row[key] in existing]
+    if new_rows:
+        db.session.execute(insert(model), new_rows)
+    if known_rows:
+        db.session.execute(update(model), known_rows)
+
+
+def _prefetch_games(db, external_ids):
+    """Map external_id -> (games.id, odds_fingerprint, game_date) for every game we already know about"""
+    from models import Game
+    
+    known = {}
+    for chunk in _chunks(external_ids):
+        rows = db.session.execute(
+            select(Game.external_id, Game.id, Game.odds_fingerprint, Game.game_date).where(Game.external_id.in_(chunk))
+        )
+        for external_id, game_id, fingerprint, game_date in rows:
+            known[external_id] = (game_id, fingerprint, game_date)
+    return known
+
+
+def _prefetch_odds(db, game_ids):
+    """Current odds rows for the given games, keyed by (game_id, bookmaker)"""
+    from models import Odds
+    from odds_history import PRICE_FIELDS
+    
+    columns = [Odds.id, Odds.game_id, Odds.bookmaker] + [getattr(Odds, field) for field in PRICE_FIELDS]
+    current = {}
+    for chunk in _chunks(game_ids):
+        for row in db.session.execute(select(*columns).where(Odds.game_id.in_(chunk))).mappings():
+            current[(row['game_id'], row['bookmaker'])] = dict(row)
+    return current
+
+
+def _upsert_games(db, game_rows, known_ids, now):
+    """Insert new games and refresh game_time/game_date on known ones, returning external_id -> id"""
+    from models import Game
+    
+    for row in game_rows:
+        row['id'] = known_ids.get(row['external_id']) or str(uuid.uuid4())
+        row['updated_at'] = now
+    
+    if db.engine.dialect.name == 'postgresql':
+        # INSERT ... ON CONFLICT keeps this correct even if another process
+        # inserted the same game between our prefetch and the write
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        
+        game_ids = {}
+        for chunk in _chunks(game_rows):
+            stmt = pg_insert(Game).values([dict(row, created_at=now) for row in chunk])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Game.external_id],
+                set_={
+                    'game_time': stmt.excluded.game_time,
+                    'game_date': stmt.excluded.game_date,
+                    'odds_fingerprint': stmt.excluded.odds_fingerprint,
+                    'updated_at': stmt.excluded.updated_at
+                }
+            ).returning(Game.external_id, Game.id)
+            game_ids.update(db.session.execute(stmt).tuples().all())
+        return game_ids
+    
+    # Portable fallback (SQLite etc.): the prefetch already split new from known games
+    new_rows = [dict(row, created_at=now) for row in game_rows if row['external_id'] not in known_ids]
+    known_rows = [
+        {'id': row['id'], 'game_time': row['game_time'], 'game_date': row['game_date'], 'odds_fingerprint': row['odds_fingerprint'], 'updated_at': now}
+        for row in game_rows if row['external_id'] in known_ids
+    ]
+    if new_rows:
+        db.session.execute(insert(Game), new_rows)
+    if known_rows:
+        db.session.execute(update(Game), known_rows)
+    
+    return {row['external_id']: row['id'] for row in game_rows}
+
+
 def parse_and_save_odds(odds_data, db):
-    """Parse odds data and save to database"""
-    from models import Game, Odds
+    """Parse odds data and save to database using set-based upserts
+    
+    Games whose payload fingerprint matches the stored one are skipped
+    entirely. Returns a change report of game ids:
+    {'added': [...], 'changed': [...], 'unchanged': [...]}, plus
+    'previous_days': the game_date changed games had before this ingest,
+    so boards a rescheduled game moved off can be expired too.
+    """
+    from models import Odds, BestOdds, OddsSnapshot
+    from odds_history import diff_snapshot
+    from board import rebuild_board
     
-    games_processed = 0
+    game_rows = {}
+    odds_rows = {}
+    best_rows = {}
     
     for game_data in odds_data:
         try:
-            # Parse game time
-            game_time = datetime.fromisoformat(game_data['commence_time'].replace('Z', '+00:00'))
-            
-            # Find or create game
-            game = Game.query.filter_by(external_id=game_data['id']).first()
-            
-            if not game:
-                game = Game(
-                    id=str(uuid.uuid4()),
-                    external_id=game_data['id'],
-                    sport=game_data['sport_key'],
-                    game_time=game_time,
-                    away_team=game_data['away_team'],
-                    home_team=game_data['home_team']
-                )
-                db.session.add(game)
-            else:
-                # Update game time in case it changed
-                game.game_time = game_time
-            
-            # Parse bookmaker odds (use first available bookmaker, prefer DraftKings)
-            bookmakers = game_data.get('bookmakers', [])
-            if not bookmakers:
-                continue
-            
-            # Try to find DraftKings, otherwise use first bookmaker
-            bookmaker_data = next((b for b in bookmakers if b['key'] == 'draftkings'), bookmakers[0])
-            
-            # Delete old odds for this game
-            Odds.query.filter_by(game_id=game.id).delete()
-            
-            # Parse markets
-            markets = {m['key']: m for m in bookmaker_data.get('markets', [])}
-            
-            odds = Odds(
-                id=str(uuid.uuid4()),
-                game_id=game.id,
-                bookmaker=bookmaker_data['key']
-            )
-            
-            # Moneyline
-            if 'h2h' in markets:
-                for outcome in markets['h2h']['outcomes']:
-                    if outcome['name'] == game.away_team:
-                        odds.away_ml = int(outcome['price'])
-                    elif outcome['name'] == game.home_team:
-                        odds.home_ml = int(outcome['price'])
-            
-            # Spreads
-            if 'spreads' in markets:
-                for outcome in markets['spreads']['outcomes']:
-                    if outcome['name'] == game.away_team:
-                        odds.away_spread = float(outcome['point'])
-                        odds.spread_odds = int(outcome['price'])
-                    elif outcome['name'] == game.home_team:
-                        odds.home_spread = float(outcome['point'])
-            
-            # Totals
-            if 'totals' in markets:
-                for outcome in markets['totals']['outcomes']:
-                    if outcome['name'] == 'Over':
-                        odds.total_line = float(outcome['point'])
-                        odds.over_odds = int(outcome['price'])
-                    elif outcome['name'] == 'Under':
-                        odds.under_odds = int(outcome['price'])
-            
-            db.session.add(odds)
-            games_processed += 1
-            
+            game_row, book_rows, best_row = _parse_game(game_data)
         except Exception as e:
             print(f'❌ Error processing game {game_data.get("id")}: {e}')
             continue
+        
+        external_id = game_row['external_id']
+        game_rows[external_id] = game_row
+        # Games without bookmakers keep whatever lines they already had
+        if book_rows:
+            odds_rows[external_id] = book_rows
+            best_rows[external_id] = best_row
+        else:
+            odds_rows.pop(external_id, None)
+            best_rows.pop(external_id, None)
+    
+    report = {'added': [], 'changed': [], 'unchanged': [], 'previous_days': set()}
+    if not game_rows:
+        print('✅ Processed and saved 0 games with odds')
+        return report
+    
+    now = datetime.utcnow()
+    
+    # One round of prefetching instead of a lookup per game
+    known = _prefetch_games(db, list(game_rows))
+    
+    # Drop games whose odds payload hasn't changed since the last ingest
+    for external_id, game_row in list(game_rows.items()):
+        if external_id in known and known[external_id][1] == game_row['odds_fingerprint']:
+            report['unchanged'].append(known[external_id][0])
+            del game_rows[external_id]
+            odds_rows.pop(external_id, None)
+            best_rows.pop(external_id, None)
+    
+    if not game_rows:
+        print(f'✅ All {len(report["unchanged"])} games unchanged, nothing to save')
+        return report
+    
+    known_ids = {external_id: game_id for external_id, (game_id, _, _) in known.items()}
+    # Read before the upsert rewrites game_time/game_date
+    report['previous_days'] = {known[external_id][2] for external_id in game_rows
+                               if external_id in known and known[external_id][2] is not None}
+    game_ids = _upsert_games(db, list(game_rows.values()), known_ids, now)
+    for external_id in game_rows:
+        report['changed' if external_id in known_ids else 'added'].append(game_ids[external_id])
+    
+    # Diff against the current lines: update in place, append history only for changes
+    current = _prefetch_odds(db, list({game_ids[external_id] for external_id in odds_rows}))
+    new_odds = []
+    changed_odds = []
+    snapshots = []
+    
+    for external_id, book_rows in odds_rows.items():
+        game_id = game_ids[external_id]
+        for odds_row in book_rows:
+            previous = current.pop((game_id, odds_row['bookmaker']), None)
+            
+            snapshot = diff_snapshot(previous, odds_row, game_id, odds_row['bookmaker'], now)
+            if snapshot:
+                snapshots.append(snapshot)
+            
+            if previous is None:
+                new_odds.append(dict(odds_row, id=str(uuid.uuid4()), game_id=game_id, created_at=now, updated_at=now))
+            elif snapshot:
+                changed_odds.append(dict(odds_row, id=previous['id'], updated_at=now))
+    
+    # Whatever is left belongs to a bookmaker these games no longer carry
+    for chunk in _chunks([row['id'] for row in current.values()]):
+        db.session.execute(delete(Odds).where(Odds.id.in_(chunk)))
+    if new_odds:
+        db.session.execute(insert(Odds), new_odds)
+    if changed_odds:
+        db.session.execute(update(Odds), changed_odds)
+    if snapshots:
+        db.session.execute(insert(OddsSnapshot), snapshots)
     
+    # Best-line index is recomputed from the full bookmakers array on every ingest
+    _upsert_rows(db, BestOdds, [
+        dict(best_row, game_id=game_ids[external_id], updated_at=now)
+        for external_id, best_row in best_rows.items()
+    ], 'game_id')
+    
+    # Homepage board snapshot, committed together with the lines it shows
+    rebuild_board(now)
     db.session.commit()
-    print(f'✅ Processed and saved {games_processed} games with odds')
-    return games_processed
+    print(f'✅ Saved {len(report["added"])} new and {len(report["changed"])} changed games, '
+          f'skipped {len(report["unchanged"])} unchanged ({len(snapshots)} line changes recorded)')
+    return report
 
 
 def update_scores_and_grade_bets(db):
-    """Update game scores and grade bets"""
-    from models import Game, Bet
-    from grading import grade_bet
+    """Update game scores and grade bets, one batch of games at a time
     
-    scores_data = fetch_scores_from_api()
-    games_updated = 0
-    bets_graded = 0
+    Returns {'games': ids of games whose score changed, 'graded': bets graded,
+    'users': ids of users who had bets graded}, so callers can expire exactly
+    what changed.
+    """
+    from models import Game
+    from grading import grade_pending_bets
+    from board import rebuild_board
     
-    for score_data in scores_data:
-        if not score_data.get('completed'):
-            continue
+    # Final scores from every configured sport, keyed by external id
+    final_scores = {}
+    for sport, sport_scores in fetch_all_sports(fetch_scores_from_api):
+        for score_data in sport_scores:
+            if score_data.get('completed'):
+                final_scores[score_data['id']] = score_data
+    
+    report = {'games': [], 'graded': 0, 'users': set()}
+    
+    for batch in _chunks(list(final_scores), Config.GRADING_BATCH_SIZE):
+        # One IN query for the whole batch instead of a lookup per score entry
+        games = Game.query.filter(Game.external_id.in_(batch)).all()
+        final_games = []
         
-        try:
-            game = Game.query.filter_by(external_id=score_data['id']).first()
-            if not game:
+        for game in games:
+            try:
+                scores = {s['name']: int(s['score']) for s in final_scores[game.external_id].get('scores') or []}
+            except (KeyError, TypeError, ValueError) as e:
+                print(f'❌ Error updating scores for game {game.external_id}: {e}')
                 continue
             
-            # Parse scores
-            scores = {s['name']: int(s['score']) for s in score_data.get('scores', [])}
+            if game.away_team not in scores or game.home_team not in scores:
+                continue
+            final_games.append(game)
             
-            if game.away_team in scores and game.home_team in scores:
-                game.away_score = scores[game.away_team]
-                game.home_score = scores[game.home_team]
-                game.is_completed = True
-                games_updated += 1
-                
-                # Grade all pending bets for this game
-                pending_bets = Bet.query.filter_by(game_id=game.id, result='PENDING').all()
-                for bet in pending_bets:
-                    grade_bet(bet, game)
-                    bets_graded += 1
+            # Already reconciled on an earlier poll: no write needed
+            if game.is_completed and game.away_score == scores[game.away_team] and game.home_score == scores[game.home_team]:
+                continue
+            
+            game.away_score = scores[game.away_team]
+            game.home_score = scores[game.home_team]
+            game.is_completed = True
+            report['games'].append(game.id)
         
-        except Exception as e:
-            print(f'❌ Error updating scores for game {score_data.get("id")}: {e}')
-            continue
+        # Pending bets for every final game in the batch come back in one query; this
+        # still picks up bets logged retroactively on games reconciled earlier
+        graded = grade_pending_bets(db, final_games)
+        report['graded'] += graded['graded']
+        report['users'] |= graded['users']
+        db.session.commit()
     
-    db.session.commit()
-    print(f'✅ Updated {games_updated} games, graded {bets_graded} bets')
-    return games_updated, bets_graded
-
+    if report['games']:
+        # Drops finished games from the homepage board snapshot
+        rebuild_board()
+        db.session.commit()
+    
+    print(f'✅ Updated {len(report["games"])} games, graded {report["graded"]} bets')
+    return report
@@ -0,0 +1,150 @@
+"""
+Odds history: append-only snapshots of each bookmaker's line and
+line-movement / opening / closing queries over them.
+"""
+
+from collections import defaultdict
+from sqlalchemy import select
+
+from models import db, Game, OddsSnapshot
+
+# Order matters: a field's position is its bit in OddsSnapshot.changed_mask
+PRICE_FIELDS = (
+    'away_ml',
+    'home_ml',
+    'away_spread',
+    'home_spread',
+    'spread_odds',
+    'total_line',
+    'over_odds',
+    'under_odds'
+)
+
+# Rows per IN list when querying many games at once
+BATCH_SIZE = 1000
+
+
+def diff_snapshot(previous, current, game_id, bookmaker, captured_at):
+    """Build a snapshot row holding only the fields that changed, or None if nothing did"""
+    mask = 0
+    row = {
+        'game_id': game_id,
+        'bookmaker': bookmaker,
+        'captured_at': captured_at
+    }
+    
+    for bit, field in enumerate(PRICE_FIELDS):
+        value = current.get(field)
+        if previous is None or previous.get(field) != value:
+            mask |= 1 << bit
+            row[field] = value
+        else:
+            row[field] = None
+    
+    if not mask:
+        return None
+    
+    row['changed_mask'] = mask
+    return row
+
+
+def _iter_states(snapshots):
+    """Forward-fill snapshots (ordered by game, bookmaker, time) into full line states"""
+    state = None
+    key = None
+    
+    for snap in snapshots:
+        if (snap.game_id, snap.bookmaker) != key:
+            key = (snap.game_id, snap.bookmaker)
+            state = {field: None for field in PRICE_FIELDS}
+        
+        for bit, field in enumerate(PRICE_FIELDS):
+            if snap.changed_mask & (1 << bit):
+                state[field] = getattr(snap, field)
+        
+        yield snap, dict(state)
+
+
+def _snapshots_query(game_ids, bookmaker=None):
+    """Snapshots for the given games in index order"""
+    query = select(OddsSnapshot).where(OddsSnapshot.game_id.in_(game_ids))
+    if bookmaker:
+        query = query.where(OddsSnapshot.bookmaker == bookmaker)
+    return query.order_by(OddsSnapshot.game_id, OddsSnapshot.bookmaker, OddsSnapshot.captured_at)
+
+
+def _serialize(snap, state):
+    """JSON-friendly line state"""
+    return {
+        'gameId': snap.game_id,
+        'bookmaker': snap.bookmaker,
+        'capturedAt': snap.captured_at.isoformat(),
+        **state
+    }
+
+
+def get_line_movement(game_id, bookmaker=None):
+    """Every recorded line for a game (optionally one bookmaker), oldest first"""
+    snapshots = db.session.execute(_snapshots_query([game_id], bookmaker)).scalars()
+    return [_serialize(snap, state) for snap, state in _iter_states(snapshots)]
+
+
+def get_opening_and_closing(game_ids, bookmaker=None):
+    """Opening and closing line per (game, bookmaker)
+    
+    The closing line is the last snapshot captured before the game started
+    (or the latest one if the game hasn't started yet).
+    """
+    game_ids = list(game_ids)
+    results = defaultdict(dict)
+    
+    for i in range(0, len(game_ids), BATCH_SIZE):
+        chunk = game_ids[i:i + BATCH_SIZE]
+        start_times = dict(db.session.execute(
+            select(Game.id, Game.game_time).where(Game.id.in_(chunk))
+        ).tuples().all())
+        
+        snapshots = db.session.execute(_snapshots_query(chunk, bookmaker)).scalars()
+        for snap, state in _iter_states(snapshots):
+            lines = results[snap.game_id].setdefault(snap.bookmaker, {})
+            if 'opening' not in lines:
+                lines['opening'] = _serialize(snap, state)
+            game_time = start_times.get(snap.game_id)
+            if game_time is None or snap.captured_at <= game_time or 'closing' not in lines:
+                lines['closing'] = _serialize(snap, state)
+    
+    return dict(results)
+
+
+def get_opening_and_closing_for_range(start, end, sport=None, bookmaker=None):
+    """Opening and closing lines for every game starting in [start, end)"""
+    query = select(Game.id).where(Game.game_time >= start, Game.game_time < end)
+    if sport:
+        query = query.where(Game.sport == sport)
+    game_ids = db.session.execute(query).scalars().all()
+    return get_opening_and_closing(game_ids, bookmaker)
+
+
+def backfill_snapshots():
+    """Seed an opening snapshot for current odds rows that predate the history table"""
+    from sqlalchemy import and_, exists, insert, literal
+    from models import Odds
+    
+    has_history = exists().where(and_(
+        OddsSnapshot.game_id == Odds.game_id,
+        OddsSnapshot.bookmaker == Odds.bookmaker
+    ))
+    source = select(
+        Odds.game_id,
+        Odds.bookmaker,
+        Odds.updated_at,
+        literal((1 << len(PRICE_FIELDS)) - 1),
+        *[getattr(Odds, field) for field in PRICE_FIELDS]
+    ).where(~has_history, Odds.bookmaker.isnot(None), Odds.updated_at.isnot(None))
+    
+    result = db.session.execute(insert(OddsSnapshot).from_select(
+        ['game_id', 'bookmaker', 'captured_at', 'changed_mask', *PRICE_FIELDS],
+        source
+    ))
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,279 @@
+"""
+Offline stand-ins for The Odds API.
+
+Transports quack like requests.Session.get() and can be plugged under
+fetch_odds_from_api/fetch_scores_from_api, either programmatically via
+odds_api.set_transport() or with ODDS_API_TRANSPORT:
+
+    replay:/path/to/recordings      replay payloads captured with record:
+    record:/path/to/recordings      hit the real API and save every payload
+    synthetic:games=10000,bookmakers=20,latency=0.2,error_rate=0.01
+
+The same transports can be served over HTTP for anything that can't be
+patched in-process (point ODDS_API_BASE_URL at it):
+
+    python odds_replay.py serve synthetic:games=5000 --port 8099
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+BOOKMAKERS = [
+    'draftkings', 'fanduel', 'betmgm', 'williamhill_us', 'pointsbetus',
+    'betrivers', 'unibet_us', 'wynnbet', 'superbook', 'bovada',
+    'mybookieag', 'betonlineag', 'lowvig', 'betus', 'barstool',
+    'twinspires', 'foxbet', 'betfair', 'espnbet', 'fliff'
+]
+
+
+class FakeResponse:
+    """The slice of requests.Response the fetch functions use"""
+    
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = CaseInsensitiveDict(headers or {})
+    
+    def json(self):
+        return self._payload
+    
+    @property
+    def text(self):
+        return json.dumps(self._payload)
+
+
+def _split_url(url):
+    """'.../sports/<sport>/<endpoint>/' -> (sport, endpoint)"""
+    parts = url.rstrip('/').split('/')
+    return parts[-2], parts[-1]
+
+
+def generate_odds_slate(sport, games, bookmakers=5, seed=42, start=None):
+    """Odds API style payload with `games` games, each priced by `bookmakers` books"""
+    rng = random.Random(f'{sport}:{seed}')
+    start = start or datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    books = BOOKMAKERS[:bookmakers] + [f'book{i}' for i in range(len(BOOKMAKERS), bookmakers)]
+    payload = []
+    
+    for i in range(games):
+        away, home = f'{sport} Away {i}', f'{sport} Home {i}'
+        spread = rng.choice([-1, 1]) * rng.randint(1, 30) / 2
+        total = rng.randint(250, 330) / 2
+        away_ml = rng.choice([-1, 1]) * rng.randint(100, 400)
+        bookmaker_list = []
+        
+        for key in books:
+            # Books shade the consensus line a little so best-line picking has work to do
+            shade = rng.choice([-0.5, 0, 0, 0.5])
+            bookmaker_list.append({
+                'key': key,
+                'title': key.replace('_', ' ').title(),
+                'last_update': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'markets': [
+                    {'key': 'h2h', 'outcomes': [
+                        {'name': away, 'price': away_ml + rng.randint(-10, 10)},
+                        {'name': home, 'price': -away_ml + rng.randint(-10, 10)}
+                    ]},
+                    {'key': 'spreads', 'outcomes': [
+                        {'name': away, 'price': rng.choice([-115, -110, -105]), 'point': spread + shade},
+                        {'name': home, 'price': rng.choice([-115, -110, -105]), 'point': -spread - shade}
+                    ]},
+                    {'key': 'totals', 'outcomes': [
+                        {'name': 'Over', 'price': rng.choice([-115, -110, -105]), 'point': total + shade},
+                        {'name': 'Under', 'price': rng.choice([-115, -110, -105]), 'point': total + shade}
+                    ]}
+                ]
+            })
+        
+        payload.append({
+            'id': f'{sport}-{seed}-{i}',
+            'sport_key': sport,
+            'commence_time': (start + timedelta(minutes=i % 1440)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'away_team': away,
+            'home_team': home,
+            'bookmakers': bookmaker_list
+        })
+    
+    return payload
+
+
+def scores_for_slate(slate, completed_fraction=1.0, seed=42):
+    """Scores payload for a generated slate, with completed_fraction of games final"""
+    rng = random.Random(f'scores:{seed}')
+    scores = []
+    
+    for game in slate:
+        completed = rng.random() < completed_fraction
+        scores.append({
+            'id': game['id'],
+            'sport_key': game['sport_key'],
+            'commence_time': game['commence_time'],
+            'completed': completed,
+            'home_team': game['home_team'],
+            'away_team': game['away_team'],
+            'scores': [
+                {'name': game['home_team'], 'score': str(rng.randint(50, 100))},
+                {'name': game['away_team'], 'score': str(rng.randint(50, 100))}
+            ] if completed else None
+        })
+    
+    return scores
+
+
+class SyntheticTransport:
+    """Generates slates on the fly with configurable size, latency and failure rate"""
+    
+    def __init__(self, games=100, bookmakers=5, latency=0.0, error_rate=0.0,
+                 drift=0.0, completed_fraction=1.0, seed=42, quota=500):
+        self.games = int(games)
+        self.bookmakers = int(bookmakers)
+        self.latency = float(latency)
+        self.error_rate = float(error_rate)
+        self.drift = float(drift)  # fraction of games whose lines move between calls
+        self.completed_fraction = float(completed_fraction)
+        self.seed = seed
+        self.remaining = int(quota)
+        self.used = 0
+        self._rng = random.Random(seed)
+        self._slates = {}
+        self._lock = threading.Lock()
+    
+    def _slate(self, sport):
+        with self._lock:
+            if sport not in self._slates:
+                self._slates[sport] = generate_odds_slate(sport, self.games, self.bookmakers, self.seed)
+            slate = self._slates[sport]
+            # Nudge a few moneylines so repeated fetches exercise the changed-game path
+            for game in self._rng.sample(slate, int(len(slate) * self.drift)):
+                for bookmaker_data in game['bookmakers']:
+                    bookmaker_data['markets'][0]['outcomes'][0]['price'] += self._rng.choice([-5, 5])
+            return slate
+    
+    def get(self, url, params=None, timeout=None):
+        if self.latency:
+            time.sleep(self.latency * self._rng.uniform(0.5, 1.5))
+        if self._rng.random() < self.error_rate:
+            if self._rng.random() < 0.5:
+                raise requests.ConnectionError('synthetic connection reset')
+            return FakeResponse(503, {'message': 'synthetic outage'})
+        
+        sport, endpoint = _split_url(url)
+        cost = 3 if endpoint == 'odds' else 2
+        with self._lock:
+            self.remaining -= cost
+            self.used += cost
+            headers = {
+                'x-requests-remaining': str(self.remaining),
+                'x-requests-used': str(self.used),
+                'x-requests-last': str(cost)
+            }
+        
+        slate = self._slate(sport)
+        if endpoint == 'scores':
+            return FakeResponse(200, scores_for_slate(slate, self.completed_fraction, self.seed), headers)
+        return FakeResponse(200, slate, headers)
+
+
+class ReplayTransport:
+    """Serves payloads captured by RecordingTransport, cycling through each endpoint's recordings"""
+    
+    def __init__(self, directory, latency=0.0):
+        self.directory = directory
+        self.latency = float(latency)
+        self._positions = {}
+        self._lock = threading.Lock()
+    
+    def _recordings(self, sport, endpoint):
+        prefix = f'{sport}__{endpoint}__'
+        return sorted(f for f in os.listdir(self.directory) if f.startswith(prefix) and f.endswith('.json'))
+    
+    def get(self, url, params=None, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        
+        sport, endpoint = _split_url(url)
+        recordings = self._recordings(sport, endpoint)
+        if not recordings:
+            return FakeResponse(404, {'message': f'no recordings for {sport} {endpoint}'})
+        
+        with self._lock:
+            position = self._positions.get((sport, endpoint), 0)
+            self._positions[(sport, endpoint)] = position + 1
+        
+        with open(os.path.join(self.directory, recordings[position % len(recordings)])) as f:
+            recording = json.load(f)
+        return FakeResponse(recording['status_code'], recording['payload'], recording['headers'])
+
+
+class RecordingTransport:
+    """Passes requests through to the real API and saves every successful payload"""
+    
+    def __init__(self, directory, session=None):
+        self.directory = directory
+        self.session = session or requests.Session()
+        os.makedirs(directory, exist_ok=True)
+    
+    def get(self, url, params=None, timeout=None):
+        response = self.session.get(url, params=params, timeout=timeout)
+        if response.status_code == 200:
+            sport, endpoint = _split_url(url)
+            stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+            path = os.path.join(self.directory, f'{sport}__{endpoint}__{stamp}.json')
+            with open(path, 'w') as f:
+                json.dump({
+                    'status_code': response.status_code,
+                    # Keep the quota headers so replays drive the adaptive poller realistically
+                    'headers': {k: v for k, v in response.headers.items() if k.lower().startswith('x-requests')},
+                    'payload': response.json()
+                }, f)
+            print(f'💾 Recorded {sport} {endpoint} to {path}')
+        return response
+
+
+def transport_from_spec(spec):
+    """Build a transport from an ODDS_API_TRANSPORT string"""
+    kind, _, arg = spec.partition(':')
+    
+    if kind == 'replay':
+        return ReplayTransport(arg)
+    if kind == 'record':
+        return RecordingTransport(arg)
+    if kind == 'synthetic':
+        options = dict(item.split('=', 1) for item in arg.split(',') if item)
+        return SyntheticTransport(**options)
+    raise ValueError(f'Unknown ODDS_API_TRANSPORT {spec!r} (expected replay:, record: or synthetic:)')
+
+
+def serve(transport, port):
+    """Expose a transport as a local HTTP stand-in for The Odds API"""
+    from flask import Flask, jsonify, request
+    
+    stand_in = Flask(__name__)
+    
+    @stand_in.route('/v4/sports/<sport>/<endpoint>/')
+    def proxy(sport, endpoint):
+        try:
+            response = transport.get(f'/v4/sports/{sport}/{endpoint}/', params=request.args.to_dict())
+        except requests.ConnectionError:
+            return jsonify({'message': 'synthetic connection reset'}), 502
+        return jsonify(response.json()), response.status_code, dict(response.headers)
+    
+    print(f'🧪 Odds API stand-in on http://localhost:{port}/v4 (set ODDS_API_BASE_URL to this)')
+    stand_in.run(port=port, threaded=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline stand-in for The Odds API')
+    parser.add_argument('command', choices=['serve'])
+    parser.add_argument('spec', help='replay:<dir>, record:<dir> or synthetic:key=value,...')
+    parser.add_argument('--port', type=int, default=8099)
+    args = parser.parse_args()
+    serve(transport_from_spec(args.spec), args.port)
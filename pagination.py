@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Opaque cursors for keyset pagination.
+
+A cursor is the sort key of the last row on a page, JSON-encoded and
+base64'd so it can ride in a query string. Pages are then fetched with
+WHERE (key...) < (cursor...) on an index instead of OFFSET, so page 200
+costs the same as page 1.
+"""
+
+import base64
+import json
+
+
+def encode_cursor(*values):
+    """Pack a row's sort key into a URL-safe token"""
+    raw = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Unpack a token from encode_cursor, returning None if it is missing or malformed"""
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Bet placement: one bet or a whole slip in a single transaction.
+
+place_bets() takes legs already checked by parse_leg / parse_slip, loads
+every game they reference with one query, and inserts the bets and their
+stats deltas (apply_bet_changes) together, so a slip is booked whole or
+not at all.
+
+A leg may carry a client idempotency key, unique per user
+(ux_bets_user_idempotency). A key that already booked a bet returns that
+bet instead of a new one, so a client retrying after a timeout never
+double-books. Two retries racing each other are settled by the unique
+index: the loser rolls back and picks up the winner's bets. A hash of the
+leg is stored with its key, and a key sent again with a different bet is
+refused (422) rather than answered with the bet it booked first.
+
+The hash follows the bet as it is now: editing a keyed bet recomputes it
+(rehash), and migration 0010 backfilled older bets from their current
+fields. So once a bet has been edited, its key replays the edited bet and
+refuses the original request, whenever the bet was booked.
+"""
+
+import hashlib
+import json
+import uuid
+from collections import namedtuple
+
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Bet, Game, is_uuid
+from user_stats import apply_bet_changes, BetState, game_day
+
+BET_TYPES = ('ML', 'SPREAD', 'TOTAL_OVER', 'TOTAL_UNDER')
+
+# Bets per request, and the longest client key (bets.idempotency_key holds 128)
+MAX_LEGS = 100
+MAX_KEY_LENGTH = 100
+
+# The bet fields leg_hash covers
+HASHED_FIELDS = ('game_id', 'bet_type', 'team', 'line', 'odds', 'stake')
+
+# One leg's outcome; created is False when its key had already booked bet_id
+Placed = namedtuple('Placed', ['bet_id', 'created'])
+
+
+class PlacementError(ValueError):
+    """A slip that can't be booked; status is the HTTP status to answer with"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def leg_hash(leg):
+    """Stable hash of a parsed leg's bet fields, stored as bets.idempotency_hash"""
+    normalized = [leg[field] for field in HASHED_FIELDS]
+    return hashlib.sha256(json.dumps(normalized, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def rehash(bet):
+    """Recompute a keyed bet's idempotency_hash after its fields were edited"""
+    if bet.idempotency_key is not None:
+        bet.idempotency_hash = leg_hash({field: getattr(bet, field) for field in HASHED_FIELDS})
+
+
+def parse_leg(data, key=None):
+    """Bet columns from one request leg (gameId, betType, team, line, odds, stake, idempotencyKey)
+    
+    key is the idempotency key to use when the leg doesn't carry its own.
+    """
+    if not isinstance(data, dict) or not all([data.get('gameId'), data.get('betType'), data.get('odds'), data.get('stake')]):
+        raise PlacementError('Missing required fields')
+    if data['betType'] not in BET_TYPES:
+        raise PlacementError(f'Unknown bet type {data["betType"]}')
+    if not is_uuid(data['gameId']):
+        raise PlacementError('Game not found', 404)
+    
+    key = data.get('idempotencyKey') or key
+    if key is not None and (not isinstance(key, str) or len(key) > MAX_KEY_LENGTH):
+        raise PlacementError(f'Idempotency key must be a string of at most {MAX_KEY_LENGTH} characters')
+    
+    line = data.get('line')
+    try:
+        leg = {
+            'game_id': data['gameId'].lower(),
+            'bet_type': data['betType'],
+            'team': data.get('team'),
+            'line': float(line) if line else None,
+            'odds': int(data['odds']),
+            'stake': float(data['stake']),
+            'idempotency_key': key
+        }
+    except (TypeError, ValueError):
+        raise PlacementError('Line, odds and stake must be numbers')
+    if leg['stake'] <= 0:
+        raise PlacementError('Stake must be positive')
+    leg['idempotency_hash'] = leg_hash(leg) if key is not None else None
+    return leg
+
+
+def parse_slip(items, slip_key=None):
+    """parse_leg for every leg of a bulk request; a slip-wide key gives leg i the key '<slip_key>:<i>'"""
+    if not isinstance(items, list) or not items:
+        raise PlacementError('bets must be a non-empty list')
+    if len(items) > MAX_LEGS:
+        raise PlacementError(f'At most {MAX_LEGS} bets per request')
+    
+    legs = []
+    for i, item in enumerate(items):
+        try:
+            legs.append(parse_leg(item, f'{slip_key}:{i}' if slip_key else None))
+        except PlacementError as e:
+            raise PlacementError(f'Bet {i + 1}: {e}', e.status)
+    return legs
+
+
+def place_bets(user_id, legs):
+    """Book parsed legs for user_id in one transaction; returns a Placed per leg, in order
+    
+    Legs whose key already booked a bet come back as that bet and aren't
+    checked against games again, provided they ask for the same bet (else
+    PlacementError, 422). If any other leg's game doesn't exist nothing
+    is booked (PlacementError, 404).
+    """
+    keys = [leg['idempotency_key'] for leg in legs if leg['idempotency_key'] is not None]
+    if len(set(keys)) != len(keys):
+        raise PlacementError('Idempotency keys must be unique within a request')
+    
+    try:
+        return _book(user_id, legs, keys)
+    except IntegrityError:
+        # A concurrent retry booked some of these keys first; its bets are ours
+        db.session.rollback()
+        return _book(user_id, legs, keys)
+
+
+def _book(user_id, legs, keys):
+    booked = {row.idempotency_key: row for row in db.session.execute(
+        select(Bet.idempotency_key, Bet.id, Bet.idempotency_hash)
+        .where(Bet.user_id == user_id, Bet.idempotency_key.in_(keys))
+    )} if keys else {}
+    for leg in legs:
+        row = booked.get(leg['idempotency_key'])
+        # No stored hash: booked by a worker still running the code from before 0010
+        if row is not None and row.idempotency_hash not in (None, leg['idempotency_hash']):
+            raise PlacementError(f'Idempotency key {leg["idempotency_key"]} was already used for a different bet', 422)
+    new = [leg for leg in legs if leg['idempotency_key'] not in booked]
+    
+    # Every game the new legs reference, in one query
+    game_ids = {leg['game_id'] for leg in new}
+    game_times = dict(db.session.execute(
+        select(Game.id, Game.game_time).where(Game.id.in_(game_ids))
+    ).all()) if game_ids else {}
+    missing = game_ids - game_times.keys()
+    if missing:
+        raise PlacementError('Game not found' if len(legs) == 1 else f'Games not found: {", ".join(sorted(missing))}', 404)
+    
+    rows = [dict(leg, id=str(uuid.uuid4()), user_id=user_id, result='PENDING') for leg in new]
+    if rows:
+        db.session.execute(insert(Bet), rows)
+        apply_bet_changes((None, BetState(user_id, row['bet_type'], 'PENDING', row['stake'], None,
+                                          game_day(game_times[row['game_id']])))
+                          for row in rows)
+    db.session.commit()
+    
+    ids = iter(row['id'] for row in rows)
+    return [
+        Placed(booked[leg['idempotency_key']].id, False) if leg['idempotency_key'] in booked else Placed(next(ids), True)
+        for leg in legs
+    ]
@@ -0,0 +1,215 @@
+"""
+Quota-aware adaptive polling for The Odds API.
+
+A single scheduler tick (every minute) decides whether an odds fetch or a
+score update is due, based on how close the next game is, whether games
+are live, and how many API credits are left for the month.
+"""
+
+import calendar
+import threading
+from datetime import datetime, timedelta
+
+from config import Config
+
+# Desired odds cadence by time until the next tip-off: (within, poll every)
+ODDS_SCHEDULE = [
+    (timedelta(hours=1), timedelta(minutes=15)),
+    (timedelta(hours=6), timedelta(hours=1)),
+    (timedelta(hours=24), timedelta(hours=3))
+]
+# With nothing in the next day, still look for newly listed games twice daily
+ODDS_IDLE_INTERVAL = timedelta(hours=12)
+
+# Games past their expected end that still aren't final get a slower sweep
+SCORES_CATCHUP_INTERVAL = timedelta(minutes=30)
+SCORES_CATCHUP_WINDOW = timedelta(hours=12)
+
+# Credit cost per sport when the API hasn't told us yet: odds = 3 markets x
+# 1 region; scores cost 2 whenever daysFrom is sent (fetch_scores sends 1), 1 without
+DEFAULT_COST = {'odds': 3, 'scores': 2}
+
+# The poller and the quota figures live in the leader process only; it
+# publishes them here after every tick so any worker can report them
+STATUS_KEY = 'scheduler:status'
+STATUS_TIMEOUT = 10 * 60
+
+
+def desired_odds_interval(now, next_game_time):
+    """How often odds should be refreshed, ignoring quota"""
+    if next_game_time is None:
+        return ODDS_IDLE_INTERVAL
+    
+    until_tip = next_game_time - now
+    for within, interval in ODDS_SCHEDULE:
+        if until_tip <= within:
+            return interval
+    return ODDS_IDLE_INTERVAL
+
+
+def desired_scores_interval(live_games, unfinished_games):
+    """How often scores should be polled (None = don't poll), ignoring quota"""
+    if live_games:
+        return timedelta(minutes=Config.SCORES_LIVE_INTERVAL)
+    if unfinished_games:
+        return SCORES_CATCHUP_INTERVAL
+    return None
+
+
+def seconds_left_in_month(now):
+    """Seconds until the calendar month (our budget period) rolls over"""
+    days_in_month = calendar.monthrange(now.year, now.month)[1]
+    month_end = datetime(now.year, now.month, days_in_month) + timedelta(days=1)
+    return max((month_end - now).total_seconds(), 1)
+
+
+def budget_left(usage):
+    """Credits we may still spend this month, per our budget and the API's own count"""
+    used = usage.get('used') or 0
+    left = Config.ODDS_API_MONTHLY_BUDGET - used
+    if usage.get('remaining') is not None:
+        left = min(left, usage['remaining'])
+    return left - Config.ODDS_API_RESERVE
+
+
+def stretch_factor(now, usage, odds_interval, scores_interval, odds_cost, scores_cost):
+    """Factor (>= 1) to slow both cadences by so the month's budget lasts until it resets"""
+    left = budget_left(usage)
+    if left <= 0:
+        return None
+    
+    # Credits per second we would spend at the desired cadence vs what we can afford
+    spend_rate = odds_cost / odds_interval.total_seconds()
+    if scores_interval:
+        spend_rate += scores_cost / scores_interval.total_seconds()
+    affordable_rate = left / seconds_left_in_month(now)
+    
+    return max(1.0, spend_rate / affordable_rate)
+
+
+class AdaptivePoller:
+    """Decides on each tick whether odds or scores are due and runs them"""
+    
+    def __init__(self, fetch_odds, update_scores):
+        self.fetch_odds = fetch_odds
+        self.update_scores = update_scores
+        self.last_odds_run = None
+        self.last_scores_run = None
+        self.plan = {}
+        self._lock = threading.Lock()
+    
+    def _game_windows(self, now):
+        """Next tip-off, live game count and count of games that should be final by now"""
+        from models import db, Game
+        from sqlalchemy import func
+        
+        live_since = now - timedelta(hours=Config.GAME_DURATION_HOURS)
+        
+        next_game_time = db.session.query(func.min(Game.game_time))\
+            .filter(Game.game_time > now).scalar()
+        live_games = Game.query.filter(
+            Game.game_time <= now,
+            Game.game_time > live_since,
+            Game.is_completed.isnot(True)
+        ).count()
+        unfinished_games = Game.query.filter(
+            Game.game_time <= live_since,
+            Game.game_time > now - SCORES_CATCHUP_WINDOW,
+            Game.is_completed.isnot(True)
+        ).count()
+        
+        return next_game_time, live_games, unfinished_games
+    
+    def _plan(self, now):
+        """Work out the current odds/scores intervals within the quota"""
+        from odds_api import api_usage
+        
+        next_game_time, live_games, unfinished_games = self._game_windows(now)
+        odds_interval = desired_odds_interval(now, next_game_time)
+        scores_interval = desired_scores_interval(live_games, unfinished_games)
+        
+        sports = len(Config.ODDS_SPORTS)
+        odds_cost = api_usage['last_cost'].get('odds', DEFAULT_COST['odds']) * sports
+        scores_cost = api_usage['last_cost'].get('scores', DEFAULT_COST['scores']) * sports
+        
+        factor = stretch_factor(now, api_usage, odds_interval, scores_interval, odds_cost, scores_cost)
+        if factor is None:
+            odds_interval = scores_interval = None
+        else:
+            odds_interval = odds_interval * factor
+            if scores_interval:
+                scores_interval = scores_interval * factor
+        
+        return {
+            'nextGameTime': next_game_time,
+            'liveGames': live_games,
+            'unfinishedGames': unfinished_games,
+            'oddsInterval': odds_interval,
+            'scoresInterval': scores_interval,
+            'stretch': factor,
+            'budgetLeft': budget_left(api_usage)
+        }
+    
+    @staticmethod
+    def _due(last_run, interval, now):
+        return interval is not None and (last_run is None or now - last_run >= interval)
+    
+    def tick(self, now=None):
+        """Run whichever jobs are due (call inside an app context)"""
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            now = now or datetime.utcnow()
+            self.plan = self._plan(now)
+            
+            if self.plan['stretch'] is None:
+                print(f'⛽ Odds API budget exhausted ({self.plan["budgetLeft"]} credits left), skipping polls')
+                return
+            
+            if self._due(self.last_scores_run, self.plan['scoresInterval'], now):
+                self.last_scores_run = now
+                self.update_scores()
+            
+            if self._due(self.last_odds_run, self.plan['oddsInterval'], now):
+                self.last_odds_run = now
+                self.fetch_odds()
+        finally:
+            self._lock.release()
+    
+    def status(self):
+        """Current plan and quota for the status endpoint"""
+        from odds_api import api_usage
+        
+        def minutes(interval):
+            return round(interval.total_seconds() / 60, 1) if interval else None
+        
+        def iso(dt):
+            return dt.isoformat() if dt else None
+        
+        plan = self.plan
+        return {
+            'remaining': api_usage['remaining'],
+            'used': api_usage['used'],
+            'monthlyBudget': Config.ODDS_API_MONTHLY_BUDGET,
+            'budgetLeft': plan.get('budgetLeft'),
+            'liveGames': plan.get('liveGames'),
+            'nextGameTime': iso(plan.get('nextGameTime')),
+            'oddsIntervalMinutes': minutes(plan.get('oddsInterval')),
+            'scoresIntervalMinutes': minutes(plan.get('scoresInterval')),
+            'lastOddsRun': iso(self.last_odds_run),
+            'lastScoresRun': iso(self.last_scores_run)
+        }
+    
+    def publish(self, **extra):
+        """Share status() (plus extra fields) with the other workers through the cache"""
+        from caching import cache
+        
+        cache.set(STATUS_KEY, dict(self.status(), publishedAt=datetime.utcnow().isoformat(), **extra),
+                  timeout=STATUS_TIMEOUT)
+
+
+def published_status():
+    """The leader's last published poller status, or None if no leader has published lately"""
+    from caching import cache
+    
+    return cache.get(STATUS_KEY)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Immutable records returned by the cached helpers.
+
+The memoized helpers (homepage board, user stats and analytics,
+leaderboard pages) live in the shared cache, pickled. Dicts pickle every
+key with every value, and ORM objects drag their session state along.
+These are NamedTuples instead:
+
+- no per-instance __dict__ (a leaderboard entry is 112 bytes in memory
+  against 272 for the dict it replaces)
+- attribute access, so the templates read them exactly like the dicts
+
+A NamedTuple pickles as its class plus a call to rebuild it, which costs
+more per instance than a dict. So memoize stores them through codec():
+bare tuples of values, which pickle natively, rebuilt into records on a
+hit.
+
+Field names keep the keys the templates and the JSON API have always
+used. JSON would turn a tuple into a list, so pass records through
+as_json() before jsonify.
+"""
+
+import functools
+import operator
+from datetime import date, datetime
+from typing import Callable, NamedTuple, Optional, Tuple, get_args, get_origin, get_type_hints
+
+
+def as_json(value):
+    """Records (nested in lists, tuples or dicts too) as plain dicts for jsonify"""
+    if hasattr(value, '_asdict'):
+        return {key: as_json(item) for key, item in zip(value._fields, value)}
+    if isinstance(value, (list, tuple)):
+        return [as_json(item) for item in value]
+    if isinstance(value, dict):
+        return {key: as_json(item) for key, item in value.items()}
+    return value
+
+
+# A record's values as a plain tuple (a slice of a tuple subclass is a tuple), cheapest in C
+_values = operator.itemgetter(slice(None))
+
+
+@functools.cache
+def _nested(cls):
+    """{field index: record class} for the fields of cls holding a tuple of (flat) records"""
+    hints = get_type_hints(cls)
+    nested = {}
+    for i, name in enumerate(cls._fields):
+        args = get_args(hints[name])
+        if get_origin(hints[name]) is tuple and args and hasattr(args[0], '_fields'):
+            nested[i] = args[0]
+    return nested
+
+
+def pack(cls, value):
+    """A cls record as a bare tuple of values, nested records too"""
+    nested = _nested(cls)
+    if not nested:
+        return _values(value)
+    return tuple([tuple(map(_values, field)) if i in nested else field for i, field in enumerate(value)])
+
+
+def unpack(cls, values):
+    """The cls record pack() turned into values"""
+    nested = _nested(cls)
+    if nested:
+        new = tuple.__new__
+        values = [tuple([new(nested[i], row) for row in field]) if i in nested else field
+                  for i, field in enumerate(values)]
+    return tuple.__new__(cls, values)
+
+
+class Codec(NamedTuple):
+    """How memoize stores a helper's value (pack) and rebuilds it from the cache (unpack)"""
+    pack: Callable
+    unpack: Callable
+
+
+def codec(cls, many=False):
+    """memoize's codec for a helper returning a cls record, or a list of them"""
+    if many and not _nested(cls):
+        return Codec(lambda value: list(map(_values, value)),
+                     lambda rows: [tuple.__new__(cls, row) for row in rows])
+    if many:
+        return Codec(lambda value: [pack(cls, item) for item in value],
+                     lambda rows: [unpack(cls, row) for row in rows])
+    return Codec(lambda value: pack(cls, value), lambda values: unpack(cls, values))
+
+
+class BoardEntry(NamedTuple):
+    """A homepage board game and its best line per market (a board_games row)"""
+    game_id: str
+    game_time: datetime
+    game_date: Optional[date]
+    away_team: str
+    home_team: str
+    away_score: Optional[int]
+    home_score: Optional[int]
+    is_completed: Optional[bool]
+    has_odds: bool
+    away_ml: Optional[int]
+    away_ml_book: Optional[str]
+    home_ml: Optional[int]
+    home_ml_book: Optional[str]
+    away_spread: Optional[float]
+    away_spread_odds: Optional[int]
+    away_spread_book: Optional[str]
+    home_spread: Optional[float]
+    home_spread_odds: Optional[int]
+    home_spread_book: Optional[str]
+    over_line: Optional[float]
+    over_odds: Optional[int]
+    over_book: Optional[str]
+    under_line: Optional[float]
+    under_odds: Optional[int]
+    under_book: Optional[str]
+
+
+class UserStatsSummary(NamedTuple):
+    """A user's headline numbers (calculate_user_stats)"""
+    totalBets: int = 0
+    pendingBets: int = 0
+    wonBets: int = 0
+    lostBets: int = 0
+    totalStaked: float = 0
+    totalProfit: float = 0
+    winRate: float = 0
+    roi: float = 0
+
+
+class BetTypeStat(NamedTuple):
+    betType: str
+    totalBets: int
+    wonBets: int
+    lostBets: int
+    totalStaked: float
+    totalProfit: float
+    winRate: float
+    roi: float
+
+
+class TeamStat(NamedTuple):
+    team: str
+    bets: int
+    wins: int
+    losses: int
+    profit: float
+    winRate: float
+
+
+class Analytics(NamedTuple):
+    """Per-bet-type and top-team breakdowns (calculate_analytics)"""
+    betTypeStats: Tuple[BetTypeStat, ...]
+    teamStats: Tuple[TeamStat, ...]
+
+
+class LeaderboardEntry(NamedTuple):
+    rank: Optional[int]
+    username: str
+    totalProfit: float
+    totalStaked: float
+    totalBets: int
+    wonBets: int
+    lostBets: int
+    winRate: float
+    roi: float
+
+
+class LeaderboardPage(NamedTuple):
+    """One leaderboard page; pass nextCursor back to get the following one"""
+    entries: Tuple[LeaderboardEntry, ...]
+    nextCursor: Optional[str]
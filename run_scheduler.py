@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Run the scheduled jobs in a process of their own.
+
+Usage:
+    python run_scheduler.py
+
+Pair it with SCHEDULER_ENABLED=false on the web processes so they only
+serve requests. It still goes through leader election, so running a
+second copy (or leaving the web workers enabled) never duplicates jobs.
+"""
+
+import signal
+import threading
+
+from app import create_app, start_scheduler, stop_scheduler
+
+
+def main():
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stopping.set())
+    
+    app = create_app()
+    app.config['SCHEDULER_ENABLED'] = True
+    start_scheduler(app)
+    try:
+        stopping.wait()
+    except KeyboardInterrupt:
+        pass
+    stop_scheduler()
+    print('👋 Scheduler stopped')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Materialized per-user stats (user_stats, user_bet_type_stats, user_daily_stats).
+
+Every place that creates, edits, deletes or grades a bet hands the bet's
+before/after state to apply_bet_changes(), which turns them into counter
+deltas and applies them as increments in the same transaction. Daily
+buckets are keyed by the game's date in US Eastern time, the same day the
+homepage groups games by. The reconcile command rebuilds all three tables
+from the bets table (which is also how history gets backfilled) and
+reports any drift:
+
+    python user_stats.py reconcile [--check]
+"""
+
+import argparse
+from collections import defaultdict, namedtuple
+from datetime import datetime
+
+import pytz
+from sqlalchemy import insert, update, delete, func, case, bindparam
+
+from models import db, Bet, Game, UserStats, UserBetTypeStats, UserDailyStats
+
+COUNTERS = ('total_bets', 'pending_bets', 'won_bets', 'lost_bets', 'push_bets', 'total_staked', 'total_profit')
+RESULT_COUNTERS = {'PENDING': 'pending_bets', 'WON': 'won_bets', 'LOST': 'lost_bets', 'PUSH': 'push_bets'}
+
+# Rows per upsert statement
+BATCH_SIZE = 1000
+
+EASTERN = pytz.timezone('America/New_York')
+
+# The parts of a bet the stats depend on (day is the game's Eastern date)
+BetState = namedtuple('BetState', ['user_id', 'bet_type', 'result', 'stake', 'profit', 'day'])
+
+# A recomputed user_daily_stats row
+DailyRow = namedtuple('DailyRow', ('user_id', 'day') + COUNTERS)
+
+
+def game_day(game_time):
+    """Eastern calendar date of a game stored as naive UTC (or of an aware datetime)"""
+    if game_time.tzinfo is None:
+        game_time = pytz.utc.localize(game_time)
+    return game_time.astimezone(EASTERN).date()
+
+
+def bet_state(bet, game=None):
+    """Snapshot a Bet before/after a change (pass game if bet.game isn't loaded yet)"""
+    game = game or bet.game
+    return BetState(bet.user_id, bet.bet_type, bet.result or 'PENDING', bet.stake or 0, bet.profit,
+                    game_day(game.game_time))
+
+
+def _contribution(state, sign):
+    """Counter values one bet adds (sign=1) or removes (sign=-1)"""
+    values = {
+        'total_bets': sign,
+        'total_staked': sign * state.stake,
+        'total_profit': sign * (state.profit or 0)
+    }
+    if state.result in RESULT_COUNTERS:
+        values[RESULT_COUNTERS[state.result]] = sign
+    return values
+
+
+def apply_bet_changes(changes):
+    """Apply (before, after) BetState pairs to the stats tables; None means created/deleted
+    
+    Deltas are summed per user and per (user, bet type) first, so a whole
+    grading run costs a couple of upserts rather than one per bet. The caller
+    commits.
+    """
+    user_deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    type_deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    daily_deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    
+    for before, after in changes:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            for counter, value in _contribution(state, sign).items():
+                user_deltas[(state.user_id,)][counter] += value
+                type_deltas[(state.user_id, state.bet_type)][counter] += value
+                daily_deltas[(state.user_id, state.day)][counter] += value
+    
+    _increment(UserStats, ('user_id',), user_deltas)
+    _increment(UserBetTypeStats, ('user_id', 'bet_type'), type_deltas)
+    _increment(UserDailyStats, ('user_id', 'day'), daily_deltas)
+    refresh_rates([key[0] for key in user_deltas])
+
+
+def refresh_rates(user_ids=None):
+    """Recompute the stored roi/win_rate columns from the counters (all users if None)"""
+    table = UserStats.__table__
+    settled = table.c.won_bets + table.c.lost_bets
+    stmt = update(table).values(
+        roi=case((table.c.total_staked > 0, table.c.total_profit / table.c.total_staked * 100), else_=0.0),
+        win_rate=case((settled > 0, table.c.won_bets * 100.0 / settled), else_=0.0)
+    )
+    if user_ids is None:
+        db.session.execute(stmt)
+        return
+    
+    user_ids = list(user_ids)
+    for i in range(0, len(user_ids), BATCH_SIZE):
+        db.session.execute(stmt.where(table.c.user_id.in_(user_ids[i:i + BATCH_SIZE])))
+
+
+def _increment(model, key_columns, deltas):
+    """Add deltas to existing rows, creating rows that don't exist yet"""
+    now = datetime.utcnow()
+    rows = [
+        dict(zip(key_columns, key), updated_at=now, **values)
+        for key, values in deltas.items()
+        if any(values.values())
+    ]
+    if not rows:
+        return
+    
+    table = model.__table__
+    dialect = db.engine.dialect.name
+    
+    if dialect in ('postgresql', 'sqlite'):
+        # INSERT ... ON CONFLICT DO UPDATE SET x = x + excluded.x, atomic under concurrent writers
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        
+        for i in range(0, len(rows), BATCH_SIZE):
+            stmt = dialect_insert(table).values(rows[i:i + BATCH_SIZE])
+            set_ = {counter: table.c[counter] + stmt.excluded[counter] for counter in COUNTERS}
+            set_['updated_at'] = stmt.excluded.updated_at
+            db.session.execute(stmt.on_conflict_do_update(index_elements=list(key_columns), set_=set_))
+        return
+    
+    # Portable fallback: increment what exists, insert the rest
+    stmt = update(table).where(*[table.c[k] == bindparam(f'k_{k}') for k in key_columns])\
+        .values(updated_at=now, **{c: table.c[c] + bindparam(f'd_{c}') for c in COUNTERS})
+    for row in rows:
+        params = {f'k_{k}': row[k] for k in key_columns}
+        params.update({f'd_{c}': row[c] for c in COUNTERS})
+        if db.session.execute(stmt, params).rowcount == 0:
+            db.session.execute(insert(table).values(**row))
+
+
+def _aggregate(group_by):
+    """Recompute stats from the bets table, grouped by the given Bet columns"""
+    return db.session.query(
+        *group_by,
+        func.count(Bet.id).label('total_bets'),
+        func.sum(case((Bet.result == 'PENDING', 1), else_=0)).label('pending_bets'),
+        func.sum(case((Bet.result == 'WON', 1), else_=0)).label('won_bets'),
+        func.sum(case((Bet.result == 'LOST', 1), else_=0)).label('lost_bets'),
+        func.sum(case((Bet.result == 'PUSH', 1), else_=0)).label('push_bets'),
+        func.coalesce(func.sum(Bet.stake), 0).label('total_staked'),
+        func.coalesce(func.sum(Bet.profit), 0).label('total_profit')
+    ).group_by(*group_by).all()
+
+
+def _daily_aggregate():
+    """Recompute the daily buckets: aggregate per (user, game), then fold games into days"""
+    day_by_game = {game_id: game_day(game_time) for game_id, game_time in db.session.query(Game.id, Game.game_time)}
+    buckets = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    
+    for row in _aggregate([Bet.user_id, Bet.game_id]):
+        bucket = buckets[(row.user_id, day_by_game[row.game_id])]
+        for counter in COUNTERS:
+            bucket[counter] += getattr(row, counter) or 0
+    
+    return [DailyRow(user_id, day, **values) for (user_id, day), values in buckets.items()]
+
+
+def _drift(model, key_columns, expected_rows):
+    """Keys whose stored counters differ from the recomputed ones"""
+    expected = {tuple(getattr(row, k) for k in key_columns): row for row in expected_rows}
+    stored = {tuple(getattr(row, k) for k in key_columns): row for row in model.query.all()}
+    drifted = []
+    
+    for key in set(expected) | set(stored):
+        want, have = expected.get(key), stored.get(key)
+        for counter in COUNTERS:
+            want_value = float(getattr(want, counter) or 0) if want else 0
+            have_value = float(getattr(have, counter) or 0) if have else 0
+            if abs(want_value - have_value) > 1e-6:
+                drifted.append((key, counter, have_value, want_value))
+    return drifted
+
+
+def reconcile(fix=True):
+    """Rebuild the stats tables from bets, returning the drift found beforehand"""
+    now = datetime.utcnow()
+    user_rows = _aggregate([Bet.user_id])
+    type_rows = _aggregate([Bet.user_id, Bet.bet_type])
+    daily_rows = _daily_aggregate()
+    
+    drift = _drift(UserStats, ('user_id',), user_rows) + \
+        _drift(UserBetTypeStats, ('user_id', 'bet_type'), type_rows) + \
+        _drift(UserDailyStats, ('user_id', 'day'), daily_rows)
+    for key, counter, have, want in drift[:20]:
+        print(f'⚠️  {"/".join(map(str, key))} {counter}: stored {have}, actual {want}')
+    if len(drift) > 20:
+        print(f'⚠️  ... and {len(drift) - 20} more')
+    
+    if fix:
+        for model, key_columns, rows in ((UserStats, ('user_id',), user_rows),
+                                         (UserBetTypeStats, ('user_id', 'bet_type'), type_rows),
+                                         (UserDailyStats, ('user_id', 'day'), daily_rows)):
+            db.session.execute(delete(model))
+            values = [
+                dict({k: getattr(row, k) for k in key_columns + COUNTERS}, updated_at=now)
+                for row in rows
+            ]
+            for i in range(0, len(values), BATCH_SIZE):
+                db.session.execute(insert(model), values[i:i + BATCH_SIZE])
+        refresh_rates()
+        db.session.commit()
+    
+    return drift
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild materialized user stats from the bets table')
+    parser.add_argument('command', choices=['reconcile'])
+    parser.add_argument('--check', action='store_true', help='only report drift, exit 1 if any')
+    args = parser.parse_args()
+    
+    from app import create_app
+    
+    with create_app().app_context():
+        drift = reconcile(fix=not args.check)
+        if not drift:
+            print('✅ user_stats matches the bets table')
+        elif args.check:
+            print(f'❌ {len(drift)} drifted counters (run without --check to rebuild)')
+            raise SystemExit(1)
+        else:
+            print(f'✅ Rebuilt user_stats ({len(drift)} drifted counters fixed)')